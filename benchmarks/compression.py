@@ -0,0 +1,101 @@
+# Bytes on the wire with and without response compression: a weather_records
+# listing and the CSV/XML/Markdown exports per Accept-Encoding, plus first and
+# repeat visits to the frontend served from the sources versus the hashed,
+# precompressed build. Runs in-process on synthetic rows; no network involved.
+#
+#   python benchmarks/compression.py --rows 5000
+import argparse
+import asyncio
+import json
+import os
+import re
+import sys
+import tempfile
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ["REFRESH_WATCHLIST"] = ""
+
+import httpx
+from fastapi.staticfiles import StaticFiles
+from sqlalchemy import insert
+import compression
+import frontend
+from db import engine, init_db
+from models import WeatherRecord
+
+ENCODINGS = ["identity", "gzip"] + [e for e in ("br", "zstd") if e in compression.ENCODERS]
+
+def seed(count: int):
+    start = date(2024, 1, 1)
+    rows = [
+        {"location": f"City {i % 500}", "date_range_start": start + timedelta(days=i % 365),
+         "date_range_end": start + timedelta(days=i % 365 + 3), "temperature": round(-10 + (i % 400) / 10, 1),
+         "weather_description": "scattered clouds"}
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(WeatherRecord), rows)
+
+async def wire_bytes(client: httpx.AsyncClient, path: str, headers: dict) -> int:
+    async with client.stream("GET", path, headers=headers) as response:
+        size = 0
+        async for chunk in response.aiter_raw():
+            size += len(chunk)
+    return size
+
+async def api() -> list[dict]:
+    import main
+    results = []
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as client:
+            for path in ("/weather/?limit=1000", "/weather/export/csv", "/weather/export/xml", "/weather/export/markdown"):
+                identity = None
+                for encoding in ENCODINGS:
+                    size = await wire_bytes(client, path, {"accept-encoding": encoding})
+                    identity = identity or size
+                    results.append({"path": path, "encoding": encoding, "bytes": size, "ratio": round(size / identity, 4)})
+    return results
+
+async def visits(app, label: str) -> dict:
+    # A browser's first visit, then a repeat visit that revalidates what is not marked immutable
+    accept = {"accept-encoding": "gzip, deflate, br, zstd"}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        page = await client.get("/", headers=accept)
+        assets = ["/" + ref for ref in re.findall(r'(?:src|href)="([^"]+\.(?:js|css))"', page.text)]
+        first = [("/", page)] + [(path, await client.get(path, headers=accept)) for path in assets]
+        first_bytes = sum(int(r.headers.get("content-length", len(r.content))) for _, r in first)
+        repeat_requests = repeat_bytes = 0
+        for path, response in first:
+            if "immutable" in response.headers.get("cache-control", ""):
+                continue  # Served from the browser cache without a request
+            repeat_requests += 1
+            size = await wire_bytes(client, path, {**accept, "if-none-match": response.headers["etag"]})
+            repeat_bytes += size
+    return {"frontend": label, "first_visit_requests": len(first), "first_visit_bytes": first_bytes,
+            "repeat_visit_requests": repeat_requests, "repeat_visit_body_bytes": repeat_bytes}
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure response sizes with and without compression")
+    parser.add_argument("--rows", type=int, default=5000)
+    args = parser.parse_args()
+
+    init_db()
+    seed(args.rows)
+    build_dir = os.path.join(tempfile.mkdtemp(), "frontend_build")
+    frontend.build(frontend.FRONTEND_DIR, build_dir)
+    print(json.dumps({
+        "encodings": ENCODINGS,
+        "api": asyncio.run(api()),
+        "frontend": [
+            asyncio.run(visits(StaticFiles(directory=frontend.FRONTEND_DIR, html=True), "plain_static_files")),
+            asyncio.run(visits(compression.CompressionMiddleware(frontend.FrontendFiles(directory=frontend.FRONTEND_DIR, html=True)), "sources_compressed")),
+            asyncio.run(visits(compression.CompressionMiddleware(frontend.FrontendFiles(directory=build_dir, html=True)), "precompressed_build")),
+        ],
+    }, indent=2))
+
+if __name__ == "__main__":
+    main()
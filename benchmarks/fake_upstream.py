@@ -0,0 +1,114 @@
+# Local stand-in for OpenWeatherMap, Nominatim and Open-Meteo with injectable
+# latency and error rates. Point the app at it with OPENWEATHER_BASE_URL,
+# NOMINATIM_BASE_URL, OPEN_METEO_BASE_URL and OPEN_METEO_ARCHIVE_URL.
+#
+#   python benchmarks/fake_upstream.py --port 9000 --latency-ms 80 --error-rate 0.02
+import argparse
+import asyncio
+import hashlib
+import random
+from collections import Counter
+from datetime import date, timedelta
+from aiohttp import web
+
+class FakeUpstream:
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0, error_status: int = 503):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.calls = Counter()
+        self.errors = Counter()
+        self._runner: web.AppRunner | None = None
+        self.port: int | None = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/data/2.5/weather", self._handler("openweathermap", self._current))
+        app.router.add_get("/search", self._handler("nominatim", self._geocode))
+        app.router.add_get("/v1/forecast", self._handler("open-meteo", self._forecast))
+        app.router.add_get("/v1/archive", self._handler("open-meteo-archive", self._forecast))
+        return app
+
+    def _handler(self, provider: str, build):
+        async def handle(request: web.Request) -> web.Response:
+            self.calls[provider] += 1
+            delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            if delay > 0:
+                await asyncio.sleep(delay / 1000)
+            if self.error_rate and random.random() < self.error_rate:
+                self.errors[provider] += 1
+                return web.json_response({"message": "injected failure"}, status=self.error_status)
+            return build(request)
+        return handle
+
+    @staticmethod
+    def _coords(name: str) -> tuple[float, float]:
+        # Stable pseudo-coordinates per place name
+        digest = hashlib.sha1(name.strip().casefold().encode()).digest()
+        return digest[0] / 255 * 160 - 80, digest[1] / 255 * 340 - 170
+
+    def _current(self, request: web.Request) -> web.Response:
+        query = request.query
+        if "q" in query:
+            name = query["q"]
+            lat, lon = self._coords(name)
+        else:
+            lat, lon = float(query["lat"]), float(query["lon"])
+            name = f"{lat:.2f},{lon:.2f}"
+        return web.json_response({
+            "name": name,
+            "coord": {"lat": lat, "lon": lon},
+            "main": {"temp": round(15 + lat / 10, 2)},
+            "weather": [{"description": "clear sky"}],
+        })
+
+    def _geocode(self, request: web.Request) -> web.Response:
+        name = request.query.get("q", "")
+        lat, lon = self._coords(name)
+        return web.json_response([{"lat": str(lat), "lon": str(lon), "name": name, "display_name": name}])
+
+    def _forecast(self, request: web.Request) -> web.Response:
+        start = date.fromisoformat(request.query["start_date"])
+        end = date.fromisoformat(request.query["end_date"])
+        days = [(start + timedelta(days=i)).isoformat() for i in range((end - start).days + 1)]
+        hours = [f"{d}T{h:02d}:00" for d in days for h in range(24)]
+        body = {}
+        for resolution, times in (("daily", days), ("hourly", hours)):
+            variables = [v for v in request.query.get(resolution, "").split(",") if v]
+            if variables:
+                body[resolution] = {"time": times}
+                for v in variables:
+                    body[resolution][v] = [i % 4 if v == "weather_code" else round(10 + i * 0.5, 1) for i in range(len(times))]
+        return web.json_response(body)
+
+    async def start(self, port: int = 0):
+        self._runner = web.AppRunner(self.app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+async def main():
+    parser = argparse.ArgumentParser(description="Fake weather providers for local load tests")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--error-status", type=int, default=503)
+    args = parser.parse_args()
+    upstream = FakeUpstream(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status)
+    await upstream.start(args.port)
+    print(f"Fake upstream listening on {upstream.base_url}")
+    await asyncio.Event().wait()
+
+if __name__ == "__main__":
+    asyncio.run(main())
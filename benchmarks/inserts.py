@@ -0,0 +1,97 @@
+# Sustained POST /weather/ inserts/sec on SQLite, before and after WAL pragmas and
+# group commit. Each configuration runs the app in-process in its own child
+# process (settings are read at import time) against benchmarks/fake_upstream.py
+# with a warm cache, so the number measures the write path, not the providers.
+#
+#   python benchmarks/inserts.py --concurrency 50 --requests 2000
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+CONFIGS = {
+    "rollback_journal_per_request_commit": {"SQLITE_JOURNAL_MODE": "DELETE", "SQLITE_SYNCHRONOUS": "FULL", "WRITE_GROUP_COMMIT": "0"},
+    "wal_per_request_commit": {"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL", "WRITE_GROUP_COMMIT": "0"},
+    "wal_group_commit": {"SQLITE_JOURNAL_MODE": "WAL", "SQLITE_SYNCHRONOUS": "NORMAL", "WRITE_GROUP_COMMIT": "1"},
+}
+
+async def child(args):
+    from benchmarks.fake_upstream import FakeUpstream
+    upstream = FakeUpstream()
+    await upstream.start()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/inserts.db"
+    os.environ["REFRESH_WATCHLIST"] = ""
+    for prefix in ("OPENWEATHER", "NOMINATIM", "OPEN_METEO"):
+        os.environ[f"{prefix}_BASE_URL"] = upstream.base_url
+        os.environ[f"{prefix}_RATE_LIMIT"] = "0"
+    os.chdir(ROOT)
+    main_module = importlib.import_module("main")
+
+    import httpx
+    app = main_module.app
+    locations = [f"City {i}" for i in range(args.locations)]
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+            for location in locations:  # Warm the weather cache: only the database write is measured
+                await client.post("/weather/", json={"location": location})
+            semaphore = asyncio.Semaphore(args.concurrency)
+            latencies = []
+            statuses: dict[int, int] = {}
+
+            async def one(i: int):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post("/weather/", json={"location": locations[i % len(locations)]})
+                    latencies.append(time.perf_counter() - started)
+                    statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(i) for i in range(args.requests)))
+            elapsed = time.perf_counter() - started
+    await upstream.stop()
+    latencies.sort()
+    inserted = statuses.get(200, 0)
+    print(json.dumps({
+        "requests": args.requests,
+        "status_codes": statuses,
+        "seconds": round(elapsed, 3),
+        "inserts_per_s": round(inserted / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99) - 1] * 1000, 2),
+    }))
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure sustained insert throughput on SQLite across write configurations")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--locations", type=int, default=20)
+    parser.add_argument("--configs", default=",".join(CONFIGS))
+    parser.add_argument("--db-mode", default=os.getenv("DB_MODE", "sync"))
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        asyncio.run(child(args))
+        return
+
+    results = []
+    for name in args.configs.split(","):
+        env = {**os.environ, **CONFIGS[name], "DB_MODE": args.db_mode}
+        command = [sys.executable, os.path.abspath(__file__), "--child", "--concurrency", str(args.concurrency),
+                   "--requests", str(args.requests), "--locations", str(args.locations)]
+        output = subprocess.run(command, env=env, check=True, capture_output=True, text=True).stdout
+        results.append({"config": name, "db_mode": args.db_mode, **json.loads(output.strip().splitlines()[-1])})
+    baseline = results[0]["inserts_per_s"]
+    for result in results:
+        result["speedup"] = round(result["inserts_per_s"] / baseline, 2)
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# In-process load test: runs the FastAPI app against benchmarks/fake_upstream.py
+# and prints a JSON report (latency percentiles, throughput, upstream calls,
+# peak RSS) that can be diffed across commits.
+#
+#   python benchmarks/load_test.py --concurrency 50 --requests 500 --latency-ms 80 > before.json
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from benchmarks.fake_upstream import FakeUpstream
+
+WORKLOADS = ["create", "list", "get", "update", "export", "batch", "delete"]
+
+def percentile(values: list[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class LoadTest:
+    def __init__(self, client, upstream: FakeUpstream, args):
+        self.client = client
+        self.upstream = upstream
+        self.args = args
+        self.locations = [f"City {i}" for i in range(args.locations)]
+        self.ids: list[int] = []
+
+    def _request(self, workload: str, i: int):
+        if workload == "create":
+            return self.client.post("/weather/", json={"location": random.choice(self.locations)})
+        if workload == "list":
+            return self.client.get("/weather/", params={"limit": 100})
+        if workload == "get":
+            return self.client.get(f"/weather/{random.choice(self.ids)}")
+        if workload == "update":
+            return self.client.put(f"/weather/{random.choice(self.ids)}", json={"temperature": round(random.uniform(-10, 35), 1)})
+        if workload == "export":
+            return self.client.get(f"/weather/export/{self.args.export_format}")
+        if workload == "batch":
+            body = [{"location": random.choice(self.locations)} for _ in range(self.args.batch_size)]
+            return self.client.post("/weather/batch", json=body)
+        if workload == "delete":
+            return self.client.delete(f"/weather/{self.ids.pop()}")
+        raise ValueError(workload)
+
+    async def run(self, workload: str) -> dict:
+        total = self.args.requests
+        if workload == "delete":
+            total = min(total, len(self.ids))
+        if workload in ("get", "update") and not self.ids:
+            return {"workload": workload, "skipped": "no records created"}
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+        latencies: list[float] = []
+        statuses: dict[str, int] = {}
+        calls_before = dict(self.upstream.calls)
+
+        async def one(i: int):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await self._request(workload, i)
+                await response.aread()
+                latencies.append((time.perf_counter() - started) * 1000)
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+                if workload == "create" and response.status_code == 200:
+                    self.ids.append(response.json()["id"])
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(total)))
+        elapsed = time.perf_counter() - started
+        upstream_calls = {p: n - calls_before.get(p, 0) for p, n in self.upstream.calls.items() if n - calls_before.get(p, 0)}
+        return {
+            "workload": workload,
+            "requests": total,
+            "concurrency": self.args.concurrency,
+            "duration_s": round(elapsed, 3),
+            "requests_per_s": round(total / elapsed, 1) if elapsed else None,
+            "latency_ms": {
+                "p50": round(percentile(latencies, 50), 2),
+                "p95": round(percentile(latencies, 95), 2),
+                "p99": round(percentile(latencies, 99), 2),
+                "max": round(max(latencies), 2) if latencies else 0.0,
+            },
+            "status_codes": statuses,
+            "upstream_calls": upstream_calls,
+        }
+
+async def main():
+    parser = argparse.ArgumentParser(description="Load test the weather API against a local upstream stand-in")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=200, help="requests per workload")
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--locations", type=int, default=50, help="distinct locations to draw from")
+    parser.add_argument("--batch-size", type=int, default=20)
+    parser.add_argument("--export-format", default="json")
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--jitter-ms", type=float, default=10)
+    parser.add_argument("--error-rate", type=float, default=0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    upstream = FakeUpstream(args.latency_ms, args.jitter_ms, args.error_rate)
+    await upstream.start()
+    # The app reads its configuration at import time, so wire it up before importing main
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/loadtest.db"
+    os.environ["OPENWEATHER_BASE_URL"] = upstream.base_url
+    os.environ["NOMINATIM_BASE_URL"] = upstream.base_url
+    os.environ["OPEN_METEO_BASE_URL"] = upstream.base_url
+    os.environ["OPEN_METEO_ARCHIVE_URL"] = upstream.base_url
+    os.environ.setdefault("REFRESH_WATCHLIST", "")
+    # The stand-in has no quota, so lift the per-provider rate limits that guard the real APIs
+    for prefix in ("OPENWEATHER", "NOMINATIM", "OPEN_METEO"):
+        os.environ.setdefault(f"{prefix}_RATE_LIMIT", "0")
+    os.chdir(ROOT)
+    main_module = importlib.import_module("main")
+
+    import httpx
+    app = main_module.app
+    results = []
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            test = LoadTest(client, upstream, args)
+            for workload in args.workloads.split(","):
+                results.append(await test.run(workload.strip()))
+    await upstream.stop()
+
+    report = {
+        "commit": git_commit(),
+        "config": vars(args),
+        "results": results,
+        "upstream_calls_total": dict(upstream.calls),
+        "upstream_errors_injected": dict(upstream.errors),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,122 @@
+# Upstream calls made by a multi-worker deployment: starts `uvicorn main:app
+# --workers N` against benchmarks/fake_upstream.py once per shared-state backend
+# and drives the same POST /weather/ workload through each. Without a shared
+# backend every worker misses (and calls upstream) on its own.
+#
+#   python benchmarks/multi_worker.py --workers 4 --requests 400 --backends none,sqlite
+#   python benchmarks/multi_worker.py --backends none,redis://localhost:6379/15
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import httpx
+from benchmarks.fake_upstream import FakeUpstream
+
+def _free_port() -> int:
+    import socket
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def _shared_url(backend: str, directory: str) -> str:
+    if backend == "none":
+        return ""
+    if backend == "sqlite":
+        return f"sqlite:///{directory}/shared_state.db"
+    return backend
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/info")).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("app did not start")
+
+async def run(backend: str, upstream: FakeUpstream, args) -> dict:
+    directory = tempfile.mkdtemp()
+    port = _free_port()
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{directory}/bench.db",
+        "SHARED_STATE_URL": _shared_url(backend, directory),
+        "SHARED_STATE_PREFIX": f"bench-{port}",  # Fresh keys per run when pointed at a long-lived Redis
+        "REFRESH_WATCHLIST": "",
+        "OPENWEATHER_BASE_URL": upstream.base_url,
+        "NOMINATIM_BASE_URL": upstream.base_url,
+        "OPEN_METEO_BASE_URL": upstream.base_url,
+        "OPEN_METEO_ARCHIVE_URL": upstream.base_url,
+    }
+    for prefix in ("OPENWEATHER", "NOMINATIM", "OPEN_METEO"):
+        env[f"{prefix}_RATE_LIMIT"] = "0"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=ROOT, env=env,
+    )
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+            await _wait_ready(client)
+            upstream.calls.clear()
+            locations = [f"City {i}" for i in range(args.locations)]
+            semaphore = asyncio.Semaphore(args.concurrency)
+            statuses: dict[int, int] = {}
+
+            async def one(location: str):
+                async with semaphore:
+                    # A new connection per request lets the kernel spread requests over the workers
+                    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as fresh:
+                        status = (await fresh.post("/weather/", json={"location": location})).status_code
+                    statuses[status] = statuses.get(status, 0) + 1
+
+            started = time.perf_counter()
+            await asyncio.gather(*(one(random.choice(locations)) for _ in range(args.requests)))
+            elapsed = time.perf_counter() - started
+        calls = upstream.calls["openweathermap"]
+        return {
+            "backend": backend,
+            "workers": args.workers,
+            "requests": args.requests,
+            "distinct_locations": args.locations,
+            "status_codes": statuses,
+            "upstream_calls": calls,
+            "cache_hit_ratio": round(1 - calls / args.requests, 4),
+            "requests_per_s": round(args.requests / elapsed, 1),
+        }
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+async def main():
+    parser = argparse.ArgumentParser(description="Compare upstream calls across shared-state backends under several workers")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--locations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=30)
+    parser.add_argument("--backends", default="none,sqlite", help="comma-separated: none, sqlite, or a redis:// URL")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    upstream = FakeUpstream(args.latency_ms)
+    await upstream.start()
+    results = []
+    for backend in args.backends.split(","):
+        random.seed(args.seed)
+        results.append(await run(backend.strip(), upstream, args))
+    await upstream.stop()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
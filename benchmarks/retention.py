@@ -0,0 +1,96 @@
+# Read/export latency on a weather_records table that has grown for a year, before
+# and after one retention cycle (raw rows kept --raw-days, older ones rolled up per
+# day, days older than --daily-days rolled up per month). Also reports the longest
+# single retention transaction, i.e. the longest writers had to wait for the lock.
+# Runs in-process on synthetic rows; no network involved.
+#
+#   python benchmarks/retention.py --rows 200000 --days 365 --raw-days 30 --daily-days 90
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(ROOT)
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+os.environ["REFRESH_WATCHLIST"] = ""
+os.environ["EXPORT_ASYNC_THRESHOLD"] = "1000000000"  # Time the streamed export itself, not a queued job
+
+import httpx
+from sqlalchemy import func, insert, select
+from db import engine, init_db
+from models import WeatherRecord, WeatherRollup
+from services.analytics_service import analytics_cache
+from services.retention import RetentionTask
+
+def seed(count: int, days: int, locations: int):
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    step = timedelta(days=days) / count
+    rows = [
+        {"location": f"City {i % locations}", "temperature": round(-10 + (i % 400) / 10, 1), "weather_description": "scattered clouds",
+         "created_at": now - timedelta(days=days) + step * i}
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        for offset in range(0, count, 50000):
+            conn.execute(insert(WeatherRecord), rows[offset:offset + 50000])
+
+def table_sizes() -> dict:
+    with engine.connect() as conn:
+        return {"raw_rows": conn.execute(select(func.count()).select_from(WeatherRecord)).scalar(),
+                "rollup_rows": conn.execute(select(func.count()).select_from(WeatherRollup)).scalar()}
+
+async def timings(client: httpx.AsyncClient) -> dict:
+    result = {}
+    for name, path in (("export_csv", "/weather/export/csv"), ("export_json", "/weather/export/json"),
+                       ("analytics_summary", "/analytics/summary"), ("analytics_locations", "/analytics/locations"),
+                       ("analytics_daily_365", "/analytics/daily?days=365")):
+        analytics_cache.clear()
+        started = time.perf_counter()
+        async with client.stream("GET", path, headers={"accept-encoding": "identity"}) as response:
+            size = 0
+            async for chunk in response.aiter_raw():
+                size += len(chunk)
+        result[name] = {"ms": round((time.perf_counter() - started) * 1000, 1), "bytes": size, "status": response.status_code}
+    return result
+
+async def run(args) -> dict:
+    import main
+    async with main.app.router.lifespan_context(main.app):
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as client:
+            before = {**table_sizes(), **await timings(client)}
+            summary_before = (await client.get("/analytics/summary")).json()
+            task = RetentionTask(args.raw_days, args.daily_days, False, 1, 3600, args.batch_size, 0)
+            started = time.perf_counter()
+            cycle = await task.run_once()
+            cycle_s = time.perf_counter() - started
+            after = {**table_sizes(), **await timings(client)}
+            summary_after = (await client.get("/analytics/summary")).json()
+    return {
+        "retention": {**cycle, "cycle_s": round(cycle_s, 2), "batch_size": args.batch_size, "longest_batch_ms": round(task.longest_batch * 1000, 1)},
+        "summary_unchanged": summary_before == summary_after,
+        "before": before,
+        "after": after,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure export and analytics latency before and after a retention cycle")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--locations", type=int, default=50)
+    parser.add_argument("--raw-days", type=int, default=30)
+    parser.add_argument("--daily-days", type=int, default=90)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    init_db()
+    seed(args.rows, args.days, args.locations)
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Rows/sec for serializing weather_records listings to JSON bytes: the ORM +
+# Pydantic path the API used to take versus the raw-tuple fast path. No
+# network involved; rows are synthetic and live in a throwaway SQLite file.
+#
+#   python benchmarks/serialization.py --rows 50000 --repeat 3
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert, select
+from db import SessionLocal, engine, init_db
+from models import WeatherRecord
+from schemas import WeatherResponse
+from services.weather_service import LIST_FIELDS
+from utils import serialization
+from utils.serialization import FastJSONResponse, rows_to_dicts
+
+def seed(count: int):
+    start = date(2024, 1, 1)
+    rows = [
+        {"location": f"City {i % 500}", "date_range_start": start + timedelta(days=i % 365),
+         "date_range_end": start + timedelta(days=i % 365 + 3), "temperature": round(-10 + (i % 400) / 10, 1),
+         "weather_description": "scattered clouds"}
+        for i in range(count)
+    ]
+    with engine.begin() as conn:
+        conn.execute(insert(WeatherRecord), rows)
+
+def orm_pydantic(db) -> bytes:
+    # Previous listing path: ORM instances -> model_validate -> jsonable_encoder -> json
+    records = db.execute(select(WeatherRecord).order_by(WeatherRecord.id)).scalars().all()
+    items = [WeatherResponse.model_validate(r).model_dump() for r in records]
+    return JSONResponse(jsonable_encoder(items)).body
+
+def tuples_encoder(db) -> bytes:
+    # Column tuples, but still walked by jsonable_encoder and the stdlib encoder
+    rows = db.execute(select(*[getattr(WeatherRecord, f) for f in LIST_FIELDS]).order_by(WeatherRecord.id))
+    return JSONResponse(jsonable_encoder(rows_to_dicts(LIST_FIELDS, rows))).body
+
+def tuples_fast(db) -> bytes:
+    # Current path: column tuples -> plain dicts -> FastJSONResponse
+    rows = db.execute(select(*[getattr(WeatherRecord, f) for f in LIST_FIELDS]).order_by(WeatherRecord.id))
+    return FastJSONResponse(rows_to_dicts(LIST_FIELDS, rows)).body
+
+def measure(label: str, path, rows: int, repeat: int) -> dict:
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        with SessionLocal() as db:
+            started = time.perf_counter()
+            size = len(path(db))
+            timings.append(time.perf_counter() - started)
+    best = min(timings)
+    return {"path": label, "rows": rows, "best_s": round(best, 4), "rows_per_s": round(rows / best), "bytes": size}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON serialization paths for weather_records listings")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    init_db()
+    seed(args.rows)
+    paths = {"orm_pydantic": orm_pydantic, "tuples_jsonable_encoder": tuples_encoder, "tuples_fast": tuples_fast}
+    results = [measure(label, path, args.rows, args.repeat) for label, path in paths.items()]
+    baseline = results[0]["rows_per_s"]
+    for result in results:
+        result["speedup"] = round(result["rows_per_s"] / baseline, 2)
+    print(json.dumps({"encoder": "orjson" if serialization.orjson else "json", "results": results}, indent=2))
+
+if __name__ == "__main__":
+    main()
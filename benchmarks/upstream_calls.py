@@ -0,0 +1,95 @@
+# Counts upstream HTTP calls per POST /weather/ before and after the single
+# resolution pipeline, with the geocode cache cold. Upstream responses are
+# canned, so no API keys are needed.
+#
+#   python benchmarks/upstream_calls.py
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from collections import Counter
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from urllib.parse import urlsplit, parse_qs
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+
+import http_client
+import weather_api
+from db import SessionLocal, SyncSessionAdapter, init_db
+from models import GeocodeCache, WeatherObservation
+from schemas import WeatherRequest
+from services import weather_service
+
+calls = Counter()
+
+class FakeResponse:
+    def __init__(self, status: int, body):
+        self.status = status
+        self._body = body
+
+    async def json(self, **kwargs):
+        return self._body
+
+    async def text(self):
+        return json.dumps(self._body)
+
+def _respond(url: str) -> FakeResponse:
+    parts = urlsplit(url)
+    query = parse_qs(parts.query)
+    calls[parts.hostname] += 1
+    if parts.hostname.startswith("nominatim"):
+        return FakeResponse(200, [{"lat": "51.5074", "lon": "-0.1278", "name": query["q"][0]}])
+    if parts.hostname.endswith("openweathermap.org"):
+        return FakeResponse(200, {"main": {"temp": 11.2}, "weather": [{"description": "clear sky"}],
+                                  "name": "London", "coord": {"lat": 51.5074, "lon": -0.1278}})
+    start = date.fromisoformat(query["start_date"][0])
+    days = [(start + timedelta(days=i)).isoformat() for i in range((date.fromisoformat(query["end_date"][0]) - start).days + 1)]
+    return FakeResponse(200, {"daily": {"time": days, "temperature_2m_mean": [9.5] * len(days), "weather_code": [0] * len(days)}})
+
+@asynccontextmanager
+async def fake_get(url: str, **kwargs):
+    yield _respond(url)
+
+async def legacy_create(request: WeatherRequest):
+    # Baseline flow: validate with a thrown-away current-weather call, then fetch
+    await weather_api._fetch_current_weather(request.location)
+    if request.date_range_start and request.date_range_end:
+        place = await weather_api.resolve_location(request.location)
+        await weather_api._fetch_forecast(place, request.date_range_start, request.date_range_end)
+    else:
+        await weather_api._fetch_current_weather(request.location)
+
+async def measure(label: str, create, request: WeatherRequest) -> dict:
+    weather_api.weather_cache.clear()
+    weather_api.geocode_cache.clear()
+    with SessionLocal() as db:
+        db.query(GeocodeCache).delete()
+        db.query(WeatherObservation).delete()
+        db.commit()
+    calls.clear()
+    await create(request)
+    return {"flow": label, "total": sum(calls.values()), "by_host": dict(calls)}
+
+async def main():
+    http_client.get = fake_get
+    init_db()
+    db = SyncSessionAdapter(SessionLocal())
+
+    start = date.today() + timedelta(days=1)
+    workloads = {
+        "current": WeatherRequest(location="London"),
+        "forecast": WeatherRequest(location="London", date_range_start=start, date_range_end=start + timedelta(days=3)),
+    }
+    results = []
+    for name, request in workloads.items():
+        before = await measure("before", legacy_create, request)
+        after = await measure("after", lambda r: weather_service.create_weather_record(r, db), request)
+        results.append({"workload": name, "before": before, "after": after})
+    await db.close()
+    print(json.dumps(results, indent=2))
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,176 @@
+import asyncio
+import os
+import re
+import zlib
+from functools import lru_cache
+from starlette.datastructures import Headers, MutableHeaders
+import metrics
+
+# Response compression negotiated from Accept-Encoding. brotli and zstandard are
+# optional (pip install brotli zstandard); gzip is always available. Bodies are
+# compressed as they stream, with a sync flush after every chunk, so exports and
+# paginated listings still reach the client incrementally.
+try:
+    import brotli
+except ImportError:
+    brotli = None
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))  # bytes; smaller bodies are sent as-is
+COMPRESSION_ENCODINGS = os.getenv("COMPRESSION_ENCODINGS", "zstd,br,gzip")  # server preference when the client rates them equally
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))  # 11 is for build time; 4 is close to gzip speed at better ratios
+ZSTD_LEVEL = int(os.getenv("ZSTD_LEVEL", "3"))
+COMPRESSION_THREAD_SIZE = int(os.getenv("COMPRESSION_THREAD_SIZE", "262144"))  # bytes; larger chunks are compressed off the event loop
+
+# Already-compressed formats (PDF, images) and SSE, which proxies must not buffer, are left alone
+_COMPRESSIBLE = re.compile(r"^(text/(?!event-stream)|application/(json|x-ndjson|xml|javascript|manifest\+json)|image/svg\+xml)")
+
+class GzipEncoder:
+    def __init__(self, level: int = GZIP_LEVEL):
+        self._z = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits 31: gzip container
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        return self._z.compress(data) + self._z.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+class BrotliEncoder:
+    def __init__(self, quality: int = BROTLI_QUALITY):
+        self._c = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        return self._c.process(data) + (self._c.finish() if final else self._c.flush())
+
+class ZstdEncoder:
+    def __init__(self, level: int = ZSTD_LEVEL):
+        self._c = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes, final: bool = False) -> bytes:
+        mode = zstandard.COMPRESSOBJ_FLUSH_FINISH if final else zstandard.COMPRESSOBJ_FLUSH_BLOCK
+        return self._c.compress(data) + self._c.flush(mode)
+
+ENCODERS = {"gzip": GzipEncoder}
+if brotli is not None:
+    ENCODERS["br"] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS["zstd"] = ZstdEncoder
+
+AVAILABLE = tuple(e for e in COMPRESSION_ENCODINGS.split(",") if e in ENCODERS)
+
+@lru_cache(maxsize=256)
+def negotiate(accept_encoding: str, available: tuple = AVAILABLE) -> str | None:
+    # Highest q-value wins; ties go to the earlier entry in `available`. q=0 rules a coding out.
+    ratings = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name:
+            ratings[name.strip()] = q
+    best, best_q = None, 0.0
+    for encoding in available:
+        q = ratings.get(encoding, ratings.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+def compressible(content_type: str) -> bool:
+    return bool(_COMPRESSIBLE.match(content_type))
+
+def compress_bytes(data: bytes, encoding: str, **options) -> bytes:
+    return ENCODERS[encoding](**options).compress(data, final=True)
+
+class CompressionMiddleware:
+    # Pure ASGI like MetricsMiddleware: compresses streaming bodies chunk by chunk
+    # instead of buffering the whole response
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        await self.app(scope, receive, _Responder(send, encoding, self.minimum_size).send)
+
+class _Responder:
+    def __init__(self, send, encoding: str | None, minimum_size: int):
+        self._send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start = None
+        self.mode = "pending"  # pending -> passthrough | streaming
+        self.buffer: list[bytes] = []
+        self.buffered = 0
+        self.encoder = None
+
+    async def send(self, message):
+        kind = message["type"]
+        if kind == "http.response.start":
+            self.start = message
+            headers = MutableHeaders(scope=message)
+            content_type = headers.get("content-type", "")
+            if message["status"] in (204, 206, 304) or "content-encoding" in headers or not compressible(content_type):
+                self.mode = "passthrough"
+                await self._send(message)
+                return
+            headers.add_vary_header("Accept-Encoding")
+            if self.encoding is None or "no-transform" in headers.get("cache-control", ""):
+                self.mode = "passthrough"
+                await self._send(message)
+            return
+        if self.mode == "passthrough":
+            await self._send(message)
+            return
+        if kind != "http.response.body":  # e.g. http.response.pathsend: hand it on untouched
+            self.mode = "passthrough"
+            await self._send(self.start)
+            await self._send(message)
+            return
+
+        body, more = message.get("body", b""), message.get("more_body", False)
+        if self.mode == "streaming":
+            await self._send({"type": "http.response.body", "body": await self._compress(body, not more), "more_body": more})
+            return
+        self.buffer.append(body)
+        self.buffered += len(body)
+        if self.buffered < self.minimum_size:
+            if not more:  # Whole body is small: not worth the CPU or the framing overhead
+                self.mode = "passthrough"
+                await self._send(self.start)
+                await self._send({"type": "http.response.body", "body": b"".join(self.buffer), "more_body": False})
+            return
+        data = b"".join(self.buffer)
+        self.buffer = []
+        self.encoder = ENCODERS[self.encoding]()
+        compressed = await self._compress(data, not more)
+        headers = MutableHeaders(scope=self.start)
+        headers["Content-Encoding"] = self.encoding
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = "W/" + etag  # Different bytes than the identity representation
+        if more:
+            del headers["Content-Length"]
+            self.mode = "streaming"
+        else:
+            headers["Content-Length"] = str(len(compressed))
+        await self._send(self.start)
+        await self._send({"type": "http.response.body", "body": compressed, "more_body": more})
+
+    async def _compress(self, data: bytes, final: bool) -> bytes:
+        if len(data) >= COMPRESSION_THREAD_SIZE:
+            compressed = await asyncio.to_thread(self.encoder.compress, data, final)
+        else:
+            compressed = self.encoder.compress(data, final)
+        metrics.compression_input_bytes.inc(self.encoding, amount=len(data))
+        metrics.compression_output_bytes.inc(self.encoding, amount=len(compressed))
+        return compressed
@@ -1,20 +1,188 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.exc import DatabaseError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./weather.db")
+DB_MODE = os.getenv("DB_MODE", "sync").lower()  # "sync" runs the blocking Session in a worker thread; "async" uses aiosqlite/asyncpg
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+DB_STATEMENT_CACHE_SIZE = int(os.getenv("DB_STATEMENT_CACHE_SIZE", "500"))
+# SQLite tuning applied to every new connection. WAL lets readers run alongside the
+# single writer and, with synchronous=NORMAL, syncs at checkpoints instead of every
+# commit; DELETE/FULL restores SQLite's own defaults.
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT = int(os.getenv("SQLITE_BUSY_TIMEOUT", "5000"))  # ms a writer waits for the lock instead of failing
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))  # pages, or KiB when negative (64 MiB)
 
-engine = create_engine(DATABASE_URL)
+def _async_url(url: str) -> str:
+    # Same database, async driver: aiosqlite for SQLite, asyncpg for PostgreSQL
+    scheme, rest = url.split("://", 1)
+    backend = scheme.split("+", 1)[0]
+    if backend == "sqlite":
+        return f"sqlite+aiosqlite://{rest}"
+    if backend in ("postgresql", "postgres"):
+        return f"postgresql+asyncpg://{rest}"
+    return url
+
+def _pool_options(url: str) -> dict:
+    if url.startswith("sqlite") and ":memory:" in url:
+        return {}
+    return {"pool_size": DB_POOL_SIZE, "max_overflow": DB_MAX_OVERFLOW}
+
+def _sqlite_pragmas(engine):
+    if engine.dialect.name != "sqlite" or ":memory:" in str(engine.url):
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute(f"PRAGMA cache_size={SQLITE_CACHE_SIZE}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+engine = create_engine(DATABASE_URL, query_cache_size=DB_STATEMENT_CACHE_SIZE, **_pool_options(DATABASE_URL))
+_sqlite_pragmas(engine)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-def get_db():
-    db = SessionLocal()
+async_engine = None
+AsyncSessionLocal = None
+if DB_MODE == "async":
+    ASYNC_DATABASE_URL = _async_url(DATABASE_URL)
+    connect_args = {}
+    if ASYNC_DATABASE_URL.startswith("postgresql+asyncpg"):
+        connect_args["prepared_statement_cache_size"] = DB_STATEMENT_CACHE_SIZE
     try:
-        yield db
-    finally:
-        db.close()
\ No newline at end of file
+        from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+        async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            query_cache_size=DB_STATEMENT_CACHE_SIZE,
+            connect_args=connect_args,
+            **_pool_options(ASYNC_DATABASE_URL),
+        )
+        AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+        _sqlite_pragmas(async_engine.sync_engine)
+    except ImportError as e:
+        # Missing greenlet/aiosqlite/asyncpg: keep serving through the sync engine
+        logging.warning(f"Async database support unavailable ({e}); falling back to sync mode")
+        DB_MODE = "sync"
+
+# Threads for SyncSessionAdapter, one per pooled connection. A call waiting on the
+# SQLite busy timeout then holds one of these rather than a slot in the loop's default
+# executor, which every other asyncio.to_thread user (and the lock holder's next call) needs.
+_session_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE + DB_MAX_OVERFLOW, thread_name_prefix="db-session")
+
+async def _in_thread(fn, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(_session_executor, partial(fn, *args, **kwargs))
+
+class SyncSessionAdapter:
+    # Exposes the AsyncSession methods the services use on top of a sync Session,
+    # running each blocking call in a worker thread so the event loop stays free.
+    # Every call is its own hop, so writes go through run_sync: the statements, the
+    # version bump and the commit in one hop, never holding the write lock across awaits.
+    def __init__(self, session):
+        self.sync_session = session
+        self.sync_session.expire_on_commit = False  # Match AsyncSessionLocal; no lazy loads on the loop thread
+
+    def add(self, instance):
+        self.sync_session.add(instance)
+
+    def add_all(self, instances):
+        self.sync_session.add_all(instances)
+
+    async def execute(self, statement, params=None, **kwargs):
+        # Buffer rows in the worker thread so no cursor is touched from the event loop
+        # (DML and executemany results carry no rows and are passed through as-is)
+        def run():
+            result = self.sync_session.execute(statement, params, **kwargs)
+            if isinstance(params, list) or not getattr(result, "returns_rows", True):
+                return result
+            return result.freeze()()
+        return await _in_thread(run)
+
+    async def scalar(self, statement, params=None, **kwargs):
+        return await _in_thread(self.sync_session.scalar, statement, params, **kwargs)
+
+    async def get(self, entity, ident):
+        return await _in_thread(self.sync_session.get, entity, ident)
+
+    async def run_sync(self, fn, *args, **kwargs):
+        # Same contract as AsyncSession.run_sync: fn(session, ...) runs as one unit of work
+        return await _in_thread(fn, self.sync_session, *args, **kwargs)
+
+    async def flush(self):
+        await _in_thread(self.sync_session.flush)
+
+    async def commit(self):
+        await _in_thread(self.sync_session.commit)
+
+    async def rollback(self):
+        await _in_thread(self.sync_session.rollback)
+
+    async def refresh(self, instance):
+        await _in_thread(self.sync_session.refresh, instance)
+
+    async def delete(self, instance):
+        await _in_thread(self.sync_session.delete, instance)
+
+    async def close(self):
+        await _in_thread(self.sync_session.close)
+
+if DB_MODE == "async":
+    from sqlalchemy.ext.asyncio import AsyncSession as DBSession
+else:
+    DBSession = SyncSessionAdapter
+
+async def get_db():
+    if DB_MODE == "async":
+        async with AsyncSessionLocal() as db:
+            yield db
+    else:
+        db = SyncSessionAdapter(SessionLocal())
+        try:
+            yield db
+        finally:
+            await db.close()
+
+def init_db():
+    # Several workers starting together race on CREATE/ALTER; whoever loses retries and finds the schema done
+    for attempt in range(3):
+        try:
+            return _sync_schema()
+        except DatabaseError as e:
+            if attempt == 2:
+                raise
+            logging.info(f"Schema setup raced with another worker, retrying: {e.orig}")
+
+def _sync_schema():
+    import models  # noqa: F401 - registers the tables on Base
+    Base.metadata.create_all(bind=engine)
+    # create_all skips tables that already exist, so add columns and indexes introduced later
+    existing = inspect(engine)
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            present = {c["name"] for c in existing.get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in present:
+                    conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"))
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+async def close_db():
+    if async_engine is not None:
+        await async_engine.dispose()
+    engine.dispose()
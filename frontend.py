@@ -0,0 +1,135 @@
+import argparse
+import hashlib
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+import shutil
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+import compression
+
+# Production build of the frontend: every asset except the HTML pages is copied
+# under a content-hashed name (app.3f9c2a1b7d4e.js) that the pages are rewritten to
+# reference, and .br/.gz variants are compressed once at maximum level. Hashed
+# assets never change, so browsers may keep them for a year without revalidating;
+# the pages themselves are revalidated (a cheap 304) so a new build shows up at once.
+#   python frontend.py            builds weather_app_frontend -> frontend_build
+FRONTEND_DIR = os.getenv("FRONTEND_DIR", "weather_app_frontend")
+FRONTEND_BUILD_DIR = os.getenv("FRONTEND_BUILD_DIR", "frontend_build")  # served instead of FRONTEND_DIR when it has been built
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+PRECOMPRESSED = {"br": ".br", "gzip": ".gz"}  # Preference order when the client accepts both
+_HASHED = re.compile(r"\.[0-9a-f]{12}\.[A-Za-z0-9]+$")
+_REFERENCE = re.compile(r"""\b(src|href)=(["'])([^"'#?:]+)\2""")
+
+def _hashed_name(path: str, data: bytes) -> str:
+    stem, ext = os.path.splitext(path)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+def _rewrite(page: str, html: str, renamed: dict) -> str:
+    # Point src/href at the hashed copies; only the last path segment changes
+    base = posixpath.dirname(page)
+
+    def replace(match):
+        attr, quote, ref = match.groups()
+        target = ref.lstrip("/") if ref.startswith("/") else posixpath.normpath(posixpath.join(base, ref))
+        if target not in renamed:
+            return match.group(0)
+        return f"{attr}={quote}{posixpath.join(posixpath.dirname(ref), posixpath.basename(renamed[target]))}{quote}"
+
+    return _REFERENCE.sub(replace, html)
+
+def build(source: str = FRONTEND_DIR, output: str = FRONTEND_BUILD_DIR) -> dict:
+    staging = output + ".tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    files = {}
+    for root, _, names in os.walk(source):
+        for name in names:
+            path = os.path.join(root, name)
+            with open(path, "rb") as f:
+                files[os.path.relpath(path, source).replace(os.sep, "/")] = f.read()
+
+    written = {}
+    renamed = {}
+    for path, data in files.items():
+        if not path.endswith(".html"):
+            renamed[path] = _hashed_name(path, data)
+            written[renamed[path]] = data
+            written[path] = data  # Unhashed copy for anything linking to the old name; served with no-cache
+    for path, data in files.items():
+        if path.endswith(".html"):
+            written[path] = _rewrite(path, data.decode("utf-8"), renamed).encode("utf-8")
+
+    report = {"files": 0, "bytes": 0, "br_bytes": 0, "gz_bytes": 0}
+    for path, data in written.items():
+        target = os.path.join(staging, path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, "wb") as f:
+            f.write(data)
+        report["files"] += 1
+        report["bytes"] += len(data)
+        content_type = mimetypes.guess_type(path)[0] or ""
+        if not compression.compressible(content_type):
+            continue
+        variants = {"gzip": compression.compress_bytes(data, "gzip", level=9)}
+        if "br" in compression.ENCODERS:
+            variants["br"] = compression.compress_bytes(data, "br", quality=11)
+        for encoding, compressed in variants.items():
+            if len(compressed) < len(data):  # Tiny files can grow; serve those as-is
+                with open(target + PRECOMPRESSED[encoding], "wb") as f:
+                    f.write(compressed)
+                report[f"{PRECOMPRESSED[encoding][1:]}_bytes"] += len(compressed)
+    shutil.rmtree(output, ignore_errors=True)
+    os.rename(staging, output)
+    report["assets"] = {path: posixpath.basename(name) for path, name in renamed.items()}
+    return report
+
+class FrontendFiles(StaticFiles):
+    # StaticFiles plus cache headers and the precompressed variants written by build()
+    def __init__(self, directory: str, **kwargs):
+        super().__init__(directory=directory, **kwargs)
+        self.variants = {}  # real path -> encodings with a precompressed file next to it
+        for root, _, names in os.walk(directory):
+            for name in names:
+                path = os.path.realpath(os.path.join(root, name))
+                self.variants[path] = tuple(e for e, suffix in PRECOMPRESSED.items() if name + suffix in names)
+
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        full_path = str(full_path)
+        headers = {"Cache-Control": IMMUTABLE if _HASHED.search(full_path) else "no-cache"}
+        available = self.variants.get(full_path, ())
+        if available:
+            headers["Vary"] = "Accept-Encoding"
+        encoding = compression.negotiate(request_headers.get("accept-encoding", ""), available) if available else None
+        if encoding is not None:
+            variant = full_path + PRECOMPRESSED[encoding]
+            headers["Content-Encoding"] = encoding
+            response = FileResponse(variant, status_code=status_code, stat_result=os.stat(variant),
+                                    media_type=mimetypes.guess_type(full_path)[0], headers=headers)
+        else:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
+
+def static_app() -> FrontendFiles:
+    if os.path.isfile(os.path.join(FRONTEND_BUILD_DIR, "index.html")):
+        logging.info(f"Serving the frontend build from {FRONTEND_BUILD_DIR}")
+        return FrontendFiles(directory=FRONTEND_BUILD_DIR, html=True)
+    # No build: sources are served with revalidation and compressed on the fly
+    return FrontendFiles(directory=FRONTEND_DIR, html=True)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the frontend with content-hashed, precompressed assets")
+    parser.add_argument("--source", default=FRONTEND_DIR)
+    parser.add_argument("--output", default=FRONTEND_BUILD_DIR)
+    args = parser.parse_args()
+    report = build(args.source, args.output)
+    print(f"Built {report['files']} files ({report['bytes']} bytes; br {report['br_bytes']}, gzip {report['gz_bytes']}) into {args.output}")
+    for path, name in report["assets"].items():
+        print(f"  {path} -> {name}")
@@ -0,0 +1,103 @@
+import os
+import asyncio
+import logging
+import aiohttp
+import time
+import metrics
+from contextlib import asynccontextmanager
+from urllib.parse import urlsplit
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Connection pool settings shared by every upstream call (OpenWeatherMap, Nominatim, Open-Meteo, YouTube)
+UPSTREAM_POOL_LIMIT = int(os.getenv("UPSTREAM_POOL_LIMIT", "100"))
+UPSTREAM_LIMIT_PER_HOST = int(os.getenv("UPSTREAM_LIMIT_PER_HOST", "20"))
+UPSTREAM_DNS_TTL = int(os.getenv("UPSTREAM_DNS_TTL", "300"))
+UPSTREAM_KEEPALIVE = float(os.getenv("UPSTREAM_KEEPALIVE", "30"))
+UPSTREAM_TIMEOUT = float(os.getenv("UPSTREAM_TIMEOUT", "10"))
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3"))
+# Per-host concurrency caps, e.g. "nominatim.openstreetmap.org=1,api.openweathermap.org=10"
+UPSTREAM_HOST_LIMITS = os.getenv("UPSTREAM_HOST_LIMITS", "nominatim.openstreetmap.org=1")
+
+_session: aiohttp.ClientSession | None = None
+_host_semaphores: dict[str, asyncio.Semaphore] = {}
+
+def _parse_host_limits(value: str) -> dict[str, int]:
+    limits = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        host, limit = item.split("=", 1)
+        limits[host.strip().lower()] = int(limit)
+    return limits
+
+HOST_LIMITS = _parse_host_limits(UPSTREAM_HOST_LIMITS)
+
+def _new_session() -> aiohttp.ClientSession:
+    connector = aiohttp.TCPConnector(
+        limit=UPSTREAM_POOL_LIMIT,
+        limit_per_host=UPSTREAM_LIMIT_PER_HOST,
+        ttl_dns_cache=UPSTREAM_DNS_TTL,
+        use_dns_cache=True,
+        keepalive_timeout=UPSTREAM_KEEPALIVE,
+    )
+    timeout = aiohttp.ClientTimeout(total=UPSTREAM_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT)
+    return aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+async def start_client():
+    global _session
+    if _session is None or _session.closed:
+        _session = _new_session()
+        logging.info("Upstream HTTP client started")
+    return _session
+
+async def close_client():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        logging.info("Upstream HTTP client closed")
+    _session = None
+    _host_semaphores.clear()
+
+def get_session() -> aiohttp.ClientSession:
+    # Lazily create the pool for scripts that never run the app lifespan
+    global _session
+    if _session is None or _session.closed:
+        _session = _new_session()
+    return _session
+
+def _host_semaphore(host: str) -> asyncio.Semaphore | None:
+    limit = HOST_LIMITS.get(host)
+    if not limit:
+        return None
+    if host not in _host_semaphores:
+        _host_semaphores[host] = asyncio.Semaphore(limit)
+    return _host_semaphores[host]
+
+@asynccontextmanager
+async def _request(url: str, **kwargs):
+    host = (urlsplit(url).hostname or "").lower()
+    semaphore = _host_semaphore(host)
+    if semaphore is None:
+        async with get_session().get(url, **kwargs) as response:
+            yield response
+        return
+    async with semaphore:
+        async with get_session().get(url, **kwargs) as response:
+            yield response
+
+@asynccontextmanager
+async def get(url: str, provider: str | None = None, **kwargs):
+    provider = provider or (urlsplit(url).hostname or "unknown")
+    started = time.perf_counter()
+    try:
+        async with _request(url, **kwargs) as response:
+            if response.status >= 400:
+                metrics.upstream_errors.inc(provider, str(response.status))
+            yield response
+    except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+        metrics.upstream_errors.inc(provider, type(e).__name__)
+        raise
+    finally:
+        metrics.upstream_request_duration.observe(time.perf_counter() - started, provider)
@@ -44,12 +44,62 @@
 # @app.get("/", include_in_schema=False)
 # async def root():
 #     return RedirectResponse(url="/docs")
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from routers.weather import router as weather_router
+from routers.timeseries import router as timeseries_router
+from routers.analytics import router as analytics_router
+from routers.exports import router as exports_router
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-
-app = FastAPI(title="Weather App Backend by Yagya Bahadur Shahi")
+import compression
+import frontend
+import http_client
+import metrics
+import shared_state
+from resilience import PROVIDERS
+from db import init_db, close_db, engine, async_engine
+from weather_api import weather_cache, geocode_cache, warm_geocode_cache
+from services.refresh_scheduler import scheduler
+from services.live_service import hub
+from services.analytics_service import analytics_cache
+from services.export_jobs import export_jobs
+from services.response_cache import response_cache
+from services.record_writer import record_writer
+from services.retention import retention
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    init_db()
+    warm_geocode_cache()
+    # One pooled upstream client for the whole app lifetime
+    await http_client.start_client()
+    scheduler.start()
+    retention.start()
+    yield
+    await scheduler.stop()
+    await retention.stop()
+    await hub.stop()
+    await record_writer.stop()
+    export_jobs.shutdown()
+    await http_client.close_client()
+    await shared_state.close()
+    await close_db()
+
+app = FastAPI(title="Weather App Backend by Yagya Bahadur Shahi", lifespan=lifespan)
+
+# Request timing for /metrics
+app.add_middleware(metrics.MetricsMiddleware)
+metrics.instrument_engine(engine)
+if async_engine is not None:
+    metrics.instrument_engine(async_engine.sync_engine)
+metrics.register_cache("weather", weather_cache)
+metrics.register_cache("geocode", geocode_cache)
+metrics.register_cache("analytics", analytics_cache)
+metrics.register_cache("responses", response_cache)
+
+# gzip/br/zstd by Accept-Encoding; precompressed frontend files pass through untouched
+app.add_middleware(compression.CompressionMiddleware)
 
 # Add CORS middleware (restricted for security)
 app.add_middleware(
@@ -61,6 +111,9 @@ app.add_middleware(
 )
 
 app.include_router(weather_router, prefix="/weather")
+app.include_router(timeseries_router, prefix="/timeseries")
+app.include_router(analytics_router, prefix="/analytics")
+app.include_router(exports_router, prefix="/exports")
 
 @app.get("/info")
 async def info():
@@ -68,5 +121,34 @@ async def info():
         "description": "Weather App Backend by Yagya Bahadur Shahi. Learn more at Product Manager Accelerator on LinkedIn."
     }
 
-# Serve frontend statically at root
-app.mount("/", StaticFiles(directory="weather_app_frontend", html=True), name="frontend")
\ No newline at end of file
+@app.get("/cache/stats")
+async def cache_stats():
+    return {"weather": weather_cache.stats(), "geocode": geocode_cache.stats(), "analytics": analytics_cache.stats(), "responses": response_cache.stats(),
+            "shared": await shared_state.stats()}
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/scheduler/status")
+async def scheduler_status():
+    return scheduler.status()
+
+@app.get("/retention/status")
+async def retention_status():
+    return retention.status()
+
+@app.get("/writer/status")
+async def writer_status():
+    return record_writer.status()
+
+@app.get("/live/status")
+async def live_status():
+    return hub.status()
+
+@app.get("/upstream/status")
+async def upstream_status():
+    return {name: provider.status() for name, provider in PROVIDERS.items()}
+
+# Serve frontend statically at root (the hashed, precompressed build when `python frontend.py` has been run)
+app.mount("/", frontend.static_app(), name="frontend")
\ No newline at end of file
@@ -0,0 +1,183 @@
+import threading
+import time
+from bisect import bisect_left
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from starlette.routing import Mount
+
+# Minimal Prometheus-style registry. Updates are a dict lookup plus a short
+# lock, so instrumentation can stay on under production load.
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def inc(self, *label_values, amount: float = 1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for values, count in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, values)} {count}")
+        return lines
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._values: dict = {}  # labels -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def observe(self, value: float, *label_values):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(label_values)
+            if series is None:
+                series = self._values[label_values] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                series[index] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labels + ("le",)
+        for values, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(names, values + (bound,))} {cumulative}")
+            lines.append(f"{self.name}_bucket{_format_labels(names, values + ('+Inf',))} {series[-1]}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, values)} {series[-2]}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, values)} {series[-1]}")
+        return lines
+
+http_request_duration = Histogram("http_request_duration_seconds", "HTTP request latency by route", ("method", "route", "status"))
+upstream_request_duration = Histogram("upstream_request_duration_seconds", "Upstream call latency by provider", ("provider",))
+upstream_errors = Counter("upstream_errors_total", "Failed upstream calls by provider", ("provider", "reason"))
+upstream_retries = Counter("upstream_retries_total", "Upstream retries by provider", ("provider",))
+upstream_hedges = Counter("upstream_hedged_requests_total", "Hedged upstream requests by provider", ("provider",))
+upstream_short_circuits = Counter("upstream_short_circuits_total", "Calls rejected by an open circuit breaker", ("provider",))
+db_query_duration = Histogram("db_query_duration_seconds", "Database statement latency", ("operation",))
+db_commit_duration = Histogram("db_commit_duration_seconds", "Database commit latency")
+export_bytes = Counter("export_bytes_total", "Bytes written by exports", ("format",))
+export_rows = Counter("export_rows_total", "Rows written by exports", ("format",))
+write_batch_size = Histogram("write_batch_size", "Writes committed per group commit", buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000))
+compression_input_bytes = Counter("compression_input_bytes_total", "Response bytes before compression", ("encoding",))
+compression_output_bytes = Counter("compression_output_bytes_total", "Response bytes after compression", ("encoding",))
+
+_caches: dict = {}
+
+def register_cache(name: str, cache):
+    _caches[name] = cache
+
+def _render_caches() -> list[str]:
+    lines = []
+    for metric, key, kind in (
+        ("cache_hits_total", "hits", "counter"),
+        ("cache_misses_total", "misses", "counter"),
+        ("cache_coalesced_total", "coalesced", "counter"),
+        ("cache_evictions_total", "evictions", "counter"),
+        ("cache_stale_served_total", "stale_served", "counter"),
+        ("cache_shared_hits_total", "shared_hits", "counter"),
+        ("cache_shared_coalesced_total", "shared_coalesced", "counter"),
+        ("cache_entries", "size", "gauge"),
+        ("cache_hit_ratio", "hit_ratio", "gauge"),
+    ):
+        lines.append(f"# TYPE {metric} {kind}")
+        for name, cache in sorted(_caches.items()):
+            lines.append(f'{metric}{{cache="{name}"}} {cache.stats()[key]}')
+    return lines
+
+def render() -> str:
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    lines.extend(_render_caches())
+    return "\n".join(lines) + "\n"
+
+def instrument_engine(sync_engine):
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        operation = statement.lstrip().split(" ", 1)[0].upper()
+        db_query_duration.observe(time.perf_counter() - started, operation)
+
+    @event.listens_for(sync_engine, "handle_error")
+    def _error(context):
+        # after_cursor_execute doesn't run when the statement raises: drop its start time here
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if context.execution_context is not None and started:
+            started.pop()
+
+@event.listens_for(Session, "before_commit")
+def _before_commit(session):
+    session.info["commit_started"] = time.perf_counter()
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    started = session.info.pop("commit_started", None)
+    if started is not None:
+        db_commit_duration.observe(time.perf_counter() - started)
+
+def _route_label(scope) -> str:
+    # Route templates (not raw paths) keep label cardinality bounded
+    route = scope.get("route")
+    if route is None or isinstance(route, Mount):
+        # Mounts (the frontend) get one label for every file under them
+        return "static" if scope.get("endpoint") is not None else "unmatched"
+    template = route.path
+    # Routes of an included router may report their path without the router's prefix;
+    # prefixes are literal, so the leading segments of the request path supply it
+    segments = scope["path"].split("/")
+    extra = len(segments) - len(template.split("/"))
+    if extra > 0 and ":path}" not in template:
+        template = "/".join(segments[:extra + 1]) + template
+    return template
+
+class MetricsMiddleware:
+    # Pure ASGI middleware (no BaseHTTPMiddleware) so streaming responses are untouched
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_request_duration.observe(time.perf_counter() - started, scope["method"], _route_label(scope), status)
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, Date
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index
+from datetime import datetime, timezone
 from db import Base
 
 class WeatherRecord(Base):
@@ -10,4 +11,80 @@ class WeatherRecord(Base):
     date_range_end = Column(Date)
     temperature = Column(Float)  # Average or current temp
     weather_description = Column(String)
-    # Add more fields as needed, e.g., precipitation, etc.
\ No newline at end of file
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))  # UTC; NULL for rows from before this column
+    latitude = Column(Float)  # Resolved coordinates; NULL for imported and older rows
+    longitude = Column(Float)
+    cell = Column(String)  # Geohash cell of latitude/longitude (see utils/geo.py)
+    # Add more fields as needed, e.g., precipitation, etc.
+
+    # Composite indexes for keyset pagination (id) combined with the list filters
+    __table_args__ = (
+        Index("ix_weather_records_location_id", "location", "id"),
+        Index("ix_weather_records_date_range", "date_range_start", "date_range_end"),
+        Index("ix_weather_records_temperature", "temperature"),
+        Index("ix_weather_records_created_at", "created_at"),
+        Index("ix_weather_records_cell", "cell"),
+        Index("ix_weather_records_lat_lon", "latitude", "longitude"),  # Bounding-box prefilter for /weather/nearby
+    )
+
+class WeatherRollup(Base):
+    # Aggregates of weather_records rows aged out by services/retention.py, per location and day or month
+    __tablename__ = "weather_rollups"
+
+    id = Column(Integer, primary_key=True)
+    location = Column(String, nullable=False)
+    period = Column(String(5), nullable=False)  # "day" or "month"
+    period_start = Column(Date, nullable=False)  # The day, or the first of the month, of the rows' created_at (UTC)
+    records = Column(Integer, nullable=False)  # Raw rows folded in
+    temperature_count = Column(Integer, nullable=False)  # Rows with a temperature; sum/count keeps the mean exact across merges
+    temperature_sum = Column(Float)
+    temperature_min = Column(Float)
+    temperature_max = Column(Float)
+    weather_description = Column(String)  # Latest in the period
+    latitude = Column(Float)
+    longitude = Column(Float)
+    cell = Column(String)
+
+    __table_args__ = (
+        Index("ix_weather_rollups_location_period", "location", "period", "period_start", unique=True),
+        Index("ix_weather_rollups_period_start", "period", "period_start"),
+    )
+
+class GeocodeCache(Base):
+    __tablename__ = "geocode_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    query = Column(String, unique=True, index=True)  # Normalized location string
+    name = Column(String)
+    latitude = Column(Float)
+    longitude = Column(Float)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+class WeatherObservation(Base):
+    # Per-location time series (hourly and daily) from Open-Meteo; one row per timestamp
+    __tablename__ = "weather_observations"
+
+    id = Column(Integer, primary_key=True)
+    location = Column(String, nullable=False)  # Geohash cell of the place (see utils/geo.py)
+    resolution = Column(String(6), nullable=False)  # "hourly" or "daily"
+    ts = Column(DateTime, nullable=False)  # UTC; midnight for daily rows
+    temperature = Column(Float)  # Hourly value or daily mean
+    temperature_min = Column(Float)
+    temperature_max = Column(Float)
+    precipitation = Column(Float)  # mm; daily rows hold the day's sum
+    wind_speed = Column(Float)  # km/h; daily rows hold the day's max
+    weather_code = Column(Integer)  # WMO code
+    fetched_at = Column(DateTime, nullable=False)
+
+    # Range scans are always per location and ordered by time
+    __table_args__ = (
+        Index("ix_weather_observations_location_ts", "location", "ts", "resolution", unique=True),
+    )
+
+class TableVersion(Base):
+    # Change counter per table, bumped in the same transaction as every write; drives ETags and cache keys
+    __tablename__ = "table_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, nullable=False)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import aiohttp
+from dotenv import load_dotenv
+import metrics
+import shared_state
+
+load_dotenv()
+
+class UpstreamError(ValueError):
+    # ValueError subclass so existing "except ValueError" handling keeps working
+    def __init__(self, message: str, status: int | None = None, retry_after: float | None = None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status == 429 or self.status >= 500
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+class CircuitBreaker:
+    # closed -> open after `threshold` consecutive failures; after `reset_timeout`
+    # one trial call is let through (half-open) and its outcome decides the state.
+    def __init__(self, threshold: int, reset_timeout: float):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._trial_in_flight = False
+        if self.failures >= self.threshold or self.opened_at is not None:
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        # The trial ended without a verdict (the caller was cancelled): let the next call try
+        self._trial_in_flight = False
+
+class Provider:
+    def __init__(self, name: str, rate: float, burst: int, retries: int, backoff_base: float, backoff_max: float,
+                 timeout: float, breaker_threshold: int, breaker_reset: float, hedge_delay: float):
+        self.name = name
+        # Shared across workers when SHARED_STATE_URL is set, since the quota is per API key, not per process
+        self.bucket = shared_state.token_bucket(name, rate, burst) if rate > 0 else None
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.breaker = CircuitBreaker(breaker_threshold, breaker_reset)
+        self.hedge_delay = hedge_delay
+
+    @classmethod
+    def from_env(cls, name: str, prefix: str, rate: float, burst: int, hedge_delay: float = 0) -> "Provider":
+        env = lambda key, default: os.getenv(f"{prefix}_{key}", default)
+        return cls(
+            name,
+            rate=float(env("RATE_LIMIT", rate)),
+            burst=int(env("BURST", burst)),
+            retries=int(env("RETRIES", 2)),
+            backoff_base=float(env("BACKOFF_BASE", 0.2)),
+            backoff_max=float(env("BACKOFF_MAX", 5)),
+            timeout=float(env("TIMEOUT", 5)),
+            breaker_threshold=int(env("BREAKER_THRESHOLD", 5)),
+            breaker_reset=float(env("BREAKER_RESET", 30)),
+            hedge_delay=float(env("HEDGE_DELAY", hedge_delay)),
+        )
+
+    async def _attempt(self, fn):
+        if self.bucket is not None:
+            await self.bucket.acquire()
+        return await asyncio.wait_for(fn(), self.timeout)
+
+    async def _hedged(self, fn):
+        # Fire a second identical request if the first is still pending after hedge_delay
+        first = asyncio.ensure_future(self._attempt(fn))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_delay)
+        if done:
+            return first.result()
+        metrics.upstream_hedges.inc(self.name)
+        second = asyncio.ensure_future(self._attempt(fn))
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        retry_after = getattr(error, "retry_after", None)
+        if retry_after:
+            return min(retry_after, self.backoff_max)
+        # Full jitter: spreads retries from many clients instead of synchronizing them
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def call(self, fn):
+        # fn is an idempotent coroutine factory (a GET); it may be invoked more than once
+        for attempt in range(self.retries + 1):
+            if not self.breaker.allow():
+                metrics.upstream_short_circuits.inc(self.name)
+                raise CircuitOpenError(f"{self.name} is unavailable (circuit open)", status=503)
+            trial = self.breaker.state == "half-open"
+            try:
+                result = await (self._hedged(fn) if self.hedge_delay > 0 else self._attempt(fn))
+            except UpstreamError as e:
+                if not e.retryable:
+                    self.breaker.record_success()  # The provider answered; the request was bad
+                    raise
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = UpstreamError(f"{self.name} request failed: {type(e).__name__} {e}".strip())
+            except Exception:
+                # e.g. KeyError from a malformed 200 payload: a provider fault, but retrying won't fix it
+                self.breaker.record_failure()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+            finally:
+                # Never leave the half-open trial claimed, whatever ended the attempt (CancelledError included)
+                if trial:
+                    self.breaker.release()
+            self.breaker.record_failure()
+            if attempt == self.retries:
+                raise error
+            delay = self._backoff(attempt, error)
+            metrics.upstream_retries.inc(self.name)
+            logging.warning(f"Retrying {self.name} in {delay:.2f}s after: {error}")
+            await asyncio.sleep(delay)
+
+    def status(self) -> dict:
+        return {"state": self.breaker.state, "consecutive_failures": self.breaker.failures}
+
+# Defaults follow each provider's published quota
+OPENWEATHER = Provider.from_env("openweathermap", "OPENWEATHER", rate=1, burst=10)  # Free tier: 60 calls/minute
+NOMINATIM = Provider.from_env("nominatim", "NOMINATIM", rate=1, burst=1)  # Usage policy: 1 request/second
+OPEN_METEO = Provider.from_env("open-meteo", "OPEN_METEO", rate=10, burst=20)  # 600 calls/minute non-commercial
+
+PROVIDERS = {p.name: p for p in (OPENWEATHER, NOMINATIM, OPEN_METEO)}
@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, Query
+from typing import Optional
+import services.analytics_service as analytics_service
+from db import get_db, DBSession
+
+router = APIRouter()
+
+@router.get("/summary")
+async def read_summary(days: Optional[int] = Query(None, ge=1), db: DBSession = Depends(get_db)):
+    return await analytics_service.summary(db, days)
+
+@router.get("/locations")
+async def read_locations(
+    days: Optional[int] = Query(None, ge=1, description="Only records created in the last N days"),
+    sort: str = "avg_temp",
+    desc: bool = True,
+    limit: int = Query(20, ge=1, le=1000),
+    db: DBSession = Depends(get_db),
+):
+    # e.g. hottest locations over the last 30 days: ?days=30&sort=avg_temp
+    return await analytics_service.by_location(db, days, sort, desc, limit)
+
+@router.get("/percentiles")
+async def read_percentiles(
+    location: Optional[str] = None,
+    days: Optional[int] = Query(None, ge=1),
+    p: str = Query("0.5,0.9,0.99", description="Comma-separated fractions"),
+    db: DBSession = Depends(get_db),
+):
+    try:
+        points = [float(v) for v in p.split(",") if v.strip()]
+    except ValueError:
+        points = []
+    return await analytics_service.percentiles(db, location, days, points)
+
+@router.get("/daily")
+async def read_daily(
+    location: Optional[str] = None,
+    days: int = Query(30, ge=1, le=3660),
+    window: int = Query(7, ge=1, le=365, description="Moving-average window in days"),
+    db: DBSession = Depends(get_db),
+):
+    return await analytics_service.daily(db, location, days, window)
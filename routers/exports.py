@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from services.export_jobs import export_jobs, JOB_FORMATS, EXTENSIONS
+
+router = APIRouter()
+
+@router.post("/{format}", status_code=202)
+async def create_export(format: str):
+    # Queue any format explicitly; GET /weather/export/{format} only queues PDF and large tables
+    return export_jobs.submit(format).to_dict()
+
+@router.get("/{job_id}")
+async def read_export(job_id: str):
+    return export_jobs.get(job_id).to_dict()
+
+@router.get("/{job_id}/download")
+async def download_export(job_id: str):
+    job = export_jobs.get(job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Export is {job.status}")
+    filename = f"weather_records.{EXTENSIONS.get(job.format, job.format)}"
+    return FileResponse(job.path, media_type=JOB_FORMATS[job.format], filename=filename)
@@ -0,0 +1,19 @@
+from fastapi import APIRouter
+from datetime import date
+import services.timeseries_service as timeseries_service
+
+router = APIRouter()
+
+@router.get("/")
+async def read_series(location: str, start: date, end: date, resolution: str = "daily"):
+    return await timeseries_service.get_series(location, start, end, resolution)
+
+@router.get("/summary")
+async def read_summary(location: str, start: date, end: date, resolution: str = "daily"):
+    # min/max/mean over the window, computed in SQL
+    return await timeseries_service.get_summary(location, start, end, resolution)
+
+@router.post("/backfill")
+async def backfill(location: str, start: date, end: date, resolution: str = "daily"):
+    # Downloads only the days not stored yet, in parallel chunks; reports what was fetched
+    return await timeseries_service.backfill(location, start, end, resolution)
@@ -1,34 +1,153 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from typing import List, Optional, Union
+from datetime import date
+import asyncio
+import json
+import logging
 import services.weather_service as weather_service
-from schemas import WeatherRequest, WeatherUpdate, WeatherResponse
-from db import get_db
+import services.import_service as import_service
+from services import response_cache
+from services.live_service import hub, LIVE_HEARTBEAT
+from schemas import WeatherRequest, WeatherUpdate, WeatherResponse, WeatherBatchResponse, WeatherListItem, WeatherRollupItem, WeatherNearbyItem, WeatherImportReport
+from db import get_db, DBSession
+from utils.serialization import FastJSONResponse
 
 router = APIRouter()
 
 @router.post("/", response_model=WeatherResponse)
-async def create_weather(request: WeatherRequest, db: Session = Depends(get_db)):
+async def create_weather(request: WeatherRequest, db: DBSession = Depends(get_db)):
     return await weather_service.create_weather_record(request, db)
 
-@router.get("/", response_model=List[WeatherResponse])
-async def read_weathers(db: Session = Depends(get_db)):
-    return weather_service.get_weathers(db)
+@router.post("/batch", response_model=WeatherBatchResponse)
+async def create_weather_batch(requests: List[WeatherRequest], db: DBSession = Depends(get_db)):
+    return await weather_service.create_weather_batch(requests, db)
+
+@router.post("/import/{format}", response_model=WeatherImportReport)
+async def import_data(
+    format: str,
+    request: Request,
+    validate_locations: bool = False,
+    batch_size: int = import_service.IMPORT_BATCH_SIZE,
+    db: DBSession = Depends(get_db),
+):
+    # Raw request body in the csv/ndjson layout produced by /export, e.g. curl --data-binary @export.csv
+    return await import_service.import_records(format, request.stream(), db, validate_locations, batch_size)
+
+@router.get("/", response_model=List[Union[WeatherListItem, WeatherRollupItem]], response_model_exclude_unset=True)
+async def read_weathers(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    location: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    min_temp: Optional[float] = None,
+    max_temp: Optional[float] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. location,temperature"),
+    resolution: str = Query("raw", description="raw records, or the day/month rollups of records past retention"),
+    db: DBSession = Depends(get_db),
+):
+    async def build():
+        items, next_cursor = await weather_service.list_weathers(db, cursor, limit, location, start, end, min_temp, max_temp, fields, resolution)
+        headers = {}
+        if next_cursor:
+            headers["X-Next-Cursor"] = next_cursor
+            headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+        # Rows are already plain dicts; response_model only documents the shape
+        return FastJSONResponse(items, headers=headers)
+    return await response_cache.conditional(request, db, build)
+
+@router.get("/nearby", response_model=List[WeatherNearbyItem])
+async def read_nearby_weathers(
+    request: Request,
+    location: Optional[str] = None,
+    lat: Optional[float] = None,
+    lon: Optional[float] = None,
+    radius_km: float = Query(25, gt=0),
+    limit: int = Query(50, ge=1, le=1000),
+    db: DBSession = Depends(get_db),
+):
+    # Stored records around a place or point, nearest first, with distance_km
+    async def build():
+        return FastJSONResponse(await weather_service.nearby_weathers(db, location, lat, lon, radius_km, limit))
+    return await response_cache.conditional(request, db, build)
+
+@router.get("/stream")
+async def stream_weather(request: Request, location: List[str] = Query(..., description="Repeat to watch several locations")):
+    # Server-Sent Events: pushed current-weather updates, no client polling
+    try:
+        subscription = hub.subscribe(location)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                update = await subscription.next(timeout=LIVE_HEARTBEAT)
+                yield f"data: {json.dumps(update)}\n\n" if update is not None else ": heartbeat\n\n"
+        finally:
+            subscription.close()
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(events(), media_type="text/event-stream", headers=headers)
+
+def _socket_locations(message: dict, key: str) -> list[str]:
+    locations = message.get(key, [])
+    if not isinstance(locations, list) or not all(isinstance(l, str) for l in locations):
+        raise ValueError(f'"{key}" must be a list of locations')
+    return locations
+
+@router.websocket("/ws")
+async def weather_socket(websocket: WebSocket, location: List[str] = Query([])):
+    # Same feed as /stream; clients send {"subscribe": [...]} / {"unsubscribe": [...]} to change it
+    await websocket.accept()
+    subscription = hub.subscribe([])
+
+    async def forward():
+        while True:
+            await websocket.send_json(await subscription.next())
+
+    sender = asyncio.create_task(forward())
+    try:
+        subscription.add(location)
+        while True:
+            message = await websocket.receive_json()
+            try:
+                if not isinstance(message, dict):
+                    raise ValueError('Expected an object like {"subscribe": [...]}')
+                unsubscribe, subscribe = _socket_locations(message, "unsubscribe"), _socket_locations(message, "subscribe")
+                subscription.remove(unsubscribe)
+                subscription.add(subscribe)
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
+    except (WebSocketDisconnect, ValueError):
+        pass
+    finally:
+        sender.cancel()
+        subscription.close()
+        # Collect the sender's outcome so a failed send is logged rather than left unretrieved
+        outcome = (await asyncio.gather(sender, return_exceptions=True))[0]
+        if isinstance(outcome, Exception):
+            logging.info(f"WebSocket sender stopped: {type(outcome).__name__} {outcome}".strip())
 
 @router.get("/{weather_id}", response_model=WeatherResponse)
-async def read_weather(weather_id: int, db: Session = Depends(get_db)):
-    return weather_service.get_weather(weather_id, db)
+async def read_weather(weather_id: int, request: Request, db: DBSession = Depends(get_db)):
+    async def build():
+        return FastJSONResponse((await weather_service.get_weather(weather_id, db)).model_dump())
+    return await response_cache.conditional(request, db, build)
 
 @router.put("/{weather_id}", response_model=WeatherResponse)
-async def update_weather(weather_id: int, update: WeatherUpdate, db: Session = Depends(get_db)):
+async def update_weather(weather_id: int, update: WeatherUpdate, db: DBSession = Depends(get_db)):
     return await weather_service.update_weather(weather_id, update, db)
 
 @router.delete("/{weather_id}")
-async def delete_weather(weather_id: int, db: Session = Depends(get_db)):
-    return weather_service.delete_weather(weather_id, db)
+async def delete_weather(weather_id: int, db: DBSession = Depends(get_db)):
+    return await weather_service.delete_weather(weather_id, db)
 
 @router.get("/export/{format}")
-async def export_data(format: str, db: Session = Depends(get_db)):
-    if format not in ["json", "csv", "pdf", "xml", "markdown"]:
+async def export_data(format: str, request: Request, db: DBSession = Depends(get_db)):
+    if format not in ["json", "ndjson", "csv", "pdf", "xml", "markdown"]:
         raise HTTPException(status_code=400, detail="Unsupported format")
-    return weather_service.export_data(format, db)
\ No newline at end of file
+    # Conditional only: streamed bodies are not kept, but an unchanged table answers 304
+    return await response_cache.conditional(request, db, lambda: weather_service.export_data(format, db))
\ No newline at end of file
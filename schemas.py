@@ -1,6 +1,6 @@
 from pydantic import BaseModel
-from datetime import date
-from typing import Optional
+from datetime import date, datetime
+from typing import Optional, List
 
 class WeatherRequest(BaseModel):
     location: str  # e.g., "New York", "10001", "40.7128,-74.0060", "Eiffel Tower"
@@ -23,4 +23,64 @@ class WeatherResponse(BaseModel):
     weather_description: str
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class WeatherListItem(BaseModel):
+    # Listing row; only the columns requested via fields= are present
+    id: int
+    location: Optional[str] = None
+    date_range_start: Optional[date] = None
+    date_range_end: Optional[date] = None
+    temperature: Optional[float] = None
+    weather_description: Optional[str] = None
+
+class WeatherRollupItem(BaseModel):
+    # ?resolution=day|month listing row: aggregates of the records folded in by retention
+    id: int
+    location: Optional[str] = None
+    period: Optional[str] = None
+    period_start: Optional[date] = None
+    records: Optional[int] = None
+    avg_temp: Optional[float] = None
+    min_temp: Optional[float] = None
+    max_temp: Optional[float] = None
+    weather_description: Optional[str] = None
+
+class WeatherNearbyItem(WeatherResponse):
+    latitude: float
+    longitude: float
+    created_at: Optional[datetime] = None
+    distance_km: float
+
+class WeatherBatchItem(BaseModel):
+    index: int  # Position in the submitted batch
+    status_code: int
+    record: Optional[WeatherResponse] = None
+    error: Optional[str] = None
+
+class WeatherBatchResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[WeatherBatchItem]
+
+class WeatherImportRow(BaseModel):
+    # One row of a CSV/NDJSON import; matches the export columns (id is ignored, new ids are assigned)
+    location: str
+    date_range_start: Optional[date] = None
+    date_range_end: Optional[date] = None
+    temperature: float
+    weather_description: str
+
+class WeatherImportError(BaseModel):
+    line: int  # 1-based line in the upload (CSV header is line 1)
+    error: str
+
+class WeatherImportReport(BaseModel):
+    format: str
+    rows: int
+    imported: int
+    failed: int
+    duration_s: float
+    rows_per_s: float
+    errors: List[WeatherImportError]
+    errors_truncated: bool = False
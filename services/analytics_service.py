@@ -0,0 +1,165 @@
+import os
+from datetime import datetime, timedelta, timezone
+from fastapi import HTTPException
+from sqlalchemy import select, func, case, literal, union_all
+from models import WeatherRecord, WeatherRollup
+from db import DBSession
+from utils.cache import TTLCache
+from services import versioning
+
+# All aggregation runs in the database; only the (small) result sets come back.
+# Cache keys include the weather_records version, so a write makes older results
+# unreachable; ANALYTICS_CACHE_TTL bounds them anyway since "last N days" windows
+# move with the clock. Rows folded away by services/retention.py still count: summary,
+# locations and daily read the rollups alongside the raw rows (a rollup falls inside a
+# "last N days" window by its period start). Percentiles need the raw values, so they
+# only cover rows that have not been rolled up.
+ANALYTICS_CACHE_SIZE = int(os.getenv("ANALYTICS_CACHE_SIZE", "256"))
+ANALYTICS_CACHE_TTL = float(os.getenv("ANALYTICS_CACHE_TTL", "300"))  # seconds
+ANALYTICS_MAX_ROWS = int(os.getenv("ANALYTICS_MAX_ROWS", "1000"))
+
+analytics_cache = TTLCache(maxsize=ANALYTICS_CACHE_SIZE)
+
+SORT_COLUMNS = {"avg_temp", "min_temp", "max_temp", "records"}
+
+def _since(days: int | None) -> datetime | None:
+    if days is None:
+        return None
+    return datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=days)
+
+def _filters(location: str | None, days: int | None) -> list:
+    filters = [WeatherRecord.temperature.is_not(None)]
+    if location is not None:
+        filters.append(WeatherRecord.location == location)
+    since = _since(days)
+    if since is not None:
+        filters.append(WeatherRecord.created_at >= since)
+    return filters
+
+def _readings(location: str | None, days: int | None, periods: tuple = ("day", "month")):
+    # Raw rows and rollups in one shape: reading count, temperature sum, min and max per location and day
+    raw = select(
+        WeatherRecord.location,
+        func.date(WeatherRecord.created_at).label("day"),
+        literal(1).label("n"),
+        WeatherRecord.temperature.label("total"),
+        WeatherRecord.temperature.label("low"),
+        WeatherRecord.temperature.label("high"),
+    ).where(*_filters(location, days))
+    filters = [WeatherRollup.period.in_(periods), WeatherRollup.temperature_count > 0]
+    if location is not None:
+        filters.append(WeatherRollup.location == location)
+    since = _since(days)
+    if since is not None:
+        filters.append(WeatherRollup.period_start >= since.date())
+    rollups = select(
+        WeatherRollup.location,
+        WeatherRollup.period_start,
+        WeatherRollup.temperature_count,
+        WeatherRollup.temperature_sum,
+        WeatherRollup.temperature_min,
+        WeatherRollup.temperature_max,
+    ).where(*filters)
+    return union_all(raw, rollups).subquery()
+
+def _round(value, digits: int = 2):
+    return round(value, digits) if value is not None else None
+
+async def _cached(db: DBSession, key: tuple, load):
+    version, _ = await versioning.current(db)
+    return await analytics_cache.get_or_load(key + (version,), load, ANALYTICS_CACHE_TTL)
+
+async def summary(db: DBSession, days: int | None) -> dict:
+    async def load():
+        readings = _readings(None, days)
+        stmt = select(
+            func.coalesce(func.sum(readings.c.n), 0),
+            func.count(func.distinct(readings.c.location)),
+            func.sum(readings.c.total) / func.sum(readings.c.n),
+            func.min(readings.c.low),
+            func.max(readings.c.high),
+        )
+        records, locations, avg_temp, min_temp, max_temp = (await db.execute(stmt)).one()
+        return {"records": records, "locations": locations, "avg_temp": _round(avg_temp), "min_temp": min_temp, "max_temp": max_temp}
+    return await _cached(db, ("summary", days), load)
+
+async def by_location(db: DBSession, days: int | None, sort: str, descending: bool, limit: int) -> list[dict]:
+    if sort not in SORT_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(sorted(SORT_COLUMNS))}")
+
+    async def load():
+        readings = _readings(None, days)
+        columns = {
+            "records": func.sum(readings.c.n),
+            "avg_temp": func.sum(readings.c.total) / func.sum(readings.c.n),
+            "min_temp": func.min(readings.c.low),
+            "max_temp": func.max(readings.c.high),
+        }
+        order = columns[sort].desc() if descending else columns[sort].asc()
+        stmt = (
+            select(readings.c.location, *[c.label(name) for name, c in columns.items()])
+            .group_by(readings.c.location)
+            .order_by(order, readings.c.location)
+            .limit(limit)
+        )
+        return [
+            {"location": row.location, "records": row.records, "avg_temp": _round(row.avg_temp), "min_temp": row.min_temp, "max_temp": row.max_temp}
+            for row in await db.execute(stmt)
+        ]
+    return await _cached(db, ("by_location", days, sort, descending, limit), load)
+
+async def percentiles(db: DBSession, location: str | None, days: int | None, points: list[float]) -> list[dict]:
+    if not points or any(not 0 < p <= 1 for p in points):
+        raise HTTPException(status_code=400, detail="p must be comma-separated fractions in (0, 1]")
+
+    async def load():
+        # Nearest-rank percentiles from window functions (portable: no percentile_cont on SQLite)
+        ranked = (
+            select(
+                WeatherRecord.location,
+                WeatherRecord.temperature,
+                func.row_number().over(partition_by=WeatherRecord.location, order_by=WeatherRecord.temperature).label("rank"),
+                func.count().over(partition_by=WeatherRecord.location).label("total"),
+            )
+            .where(*_filters(location, days))
+            .subquery()
+        )
+        columns = [
+            func.min(case((ranked.c.rank >= ranked.c.total * literal(p), ranked.c.temperature))).label(f"p{i}")
+            for i, p in enumerate(points)
+        ]
+        stmt = (
+            select(ranked.c.location, func.max(ranked.c.total).label("records"), *columns)
+            .group_by(ranked.c.location)
+            .order_by(ranked.c.location)
+            .limit(ANALYTICS_MAX_ROWS)
+        )
+        return [
+            {"location": row.location, "records": row.records, "percentiles": {f"p{round(p * 100, 2):g}": row[f"p{i}"] for i, p in enumerate(points)}}
+            for row in (await db.execute(stmt)).mappings()
+        ]
+    return await _cached(db, ("percentiles", location, days, tuple(points)), load)
+
+async def daily(db: DBSession, location: str | None, days: int, window: int) -> list[dict]:
+    async def load():
+        # Per-day buckets, plus a trailing moving average computed with a window over the buckets
+        readings = _readings(location, days, ("day",))
+        buckets = (
+            select(
+                readings.c.day,
+                func.sum(readings.c.n).label("records"),
+                (func.sum(readings.c.total) / func.sum(readings.c.n)).label("avg_temp"),
+                func.min(readings.c.low).label("min_temp"),
+                func.max(readings.c.high).label("max_temp"),
+            )
+            .group_by(readings.c.day)
+            .subquery()
+        )
+        moving = func.avg(buckets.c.avg_temp).over(order_by=buckets.c.day, rows=(-(window - 1), 0)).label("moving_avg")
+        stmt = select(buckets, moving).order_by(buckets.c.day).limit(ANALYTICS_MAX_ROWS)
+        return [
+            {"day": str(row.day), "records": row.records, "avg_temp": _round(row.avg_temp), "min_temp": row.min_temp,
+             "max_temp": row.max_temp, "moving_avg": _round(row.moving_avg)}
+            for row in await db.execute(stmt)
+        ]
+    return await _cached(db, ("daily", location, days, window), load)
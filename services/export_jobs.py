@@ -0,0 +1,206 @@
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from fastapi import HTTPException
+from services.export_service import SERIALIZERS, iter_records
+
+# Expensive exports (PDF, or any format over EXPORT_ASYNC_THRESHOLD rows) are
+# rendered in worker processes and written to EXPORT_JOBS_DIR, so the event loop
+# never blocks on report generation. Each job's state is kept next to its artifact
+# (<id>.job.json), so any worker sharing the directory can answer status polls and
+# downloads, not just the one that queued it.
+EXPORT_JOBS_DIR = os.getenv("EXPORT_JOBS_DIR", "./exports")
+EXPORT_JOB_WORKERS = int(os.getenv("EXPORT_JOB_WORKERS", "2"))
+EXPORT_ASYNC_THRESHOLD = int(os.getenv("EXPORT_ASYNC_THRESHOLD", "50000"))  # rows
+EXPORT_JOB_RETENTION = float(os.getenv("EXPORT_JOB_RETENTION", "3600"))  # seconds an artifact is kept
+EXPORT_MAX_PENDING_JOBS = int(os.getenv("EXPORT_MAX_PENDING_JOBS", "20"))
+
+JOB_FORMATS = {"pdf": "application/pdf", "json": "application/json", "ndjson": "application/x-ndjson",
+               "csv": "text/csv", "xml": "application/xml", "markdown": "text/markdown"}
+EXTENSIONS = {"markdown": "md"}
+_JOB_ID = re.compile(r"^[0-9a-f]{32}$")
+
+def _render_pdf(path: str) -> int:
+    from fpdf import FPDF
+    pdf = FPDF()
+    pdf.add_page()
+    pdf.set_font("Arial", size=12)
+    headers = ["ID", "Location", "Start Date", "End Date", "Temperature", "Description"]
+    pdf.cell(200, 10, txt="Weather Records", ln=1, align="C")
+    for header in headers:
+        pdf.cell(30, 10, header, 1)
+    pdf.ln()
+    rows = 0
+    for r in iter_records("pdf"):
+        rows += 1
+        pdf.cell(30, 10, str(r["id"]), 1)
+        pdf.cell(30, 10, r["location"], 1)
+        pdf.cell(30, 10, str(r["date_range_start"]), 1)
+        pdf.cell(30, 10, str(r["date_range_end"]), 1)
+        pdf.cell(30, 10, str(r["temperature"]), 1)
+        pdf.cell(30, 10, r["weather_description"], 1)
+        pdf.ln()
+    pdf.output(path, "F")
+    return rows
+
+def render_export(format: str, path: str) -> int:
+    # Runs in a worker process: reads the table itself and writes straight to disk
+    partial = path + ".part"
+    try:
+        if format == "pdf":
+            rows = _render_pdf(partial)
+        else:
+            rows = 0
+
+            def counted():
+                nonlocal rows
+                for record in iter_records(format):
+                    rows += 1
+                    yield record
+
+            with open(partial, "w", encoding="utf-8", newline="") as f:
+                for piece in SERIALIZERS[format](counted()):
+                    f.write(piece)
+        os.replace(partial, path)  # Downloads never see a half-written file
+    except BaseException:
+        if os.path.exists(partial):
+            os.remove(partial)
+        raise
+    return rows
+
+class ExportJob:
+    def __init__(self, id: str, format: str, path: str):
+        self.id = id
+        self.format = format
+        self.path = path
+        self.status = "queued"  # queued -> running -> done | failed
+        self.created_at = time.time()
+        self.finished_at: float | None = None
+        self.rows: int | None = None
+        self.size: int | None = None
+        self.error: str | None = None
+
+    STATE = ("id", "format", "status", "created_at", "finished_at", "rows", "size", "error")
+
+    @classmethod
+    def from_state(cls, state: dict, path: str) -> "ExportJob":
+        job = cls(state["id"], state["format"], path)
+        job.__dict__.update(state)
+        return job
+
+    def state(self) -> dict:
+        return {key: getattr(self, key) for key in self.STATE}
+
+    def to_dict(self) -> dict:
+        return {
+            **self.state(),
+            "status_url": f"/exports/{self.id}",
+            "download_url": f"/exports/{self.id}/download" if self.status == "done" else None,
+        }
+
+class ExportJobQueue:
+    def __init__(self, directory: str, workers: int, retention: float, max_pending: int):
+        self.directory = directory
+        self.workers = workers
+        self.retention = retention
+        self.max_pending = max_pending
+        self.jobs: dict[str, ExportJob] = {}  # Jobs this process queued; others are read from disk
+        self._pool: ProcessPoolExecutor | None = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: workers start clean instead of inheriting the event loop and DB pool by fork
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=get_context("spawn"))
+        return self._pool
+
+    def submit(self, format: str) -> ExportJob:
+        if format not in JOB_FORMATS:
+            raise HTTPException(status_code=400, detail="Unsupported format")
+        self._expire()
+        pending = sum(1 for job in self.jobs.values() if job.status in ("queued", "running"))
+        if pending >= self.max_pending:
+            raise HTTPException(status_code=429, detail="Too many exports in progress, try again later")
+        os.makedirs(self.directory, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        job = self.jobs[job_id] = ExportJob(job_id, format, self._path(job_id, format))
+        self._save(job)
+        asyncio.create_task(self._run(job))
+        return job
+
+    def _path(self, job_id: str, format: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.{EXTENSIONS.get(format, format)}")
+
+    def _state_path(self, job_id: str) -> str:
+        return os.path.join(self.directory, f"{job_id}.job.json")
+
+    def _save(self, job: ExportJob):
+        target = self._state_path(job.id)
+        with open(target + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(job.state(), f)
+        os.replace(target + ".tmp", target)  # Readers never see a half-written state file
+
+    def _load(self, job_id: str) -> ExportJob | None:
+        if not _JOB_ID.match(job_id):
+            return None
+        try:
+            with open(self._state_path(job_id), encoding="utf-8") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return ExportJob.from_state(state, self._path(job_id, state["format"]))
+
+    async def _run(self, job: ExportJob):
+        loop = asyncio.get_running_loop()
+        job.status = "running"
+        self._save(job)
+        try:
+            job.rows = await loop.run_in_executor(self._executor(), render_export, job.format, job.path)
+            job.size = os.path.getsize(job.path)
+            job.status = "done"
+        except Exception as e:
+            logging.error(f"Export job {job.id} ({job.format}) failed: {e}")
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+        job.finished_at = time.time()
+        self._save(job)
+
+    def get(self, job_id: str) -> ExportJob:
+        job = self.jobs.get(job_id) or self._load(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail="Export job not found")
+        return job
+
+    def _expire(self):
+        # Sweeps every file untouched for the retention period, whichever worker wrote it:
+        # finished artifacts and their state, and .part files left by renders that died
+        cutoff = time.time() - self.retention
+        for job_id, job in list(self.jobs.items()):
+            if job.finished_at is not None and job.finished_at < cutoff:
+                del self.jobs[job_id]
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return
+        for name in names:
+            path = os.path.join(self.directory, name)
+            job_id = name.split(".", 1)[0]
+            if job_id in self.jobs:
+                continue
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass  # Another worker swept it first
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+export_jobs = ExportJobQueue(EXPORT_JOBS_DIR, EXPORT_JOB_WORKERS, EXPORT_JOB_RETENTION, EXPORT_MAX_PENDING_JOBS)
@@ -0,0 +1,110 @@
+import csv
+import os
+from io import StringIO
+from typing import Iterable, Iterator
+from xml.sax.saxutils import escape
+from sqlalchemy import select
+from fastapi.responses import StreamingResponse
+from db import SessionLocal
+from models import WeatherRecord
+import metrics
+from utils.serialization import dumps_str
+
+# Rows are read from a server-side cursor in batches and written out in chunks,
+# so memory stays flat regardless of table size.
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "65536"))  # bytes
+
+EXPORT_FIELDS = ["id", "location", "date_range_start", "date_range_end", "temperature", "weather_description"]
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "xml": "application/xml",
+    "markdown": "text/markdown",
+}
+
+def iter_records(format: str) -> Iterator[dict]:
+    # Own session: the response body is produced after the request dependency has closed
+    db = SessionLocal()
+    rows = 0
+    try:
+        columns = [getattr(WeatherRecord, f) for f in EXPORT_FIELDS]
+        stmt = select(*columns).order_by(WeatherRecord.id).execution_options(yield_per=EXPORT_BATCH_SIZE)
+        for row in db.execute(stmt):
+            rows += 1
+            yield dict(zip(EXPORT_FIELDS, row))
+    finally:
+        metrics.export_rows.inc(format, amount=rows)
+        db.close()
+
+def _json_array(records: Iterable[dict]) -> Iterator[str]:
+    yield "["
+    separator = "\n"
+    for r in records:
+        yield separator + dumps_str(r)
+        separator = ",\n"
+    yield "\n]"
+
+def _ndjson(records: Iterable[dict]) -> Iterator[str]:
+    for r in records:
+        yield dumps_str(r) + "\n"
+
+def _csv(records: Iterable[dict]) -> Iterator[str]:
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    header_written = False
+    for r in records:
+        if not header_written:
+            writer.writerow(r.keys())
+            header_written = True
+        writer.writerow(r.values())
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+def _xml(records: Iterable[dict]) -> Iterator[str]:
+    yield "<weather_records>"
+    for r in records:
+        yield "<record>" + "".join(f"<{k}>{escape(str(v))}</{k}>" for k, v in r.items()) + "</record>"
+    yield "</weather_records>"
+
+def _markdown(records: Iterable[dict]) -> Iterator[str]:
+    empty = True
+    for r in records:
+        if empty:
+            yield "| " + " | ".join(r.keys()) + " |\n"
+            yield "| " + "--- | " * len(r) + "\n"
+            empty = False
+        yield "| " + " | ".join(str(v) for v in r.values()) + " |\n"
+    if empty:
+        yield "No records found."
+
+SERIALIZERS = {
+    "json": _json_array,
+    "ndjson": _ndjson,
+    "csv": _csv,
+    "xml": _xml,
+    "markdown": _markdown,
+}
+
+def _chunked(pieces: Iterable[str], format: str) -> Iterator[bytes]:
+    buffer, size = [], 0
+    for piece in pieces:
+        buffer.append(piece)
+        size += len(piece)
+        if size >= EXPORT_CHUNK_SIZE:
+            chunk = "".join(buffer).encode("utf-8")
+            metrics.export_bytes.inc(format, amount=len(chunk))
+            yield chunk
+            buffer, size = [], 0
+    if buffer:
+        chunk = "".join(buffer).encode("utf-8")
+        metrics.export_bytes.inc(format, amount=len(chunk))
+        yield chunk
+
+def stream_export(format: str) -> StreamingResponse:
+    # Sync generator: Starlette iterates it in a worker thread, off the event loop
+    body = _chunked(SERIALIZERS[format](iter_records(format)), format)
+    return StreamingResponse(body, media_type=MEDIA_TYPES[format])
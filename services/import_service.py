@@ -0,0 +1,178 @@
+import asyncio
+import codecs
+import csv
+from collections import deque
+import json
+import os
+import time
+from typing import AsyncIterator
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import insert
+from models import WeatherRecord
+from db import DBSession
+from schemas import WeatherImportRow, WeatherImportError, WeatherImportReport
+from utils.locations import normalize_location
+from weather_api import resolve_location, LocationNotFound
+from services import versioning
+
+# Uploads are parsed as they arrive and written in batches (one executemany and
+# one commit per batch), so memory is bounded by the batch size, not the file.
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_BATCH_SIZE = int(os.getenv("IMPORT_MAX_BATCH_SIZE", "10000"))
+IMPORT_MAX_ERRORS = int(os.getenv("IMPORT_MAX_ERRORS", "100"))  # per-row errors listed in the report
+IMPORT_VALIDATE_CONCURRENCY = int(os.getenv("IMPORT_VALIDATE_CONCURRENCY", "10"))
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    # Incremental decode: a multi-byte character may straddle two chunks
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        *complete, pending = pending.split("\n")
+        for line in complete:
+            yield line.rstrip("\r")
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+class _LineFeed:
+    # The csv reader's input: lines are pushed as they stream in. Unlike a generator it
+    # can run dry between records and be resumed.
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+async def _csv_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | Exception]]:
+    # One reader over the whole upload, so a quoted field may span lines
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    header = None
+    line_no = start = quotes = 0
+    async for line in _lines(chunks):
+        line_no += 1
+        if not feed.lines and not line.strip():
+            continue
+        if not feed.lines:
+            start = line_no
+        feed.lines.append(line + "\n")
+        quotes += line.count('"')
+        if quotes % 2:
+            continue  # Inside a quoted field: the record goes on on the next line
+        quotes = 0
+        try:
+            values = next(reader)
+        except csv.Error as e:
+            feed.lines.clear()
+            yield start, e
+            continue
+        if header is None:
+            header = values
+            continue
+        # The exporter writes NULL columns as empty cells
+        yield start, {k: (v if v != "" else None) for k, v in zip(header, values)}
+    if feed.lines:
+        yield start, csv.Error(f"unterminated quoted field starting on line {start}")
+
+async def _ndjson_rows(chunks: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | Exception]]:
+    line_no = 0
+    async for line in _lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError as e:
+            yield line_no, e
+
+PARSERS = {"csv": _csv_rows, "ndjson": _ndjson_rows}
+
+async def _check_locations(rows: list[tuple[int, WeatherImportRow]]) -> dict[str, str]:
+    # One lookup per distinct location in the batch; geocodes are cached, so repeats are free
+    semaphore = asyncio.Semaphore(IMPORT_VALIDATE_CONCURRENCY)
+
+    async def check(location: str) -> str | None:
+        async with semaphore:
+            try:
+                await resolve_location(location)
+                return None
+            except LocationNotFound:
+                return "Invalid location"
+            except Exception as e:
+                return f"Location check failed: {e}"
+
+    locations = {normalize_location(row.location): row.location for _, row in rows}
+    outcomes = await asyncio.gather(*(check(loc) for loc in locations.values()))
+    return {key: error for key, error in zip(locations, outcomes) if error is not None}
+
+def _insert_rows(session, rows: list[dict]):
+    # executemany: one statement for the whole batch instead of one INSERT per row
+    session.execute(insert(WeatherRecord), rows)
+    versioning.commit(session)
+
+async def import_records(format: str, chunks: AsyncIterator[bytes], db: DBSession, validate_locations: bool, batch_size: int) -> WeatherImportReport:
+    if format not in PARSERS:
+        raise HTTPException(status_code=400, detail=f"Import supports {', '.join(IMPORT_FORMATS)}")
+    if not 1 <= batch_size <= IMPORT_MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"batch_size must be between 1 and {IMPORT_MAX_BATCH_SIZE}")
+    started = time.perf_counter()
+    rows = imported = failed = 0
+    errors: list[WeatherImportError] = []
+
+    def fail(line: int, error: str):
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append(WeatherImportError(line=line, error=error))
+
+    async def flush(batch: list[tuple[int, dict | Exception]]):
+        nonlocal imported
+        valid = []
+        for line, raw in batch:
+            if isinstance(raw, Exception):
+                fail(line, f"Malformed {format}: {raw}")
+                continue
+            try:
+                valid.append((line, WeatherImportRow.model_validate(raw)))
+            except ValidationError as e:
+                fail(line, "; ".join(f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()))
+        if validate_locations and valid:
+            invalid = await _check_locations(valid)
+            for line, row in valid:
+                if normalize_location(row.location) in invalid:
+                    fail(line, invalid[normalize_location(row.location)])
+            valid = [(line, row) for line, row in valid if normalize_location(row.location) not in invalid]
+        if valid:
+            await db.run_sync(_insert_rows, [row.model_dump() for _, row in valid])
+            imported += len(valid)
+
+    batch = []
+    async for line, raw in PARSERS[format](chunks):
+        rows += 1
+        batch.append((line, raw))
+        if len(batch) >= batch_size:
+            await flush(batch)
+            batch = []
+    if batch:
+        await flush(batch)
+
+    duration = time.perf_counter() - started
+    return WeatherImportReport(
+        format=format,
+        rows=rows,
+        imported=imported,
+        failed=failed,
+        duration_s=round(duration, 3),
+        rows_per_s=round(rows / duration, 1) if duration > 0 else 0.0,
+        errors=errors,
+        errors_truncated=failed > len(errors),
+    )
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timezone
+from utils.locations import normalize_location
+import weather_api
+from weather_api import LocationNotFound
+
+# One poller per watched location fans out to every subscriber, so upstream cost
+# scales with distinct locations rather than with connected clients.
+LIVE_POLL_INTERVAL = float(os.getenv("LIVE_POLL_INTERVAL", "60"))  # seconds between upstream fetches
+LIVE_POLL_JITTER = float(os.getenv("LIVE_POLL_JITTER", "0.1"))  # +/- fraction of the interval
+LIVE_QUEUE_SIZE = int(os.getenv("LIVE_QUEUE_SIZE", "16"))  # per subscriber; oldest updates dropped when full
+LIVE_MAX_LOCATIONS = int(os.getenv("LIVE_MAX_LOCATIONS", "10"))  # per subscription
+LIVE_HEARTBEAT = float(os.getenv("LIVE_HEARTBEAT", "15"))  # seconds; keeps proxies from closing idle streams
+
+class Subscription:
+    def __init__(self, hub: "LiveHub"):
+        self.hub = hub
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.locations: dict[str, str] = {}  # key -> location as the client spelled it
+
+    def push(self, update: dict):
+        # Never block the poller on a slow client: drop its oldest pending update instead
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(update)
+
+    def add(self, locations: list[str]):
+        for location in locations:
+            key = normalize_location(location)
+            if key in self.locations:
+                continue
+            if len(self.locations) >= LIVE_MAX_LOCATIONS:
+                raise ValueError(f"At most {LIVE_MAX_LOCATIONS} locations per subscription")
+            self.locations[key] = location
+            self.hub._join(key, location, self)
+
+    def remove(self, locations: list[str]):
+        for location in locations:
+            key = normalize_location(location)
+            if self.locations.pop(key, None) is not None:
+                self.hub._leave(key, self)
+
+    def close(self):
+        self.remove(list(self.locations.values()))
+
+    async def next(self, timeout: float | None = None) -> dict | None:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+class LocationPoller:
+    def __init__(self, key: str, location: str, interval: float, jitter: float):
+        self.key = key
+        self.location = location
+        self.interval = interval
+        self.jitter = jitter
+        self.subscribers: set[Subscription] = set()
+        self.latest: dict | None = None
+        self._task = asyncio.create_task(self._run())
+
+    def broadcast(self, update: dict):
+        self.latest = update
+        for subscriber in list(self.subscribers):
+            subscriber.push(update)
+
+    async def _run(self):
+        while True:
+            try:
+                # Also primes the read cache, so POST /weather/ for this location skips the upstream call
+                data = await weather_api.refresh_current_weather(self.location)
+                self.broadcast({
+                    "key": self.key,
+                    "location": self.location,
+                    "name": data["name"],
+                    "temperature": data["temperature"],
+                    "description": data["description"],
+                    "updated_at": datetime.now(timezone.utc).isoformat(),
+                })
+            except LocationNotFound:
+                self.broadcast({"key": self.key, "location": self.location, "error": "Invalid location"})
+                return
+            except Exception as e:
+                logging.error(f"Live poll failed for {self.location}: {e}")
+                self.broadcast({"key": self.key, "location": self.location, "error": str(e)})
+            await asyncio.sleep(self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    def stop(self):
+        self._task.cancel()
+
+class LiveHub:
+    def __init__(self, interval: float, jitter: float):
+        self.interval = interval
+        self.jitter = jitter
+        self.pollers: dict[str, LocationPoller] = {}
+
+    def subscribe(self, locations: list[str]) -> Subscription:
+        subscription = Subscription(self)
+        try:
+            subscription.add(locations)
+        except ValueError:
+            subscription.close()
+            raise
+        return subscription
+
+    def _join(self, key: str, location: str, subscription: Subscription):
+        poller = self.pollers.get(key)
+        if poller is None:
+            poller = self.pollers[key] = LocationPoller(key, location, self.interval, self.jitter)
+            logging.info(f"Live poller started for {location}")
+        poller.subscribers.add(subscription)
+        if poller.latest is not None:
+            # Late joiners get the current reading immediately instead of waiting a full interval
+            subscription.push(poller.latest)
+
+    def _leave(self, key: str, subscription: Subscription):
+        poller = self.pollers.get(key)
+        if poller is None:
+            return
+        poller.subscribers.discard(subscription)
+        if not poller.subscribers:
+            poller.stop()
+            del self.pollers[key]
+            logging.info(f"Live poller stopped for {poller.location}")
+
+    async def stop(self):
+        for poller in self.pollers.values():
+            poller.stop()
+        await asyncio.gather(*(p._task for p in self.pollers.values()), return_exceptions=True)
+        self.pollers.clear()
+
+    def status(self) -> dict:
+        return {
+            "locations": len(self.pollers),
+            "subscribers": sum(len(p.subscribers) for p in self.pollers.values()),
+            "interval": self.interval,
+        }
+
+hub = LiveHub(LIVE_POLL_INTERVAL, LIVE_POLL_JITTER)
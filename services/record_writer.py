@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import time
+from sqlalchemy import insert, update
+from db import SessionLocal
+from models import WeatherRecord
+from services import versioning
+import metrics
+
+# Group commit for weather_records: requests queue their insert/update and wait;
+# a single writer task drains the queue and commits everything that arrived within
+# WRITE_BATCH_WINDOW (or WRITE_BATCH_SIZE writes) in one transaction, so N
+# concurrent requests cost one commit (one fsync, one lock acquisition) instead of N.
+# Requests still only return once their row is committed. The writer uses its own
+# connection, so these writes are not part of the request's session or transaction.
+WRITE_GROUP_COMMIT = os.getenv("WRITE_GROUP_COMMIT", "1") == "1"
+WRITE_BATCH_SIZE = int(os.getenv("WRITE_BATCH_SIZE", "500"))
+WRITE_BATCH_WINDOW = float(os.getenv("WRITE_BATCH_WINDOW", "0.005"))  # seconds to wait for more writes after the first
+WRITE_QUEUE_SIZE = int(os.getenv("WRITE_QUEUE_SIZE", "10000"))  # pending writes before submitters wait
+
+_STOP = object()  # Queued by stop() to wake the writer so it can drain the queue and exit
+
+RECORD_COLUMNS = ["location", "date_range_start", "date_range_end", "temperature", "weather_description", "latitude", "longitude", "cell"]
+
+class PendingWrite:
+    def __init__(self, kind: str, values: dict, record_id: int | None = None):
+        self.kind = kind  # "insert" or "update"
+        self.values = values
+        self.record_id = record_id
+        self.future = asyncio.get_running_loop().create_future()
+
+class GroupCommitWriter:
+    def __init__(self, batch_size: int, window: float, queue_size: int):
+        self.batch_size = batch_size
+        self.window = window
+        self.queue_size = queue_size
+        self._queue: asyncio.Queue | None = None
+        self._task: asyncio.Task | None = None
+        self._closing = False
+        self.batches = 0
+        self.writes = 0
+
+    def _ensure_started(self):
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+            self._task = asyncio.create_task(self._run())
+
+    async def _submit(self, write: PendingWrite):
+        if self._closing:
+            # Shutting down: commit on its own rather than behind the stop marker
+            return (await asyncio.to_thread(_commit, [write]))[0]
+        self._ensure_started()
+        await self._queue.put(write)
+        return await write.future
+
+    async def insert(self, values: dict) -> int:
+        # Returns the new row's id once it is committed
+        return await self._submit(PendingWrite("insert", {c: values.get(c) for c in RECORD_COLUMNS}))
+
+    async def update(self, record_id: int, values: dict) -> bool:
+        # False if the row no longer exists
+        return await self._submit(PendingWrite("update", values, record_id))
+
+    async def _collect(self) -> list[PendingWrite]:
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Whatever else is already queued rides along without waiting
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = [w for w in await self._collect() if w is not _STOP]
+            if batch:
+                await self._flush(batch)
+            if self._closing and self._queue.empty():
+                return
+
+    async def _flush(self, batch: list[PendingWrite]):
+        try:
+            results = await asyncio.to_thread(_commit, batch)
+        except Exception as e:
+            # One bad write must not fail its neighbours: retry each in its own transaction
+            logging.warning(f"Group commit of {len(batch)} writes failed ({e}); retrying individually")
+            for write in batch:
+                try:
+                    result = (await asyncio.to_thread(_commit, [write]))[0]
+                except Exception as single:
+                    if not write.future.done():
+                        write.future.set_exception(single)
+                else:
+                    if not write.future.done():
+                        write.future.set_result(result)
+            return
+        self.batches += 1
+        self.writes += len(batch)
+        metrics.write_batch_size.observe(len(batch))
+        for write, result in zip(batch, results):
+            if not write.future.done():  # The submitter may have been cancelled
+                write.future.set_result(result)
+
+    async def stop(self):
+        # Commit what is already queued, then let the writer task finish on its own;
+        # it is never cancelled, so a batch being committed always resolves its futures
+        if self._task is None:
+            return
+        self._closing = True
+        try:
+            if not self._task.done():
+                await self._queue.put(_STOP)
+                await self._task
+        finally:
+            self._task = None
+            self._closing = False
+
+    def status(self) -> dict:
+        return {
+            "enabled": WRITE_GROUP_COMMIT,
+            "running": self._task is not None and not self._task.done(),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "batches": self.batches,
+            "writes": self.writes,
+            "avg_batch_size": round(self.writes / self.batches, 2) if self.batches else 0.0,
+        }
+
+def _commit(batch: list[PendingWrite]) -> list:
+    # Runs in a worker thread: all inserts in one executemany (ids via RETURNING), updates by primary key
+    db = SessionLocal()
+    try:
+        results: list = [None] * len(batch)
+        inserts = [(i, w) for i, w in enumerate(batch) if w.kind == "insert"]
+        if inserts:
+            stmt = insert(WeatherRecord).returning(WeatherRecord.id, sort_by_parameter_order=True)
+            ids = db.execute(stmt, [w.values for _, w in inserts]).scalars().all()
+            for (i, _), record_id in zip(inserts, ids):
+                results[i] = record_id
+        for i, write in enumerate(batch):
+            if write.kind == "update":
+                stmt = update(WeatherRecord).where(WeatherRecord.id == write.record_id).values(**write.values)
+                results[i] = db.execute(stmt).rowcount == 1
+        db.execute(versioning.bump())
+        db.commit()
+        return results
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+record_writer = GroupCommitWriter(WRITE_BATCH_SIZE, WRITE_BATCH_WINDOW, WRITE_QUEUE_SIZE)
@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import os
+import random
+from datetime import datetime, timezone
+from db import SessionLocal
+from models import WeatherRecord
+import shared_state
+import weather_api
+from services import versioning
+
+# Locations are separated with ";" because names can contain commas ("Paris, FR")
+REFRESH_WATCHLIST = os.getenv("REFRESH_WATCHLIST", "")
+REFRESH_INTERVAL = float(os.getenv("REFRESH_INTERVAL", "600"))  # seconds between cycles
+REFRESH_JITTER = float(os.getenv("REFRESH_JITTER", "0.1"))  # +/- fraction of the interval
+REFRESH_CONCURRENCY = int(os.getenv("REFRESH_CONCURRENCY", "5"))
+
+class RefreshScheduler:
+    def __init__(self, watchlist: list[str], interval: float, jitter: float, concurrency: int):
+        self.watchlist = watchlist
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.last_run: datetime | None = None
+        self.last_refreshed = 0
+        self.last_failed = 0
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls) -> "RefreshScheduler":
+        watchlist = [loc.strip() for loc in REFRESH_WATCHLIST.split(";") if loc.strip()]
+        return cls(watchlist, REFRESH_INTERVAL, REFRESH_JITTER, REFRESH_CONCURRENCY)
+
+    def start(self):
+        if self.watchlist and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logging.info(f"Refresh scheduler started for {len(self.watchlist)} locations every {self.interval}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # With several workers only one of them refreshes per cycle
+                if await shared_state.claim("refresh", self.interval / 2):
+                    await self.refresh_once()
+            except Exception as e:
+                logging.error(f"Refresh cycle failed: {e}")
+            # Jitter keeps several workers/instances from hitting the providers in lockstep
+            await asyncio.sleep(self.interval * (1 + random.uniform(-self.jitter, self.jitter)))
+
+    async def _refresh_location(self, location: str, semaphore: asyncio.Semaphore):
+        async with semaphore:
+            # Also primes the read cache, so requests for this location skip the upstream call.
+            # Paced by the provider's own token bucket (resilience.OPENWEATHER), shared with user requests.
+            data = await weather_api.refresh_current_weather(location)
+            return WeatherRecord(location=location, temperature=data["temperature"], weather_description=data["description"],
+                                 **weather_api.spatial_columns(data.get("lat"), data.get("lon")))
+
+    async def refresh_once(self) -> int:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        outcomes = await asyncio.gather(*(self._refresh_location(loc, semaphore) for loc in self.watchlist), return_exceptions=True)
+        records = []
+        for location, outcome in zip(self.watchlist, outcomes):
+            if isinstance(outcome, Exception):
+                logging.error(f"Refresh failed for {location}: {outcome}")
+            else:
+                records.append(outcome)
+        if records:
+            await asyncio.to_thread(_save_records, records)
+        self.last_run = datetime.now(timezone.utc)
+        self.last_refreshed = len(records)
+        self.last_failed = len(outcomes) - len(records)
+        logging.info(f"Refreshed {len(records)}/{len(outcomes)} tracked locations")
+        return len(records)
+
+    def status(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "watchlist": self.watchlist,
+            "interval": self.interval,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_refreshed": self.last_refreshed,
+            "last_failed": self.last_failed,
+        }
+
+def _save_records(records: list[WeatherRecord]):
+    # One transaction per cycle
+    db = SessionLocal()
+    try:
+        db.add_all(records)
+        db.execute(versioning.bump())
+        db.commit()
+    finally:
+        db.close()
+
+scheduler = RefreshScheduler.from_env()
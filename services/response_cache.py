@@ -0,0 +1,69 @@
+import hashlib
+import os
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Awaitable, Callable
+from fastapi import Request, Response
+from db import DBSession
+from utils.cache import TTLCache
+from services import versioning
+
+# Conditional GETs for read endpoints. The ETag is derived from the weather_records
+# version plus the route and query, so it changes exactly when the data can have.
+# Serialized bodies are kept in a bounded LRU keyed the same way; entries for old
+# versions are never hit again and age out.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))  # entries
+RESPONSE_CACHE_MAX_BODY = int(os.getenv("RESPONSE_CACHE_MAX_BODY", "1048576"))  # bytes; larger bodies are not kept
+
+response_cache = TTLCache(maxsize=RESPONSE_CACHE_SIZE)
+
+# Response headers worth replaying from the cache (content-length is recomputed)
+_REPLAYED_HEADERS = ("x-next-cursor", "link", "content-disposition")
+
+def _etag(version: int, route: tuple) -> str:
+    digest = hashlib.blake2b(repr(route).encode(), digest_size=8).hexdigest()
+    # Weak: the same representation may be re-encoded (e.g. compressed) on the way out
+    return f'W/"{version}-{digest}"'
+
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second resolution
+        return last_modified.replace(tzinfo=timezone.utc, microsecond=0) <= since
+    return False
+
+async def conditional(request: Request, db: DBSession, build: Callable[[], Awaitable[Response]], name: str = versioning.WEATHER_RECORDS) -> Response:
+    version, updated_at = await versioning.current(db, name)
+    route = (request.url.path, tuple(sorted(request.query_params.multi_items())))
+    etag = _etag(version, route)
+    validators = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(updated_at.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "no-cache",  # Clients may store it but must revalidate, which is a cheap 304
+    }
+    if _not_modified(request, etag, updated_at):
+        return Response(status_code=304, headers=validators)
+    key = route + (version,)
+    cached = response_cache.get(key)
+    if cached is not None:
+        response_cache.hits += 1
+        body, media_type, headers = cached
+        return Response(body, media_type=media_type, headers={**headers, **validators})
+    response_cache.misses += 1
+    response = await build()
+    if response.status_code != 200:
+        return response
+    body = getattr(response, "body", None)  # Streaming responses have no body to keep
+    if body is not None and len(body) <= RESPONSE_CACHE_MAX_BODY:
+        headers = {k: v for k, v in response.headers.items() if k in _REPLAYED_HEADERS}
+        response_cache.set(key, (body, response.media_type, headers))
+    response.headers.update(validators)
+    return response
@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, delete, exists, func
+from sqlalchemy.orm import aliased
+from db import SessionLocal, engine
+from models import WeatherRecord, WeatherRollup
+import shared_state
+from services import versioning
+
+# Keeps weather_records bounded. Each cycle, oldest first:
+#   1. exact duplicates (same location, date range, temperature, description) older than
+#      RETENTION_DEDUPE_DAYS are collapsed onto the earliest copy
+#   2. raw rows older than RETENTION_RAW_DAYS are folded into per-location daily rollups
+#   3. daily rollups older than RETENTION_DAILY_DAYS are folded into monthly rollups
+# Every batch is its own short transaction and batches are spaced out, so writers never
+# wait long for the lock. A batch folds exactly the rows its DELETE ... RETURNING removed and
+# adds them to the rollups with an upsert, so two cycles running at once (several workers
+# without SHARED_STATE_URL) cannot fold a row twice or overwrite each other's totals.
+# 0 disables a step; by default nothing is deleted.
+RETENTION_RAW_DAYS = int(os.getenv("RETENTION_RAW_DAYS", "0"))
+RETENTION_DAILY_DAYS = int(os.getenv("RETENTION_DAILY_DAYS", "0"))
+RETENTION_DEDUPE = os.getenv("RETENTION_DEDUPE", "0") == "1"
+RETENTION_DEDUPE_DAYS = float(os.getenv("RETENTION_DEDUPE_DAYS", "1"))  # Younger rows are left alone: their ids were just handed out
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))  # seconds between cycles
+RETENTION_BATCH_SIZE = int(os.getenv("RETENTION_BATCH_SIZE", "1000"))  # rows per transaction
+RETENTION_BATCH_PAUSE = float(os.getenv("RETENTION_BATCH_PAUSE", "0.05"))  # seconds between transactions
+
+DUPLICATE_COLUMNS = ["date_range_start", "date_range_end", "temperature", "weather_description"]
+_TOTALS = ("records", "temperature_count", "temperature_sum", "temperature_min", "temperature_max")
+_LATEST = ("weather_description", "latitude", "longitude", "cell")
+
+class RetentionTask:
+    def __init__(self, raw_days: int, daily_days: int, dedupe: bool, dedupe_days: float, interval: float, batch_size: int, pause: float):
+        self.raw_days = raw_days
+        self.daily_days = daily_days
+        self.dedupe = dedupe
+        self.dedupe_days = dedupe_days
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.dedupe_checked_id = 0  # Rows up to here have been compared already
+        self.last_run: datetime | None = None
+        self.last_result: dict = {}
+        self.longest_batch = 0.0  # seconds; the longest the write lock was held in the last cycle
+        self._task: asyncio.Task | None = None
+
+    @classmethod
+    def from_env(cls) -> "RetentionTask":
+        return cls(RETENTION_RAW_DAYS, RETENTION_DAILY_DAYS, RETENTION_DEDUPE, RETENTION_DEDUPE_DAYS,
+                   RETENTION_INTERVAL, RETENTION_BATCH_SIZE, RETENTION_BATCH_PAUSE)
+
+    @property
+    def enabled(self) -> bool:
+        return self.dedupe or self.raw_days > 0 or self.daily_days > 0
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logging.info(f"Retention started: raw {self.raw_days}d, daily {self.daily_days}d, dedupe {self.dedupe}, every {self.interval}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                # With several workers only one of them compacts per cycle
+                if await shared_state.claim("retention", self.interval / 2):
+                    await self.run_once()
+            except Exception as e:
+                logging.error(f"Retention cycle failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    async def _batches(self, step, *args) -> int:
+        total = 0
+        while True:
+            started = time.perf_counter()
+            done, more = await asyncio.to_thread(step, *args, self.batch_size)
+            self.longest_batch = max(self.longest_batch, time.perf_counter() - started)
+            total += done
+            if not more:
+                return total
+            await asyncio.sleep(self.pause)
+
+    async def run_once(self) -> dict:
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        result = {"deduplicated": 0, "raw_rolled_up": 0, "daily_rolled_up": 0}
+        self.longest_batch = 0.0
+        if self.dedupe:
+            result["deduplicated"] = await self._batches(self._dedupe_batch, now - timedelta(days=self.dedupe_days))
+        if self.raw_days > 0:
+            # Whole days only, so a day's rollup is final once written
+            result["raw_rolled_up"] = await self._batches(_rollup_raw_batch, today - timedelta(days=self.raw_days))
+        if self.daily_days > 0:
+            # Whole months only, so a month is never split between day and month rollups
+            result["daily_rolled_up"] = await self._batches(_rollup_daily_batch, (today - timedelta(days=self.daily_days)).date().replace(day=1))
+        self.last_run = now
+        self.last_result = result
+        logging.info(f"Retention: {result}")
+        return result
+
+    def _dedupe_batch(self, cutoff: datetime, batch_size: int) -> tuple[int, bool]:
+        checked_id, deleted, more = _dedupe_batch(cutoff, self.dedupe_checked_id, batch_size)
+        self.dedupe_checked_id = checked_id
+        return deleted, more
+
+    def status(self) -> dict:
+        return {
+            "running": self._task is not None,
+            "raw_days": self.raw_days,
+            "daily_days": self.daily_days,
+            "dedupe": self.dedupe,
+            "interval": self.interval,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_result": self.last_result,
+            "longest_batch_ms": round(self.longest_batch * 1000, 1),
+        }
+
+def _dedupe_batch(cutoff: datetime, after_id: int, batch_size: int) -> tuple[int, int, bool]:
+    # Compares the next batch_size old rows with earlier rows through ix_weather_records_location_id
+    earlier = aliased(WeatherRecord)
+    duplicate = exists().where(
+        earlier.location == WeatherRecord.location,
+        earlier.id < WeatherRecord.id,
+        *[getattr(earlier, c).is_not_distinct_from(getattr(WeatherRecord, c)) for c in DUPLICATE_COLUMNS],
+    )
+    db = SessionLocal()
+    try:
+        rows = db.execute(
+            select(WeatherRecord.id, duplicate.label("duplicate"))
+            .where(WeatherRecord.id > after_id, WeatherRecord.created_at < cutoff)
+            .order_by(WeatherRecord.id)
+            .limit(batch_size)
+        ).all()
+        if not rows:
+            return after_id, 0, False
+        ids = [row.id for row in rows if row.duplicate]
+        if ids:
+            db.execute(delete(WeatherRecord).where(WeatherRecord.id.in_(ids)))
+            db.execute(versioning.bump())
+            db.commit()
+        return rows[-1].id, len(ids), len(rows) == batch_size
+    finally:
+        db.close()
+
+def _fold(groups: dict, key: tuple, records: int, count: int, total, low, high, latest: dict):
+    group = groups.get(key)
+    if group is None:
+        group = groups[key] = {"records": 0, "temperature_count": 0, "temperature_sum": None, "temperature_min": None, "temperature_max": None,
+                               **dict.fromkeys(_LATEST)}
+    group["records"] += records
+    if count:
+        group["temperature_count"] += count
+        group["temperature_sum"] = total if group["temperature_sum"] is None else group["temperature_sum"] + total
+        group["temperature_min"] = low if group["temperature_min"] is None else min(group["temperature_min"], low)
+        group["temperature_max"] = high if group["temperature_max"] is None else max(group["temperature_max"], high)
+    # Input is read oldest first, so the last non-empty values are the period's latest
+    group.update({k: v for k, v in latest.items() if v is not None})
+
+def _upsert(db, period: str, groups: dict):
+    # Adds the folded groups to the rollups in SQL, creating the missing ones
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        smaller, larger = func.least, func.greatest
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+        smaller, larger = func.min, func.max  # Two-argument min/max are scalar in SQLite
+    stmt = insert(WeatherRollup)
+    old, new = WeatherRollup, stmt.excluded
+    stmt = stmt.on_conflict_do_update(index_elements=["location", "period", "period_start"], set_={
+        "records": old.records + new.records,
+        "temperature_count": old.temperature_count + new.temperature_count,
+        # NULL means "no temperatures yet" on either side
+        "temperature_sum": func.coalesce(old.temperature_sum + new.temperature_sum, old.temperature_sum, new.temperature_sum),
+        "temperature_min": func.coalesce(smaller(old.temperature_min, new.temperature_min), old.temperature_min, new.temperature_min),
+        "temperature_max": func.coalesce(larger(old.temperature_max, new.temperature_max), old.temperature_max, new.temperature_max),
+        **{c: func.coalesce(getattr(new, c), getattr(old, c)) for c in _LATEST},
+    })
+    db.execute(stmt, [{"location": location, "period": period, "period_start": start, **group} for (location, start), group in groups.items()])
+
+def _rollup_raw_batch(cutoff: datetime, batch_size: int) -> tuple[int, bool]:
+    db = SessionLocal()
+    try:
+        ids = db.execute(
+            select(WeatherRecord.id)
+            .where(WeatherRecord.created_at < cutoff)  # Rows from before created_at existed (NULL) are kept as they are
+            .order_by(WeatherRecord.created_at, WeatherRecord.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return 0, False
+        # Only rows this statement removed are folded; a concurrent cycle that got them first wins.
+        # The age condition is repeated because SQLite may already have reused a deleted id.
+        rows = db.execute(
+            delete(WeatherRecord).where(WeatherRecord.id.in_(ids), WeatherRecord.created_at < cutoff).returning(
+                WeatherRecord.id, WeatherRecord.location, WeatherRecord.created_at, WeatherRecord.temperature,
+                WeatherRecord.weather_description, WeatherRecord.latitude, WeatherRecord.longitude, WeatherRecord.cell)
+        ).all()
+        groups = {}
+        for row in sorted(rows, key=lambda r: (r.created_at, r.id)):
+            has_temperature = row.temperature is not None
+            _fold(groups, (row.location or "", row.created_at.date()), 1, int(has_temperature), row.temperature, row.temperature, row.temperature,
+                  {c: getattr(row, c) for c in _LATEST})
+        if groups:
+            _upsert(db, "day", groups)
+            db.execute(versioning.bump())
+        db.commit()
+        return len(rows), len(ids) == batch_size
+    finally:
+        db.close()
+
+def _rollup_daily_batch(cutoff: date, batch_size: int) -> tuple[int, bool]:
+    db = SessionLocal()
+    try:
+        ids = db.execute(
+            select(WeatherRollup.id)
+            .where(WeatherRollup.period == "day", WeatherRollup.period_start < cutoff)
+            .order_by(WeatherRollup.period_start, WeatherRollup.id)
+            .limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return 0, False
+        days = db.execute(
+            delete(WeatherRollup).where(WeatherRollup.id.in_(ids), WeatherRollup.period == "day", WeatherRollup.period_start < cutoff).returning(
+                WeatherRollup.id, WeatherRollup.location, WeatherRollup.period_start, *[getattr(WeatherRollup, c) for c in _TOTALS + _LATEST])
+        ).all()
+        groups = {}
+        for day in sorted(days, key=lambda d: (d.period_start, d.id)):
+            _fold(groups, (day.location, day.period_start.replace(day=1)), day.records, day.temperature_count, day.temperature_sum,
+                  day.temperature_min, day.temperature_max, {c: getattr(day, c) for c in _LATEST})
+        if groups:
+            _upsert(db, "month", groups)
+            db.execute(versioning.bump())
+        db.commit()
+        return len(days), len(ids) == batch_size
+    finally:
+        db.close()
+
+retention = RetentionTask.from_env()
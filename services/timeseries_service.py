@@ -0,0 +1,28 @@
+import asyncio
+from datetime import date
+from fastapi import HTTPException
+import timeseries
+from utils.validators import validate_series_range
+from weather_api import resolve_location, load_series
+from services.weather_service import upstream_http_errors
+
+async def _load(location: str, start: date, end: date, resolution: str) -> tuple[str, dict]:
+    if resolution not in timeseries.RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(timeseries.RESOLUTIONS)}")
+    validate_series_range(start, end)
+    with upstream_http_errors():
+        place = await resolve_location(location)
+        return await load_series(place, start, end, resolution)
+
+async def backfill(location: str, start: date, end: date, resolution: str) -> dict:
+    _, report = await _load(location, start, end, resolution)
+    return {"location": location, "start": start, "end": end, "resolution": resolution, **report}
+
+async def get_series(location: str, start: date, end: date, resolution: str) -> list[dict]:
+    key, _ = await _load(location, start, end, resolution)
+    return await asyncio.to_thread(timeseries.series, key, start, end, resolution)
+
+async def get_summary(location: str, start: date, end: date, resolution: str) -> dict:
+    key, _ = await _load(location, start, end, resolution)
+    summary = await asyncio.to_thread(timeseries.aggregate, key, start, end, resolution)
+    return {"location": location, "start": start, "end": end, "resolution": resolution, **summary}
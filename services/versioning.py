@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+from sqlalchemy import select
+from db import DBSession, engine
+from models import TableVersion
+
+# The counter lives in the database rather than in process memory, so every
+# worker process sees the same version and never answers 304 for stale data.
+WEATHER_RECORDS = "weather_records"
+
+_EPOCH = datetime(1970, 1, 1)
+
+def bump(name: str = WEATHER_RECORDS):
+    # Upsert: the first write creates the row
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    stmt = insert(TableVersion).values(name=name, version=1, updated_at=now)
+    return stmt.on_conflict_do_update(index_elements=["name"], set_={"version": TableVersion.version + 1, "updated_at": now})
+
+def commit(session):
+    # Bump and commit as the end of a write; called from inside db.run_sync so the whole
+    # write is one unit of work (a single worker-thread hop with a sync session)
+    session.execute(bump())
+    session.commit()
+
+async def current(db: DBSession, name: str = WEATHER_RECORDS) -> tuple[int, datetime]:
+    row = (await db.execute(select(TableVersion.version, TableVersion.updated_at).where(TableVersion.name == name))).first()
+    return (row.version, row.updated_at) if row is not None else (0, _EPOCH)
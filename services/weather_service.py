@@ -1,282 +1,327 @@
-from sqlalchemy.orm import Session
-from models import WeatherRecord
-from schemas import WeatherRequest, WeatherUpdate, WeatherResponse
-from utils.validators import validate_date_range, validate_location
-from weather_api import fetch_current_weather, fetch_forecast
+from sqlalchemy import select, func
+from models import WeatherRecord, WeatherRollup
+from db import DBSession
+from schemas import WeatherRequest, WeatherUpdate, WeatherResponse, WeatherBatchItem, WeatherBatchResponse
+from utils.validators import validate_date_range
+from utils.locations import normalize_location
+from weather_api import resolve_weather, resolve_location, spatial_columns, LocationNotFound
+from resilience import UpstreamError, CircuitOpenError
+from services.export_service import stream_export
+from services.export_jobs import export_jobs, EXPORT_ASYNC_THRESHOLD
+from services import versioning
+from services.record_writer import record_writer, WRITE_GROUP_COMMIT
+from utils.serialization import rows_to_dicts
+from utils.geo import bounding_box, haversine_km
 from fastapi import HTTPException
-from fastapi.responses import StreamingResponse
-import json
-import csv
-from io import StringIO, BytesIO
+from fastapi.responses import JSONResponse
 from typing import List
-from fpdf import FPDF
-import xml.etree.ElementTree as ET
-from datetime import datetime
+from datetime import datetime, date
+import asyncio
+from contextlib import contextmanager
+import base64
+import heapq
+import os
 
-async def create_weather_record(request: WeatherRequest, db: Session):
-    validate_date_range(request.date_range_start, request.date_range_end)
-    if not await validate_location(request.location):
-        raise HTTPException(status_code=400, detail="Invalid location")
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "500"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "20"))
+
+NEARBY_MAX_RADIUS_KM = float(os.getenv("NEARBY_MAX_RADIUS_KM", "250"))
+
+LIST_FIELDS = ["id", "location", "date_range_start", "date_range_end", "temperature", "weather_description"]
+NEARBY_FIELDS = LIST_FIELDS + ["latitude", "longitude", "created_at"]
+
+# GET /weather/?resolution=day|month lists the rollups written by services/retention.py
+RESOLUTIONS = {"raw", "day", "month"}
+ROLLUP_COLUMNS = {
+    "id": WeatherRollup.id,
+    "location": WeatherRollup.location,
+    "period": WeatherRollup.period,
+    "period_start": WeatherRollup.period_start,
+    "records": WeatherRollup.records,
+    "avg_temp": WeatherRollup.temperature_sum / func.nullif(WeatherRollup.temperature_count, 0),
+    "min_temp": WeatherRollup.temperature_min,
+    "max_temp": WeatherRollup.temperature_max,
+    "weather_description": WeatherRollup.weather_description,
+}
+ROLLUP_FIELDS = list(ROLLUP_COLUMNS)
 
+@contextmanager
+def upstream_http_errors():
+    # Maps weather provider failures onto the API's HTTP errors
     try:
-        if request.date_range_start and request.date_range_end:
-            weather_data = await fetch_forecast(request.location, request.date_range_start, request.date_range_end)
-        else:
-            weather_data = await fetch_current_weather(request.location)
+        yield
+    except LocationNotFound:
+        raise HTTPException(status_code=400, detail="Invalid location")
+    except CircuitOpenError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except UpstreamError as e:
+        # Provider-side failures (5xx, 429, timeouts) are not the client's fault
+        raise HTTPException(status_code=502 if e.retryable else 400, detail=str(e))
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
 
-    record = WeatherRecord(
+async def resolve_and_fetch(location: str, start=None, end=None):
+    # Resolve the location once; the same result validates it and feeds the weather lookup
+    with upstream_http_errors():
+        return await resolve_weather(location, start, end)
+
+async def create_weather_record(request: WeatherRequest, db: DBSession):
+    validate_date_range(request.date_range_start, request.date_range_end)
+    place, weather_data = await resolve_and_fetch(request.location, request.date_range_start, request.date_range_end)
+
+    values = dict(
         location=request.location,
         date_range_start=request.date_range_start,
         date_range_end=request.date_range_end,
         temperature=weather_data["temperature"],
-        weather_description=weather_data["description"]
+        weather_description=weather_data["description"],
+        **spatial_columns(place.lat, place.lon)
     )
-    db.add(record)
-    db.commit()
-    db.refresh(record)
+    if WRITE_GROUP_COMMIT:
+        # Committed together with whatever other requests are writing right now, outside this session
+        record_id = await record_writer.insert(values)
+        return WeatherResponse.model_validate({"id": record_id, **values})
+    record = WeatherRecord(**values)
+    await db.run_sync(_write, [record])
     return WeatherResponse.model_validate(record)
 
-def get_weathers(db: Session) -> List[WeatherResponse]:
-    records = db.query(WeatherRecord).all()
-    return [WeatherResponse.model_validate(r) for r in records]
+def _write(session, added=(), deleted=()):
+    # Flush, version bump and commit as one unit of work (a single worker-thread hop
+    # with a sync session), so the write lock is never held across an await
+    session.add_all(added)
+    for record in deleted:
+        session.delete(record)
+    session.flush()
+    versioning.commit(session)
+
+async def create_weather_batch(requests: List[WeatherRequest], db: DBSession) -> WeatherBatchResponse:
+    if len(requests) > BATCH_MAX_SIZE:
+        raise HTTPException(status_code=400, detail=f"Batch cannot exceed {BATCH_MAX_SIZE} items")
+    semaphore = asyncio.Semaphore(BATCH_CONCURRENCY)
+
+    async def fetch(request: WeatherRequest):
+        async with semaphore:
+            try:
+                validate_date_range(request.date_range_start, request.date_range_end)
+                return await resolve_and_fetch(request.location, request.date_range_start, request.date_range_end)
+            except HTTPException as e:
+                return e
+            except Exception as e:  # Network errors fail only this item, not the batch
+                return HTTPException(status_code=502, detail=f"Upstream error: {e}")
+
+    # Identical location/date pairs in one batch share a single fetch
+    keys = [(normalize_location(r.location), r.date_range_start, r.date_range_end) for r in requests]
+    unique = dict(zip(keys, requests))
+    outcomes = dict(zip(unique.keys(), await asyncio.gather(*(fetch(r) for r in unique.values()))))
+
+    results: List[WeatherBatchItem | None] = [None] * len(requests)
+    pending = []
+    for index, (request, key) in enumerate(zip(requests, keys)):
+        outcome = outcomes[key]
+        if isinstance(outcome, HTTPException):
+            results[index] = WeatherBatchItem(index=index, status_code=outcome.status_code, error=str(outcome.detail))
+            continue
+        place, weather_data = outcome
+        pending.append((index, WeatherRecord(
+            location=request.location,
+            date_range_start=request.date_range_start,
+            date_range_end=request.date_range_end,
+            temperature=weather_data["temperature"],
+            weather_description=weather_data["description"],
+            **spatial_columns(place.lat, place.lon)
+        )))
+
+    if pending:
+        # One transaction for the whole batch; flush assigns the ids
+        await db.run_sync(_write, [record for _, record in pending])
+        for index, record in pending:
+            results[index] = WeatherBatchItem(index=index, status_code=200, record=WeatherResponse.model_validate(record))
+    return WeatherBatchResponse(succeeded=len(pending), failed=len(requests) - len(pending), results=results)
+
+def encode_cursor(last_id: int) -> str:
+    return base64.urlsafe_b64encode(f"id:{last_id}".encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> int:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, value = base64.urlsafe_b64decode(padded).decode().split(":", 1)
+        if prefix != "id":
+            raise ValueError(prefix)
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def list_weathers(
+    db: DBSession,
+    cursor: str | None = None,
+    limit: int = 100,
+    location: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    min_temp: float | None = None,
+    max_temp: float | None = None,
+    fields: str | None = None,
+    resolution: str = "raw",
+) -> tuple[List[dict], str | None]:
+    if resolution not in RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(sorted(RESOLUTIONS))}")
+    if resolution != "raw":
+        return await list_rollups(db, resolution, cursor, limit, location, start, end, min_temp, max_temp, fields)
+    # Keyset pagination on id: every page is an index range scan, however deep the cursor
+    selected = _selected_fields(fields, LIST_FIELDS)
+    stmt = select(*[getattr(WeatherRecord, f) for f in selected])
+    if cursor:
+        stmt = stmt.where(WeatherRecord.id > decode_cursor(cursor))
+    if location:
+        stmt = stmt.where(WeatherRecord.location == location)
+    if start:
+        stmt = stmt.where(WeatherRecord.date_range_start >= start)
+    if end:
+        stmt = stmt.where(WeatherRecord.date_range_end <= end)
+    if min_temp is not None:
+        stmt = stmt.where(WeatherRecord.temperature >= min_temp)
+    if max_temp is not None:
+        stmt = stmt.where(WeatherRecord.temperature <= max_temp)
+    rows = (await db.execute(stmt.order_by(WeatherRecord.id).limit(limit + 1))).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    return rows_to_dicts(selected, rows[:limit]), next_cursor
+
+def _selected_fields(fields: str | None, available: List[str]) -> List[str]:
+    if not fields:
+        return available
+    requested = [f.strip() for f in fields.split(",") if f.strip()]
+    unknown = set(requested) - set(available)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return ["id"] + [f for f in available if f in requested and f != "id"]
+
+async def list_rollups(
+    db: DBSession,
+    period: str,
+    cursor: str | None = None,
+    limit: int = 100,
+    location: str | None = None,
+    start: date | None = None,
+    end: date | None = None,
+    min_temp: float | None = None,
+    max_temp: float | None = None,
+    fields: str | None = None,
+) -> tuple[List[dict], str | None]:
+    # Same keyset pagination as the raw listing; start/end bound period_start, min/max_temp the period mean
+    selected = _selected_fields(fields, ROLLUP_FIELDS)
+    avg_temp = ROLLUP_COLUMNS["avg_temp"]
+    stmt = select(*[ROLLUP_COLUMNS[f].label(f) for f in selected]).where(WeatherRollup.period == period)
+    if cursor:
+        stmt = stmt.where(WeatherRollup.id > decode_cursor(cursor))
+    if location:
+        stmt = stmt.where(WeatherRollup.location == location)
+    if start:
+        stmt = stmt.where(WeatherRollup.period_start >= start)
+    if end:
+        stmt = stmt.where(WeatherRollup.period_start <= end)
+    if min_temp is not None:
+        stmt = stmt.where(avg_temp >= min_temp)
+    if max_temp is not None:
+        stmt = stmt.where(avg_temp <= max_temp)
+    rows = (await db.execute(stmt.order_by(WeatherRollup.id).limit(limit + 1))).all()
+    next_cursor = encode_cursor(rows[limit - 1].id) if len(rows) > limit else None
+    items = rows_to_dicts(selected, rows[:limit])
+    if "avg_temp" in selected:
+        for item in items:
+            if item["avg_temp"] is not None:
+                item["avg_temp"] = round(item["avg_temp"], 2)
+    return items, next_cursor
+
+async def nearby_weathers(
+    db: DBSession,
+    location: str | None = None,
+    lat: float | None = None,
+    lon: float | None = None,
+    radius_km: float = 25,
+    limit: int = 50,
+) -> List[dict]:
+    # Stored records within radius_km of a point, nearest first; rows without coordinates never match
+    if location:
+        with upstream_http_errors():
+            place = await resolve_location(location)
+        lat, lon = place.lat, place.lon
+    if lat is None or lon is None:
+        raise HTTPException(status_code=400, detail="Provide location, or both lat and lon")
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise HTTPException(status_code=400, detail="lat must be in [-90, 90] and lon in [-180, 180]")
+    if not 0 < radius_km <= NEARBY_MAX_RADIUS_KM:
+        raise HTTPException(status_code=400, detail=f"radius_km must be in (0, {NEARBY_MAX_RADIUS_KM:g}]")
+    # Index range scan on the bounding box, exact great-circle distance on the survivors
+    min_lat, max_lat, min_lon, max_lon = bounding_box(lat, lon, radius_km)
+    stmt = select(*[getattr(WeatherRecord, f) for f in NEARBY_FIELDS]).where(
+        WeatherRecord.latitude.between(min_lat, max_lat),
+        WeatherRecord.longitude.between(min_lon, max_lon),
+    )
+    matches = []
+    for row in await db.execute(stmt):
+        distance = haversine_km(lat, lon, row.latitude, row.longitude)
+        if distance <= radius_km:
+            matches.append((distance, row.id, row))
+    return [
+        {**dict(zip(NEARBY_FIELDS, row)), "distance_km": round(distance, 3)}
+        for distance, _, row in heapq.nsmallest(limit, matches)
+    ]
 
-def get_weather(weather_id: int, db: Session) -> WeatherResponse:
-    record = db.query(WeatherRecord).filter(WeatherRecord.id == weather_id).first()
+async def get_weather(weather_id: int, db: DBSession) -> WeatherResponse:
+    record = await db.get(WeatherRecord, weather_id)
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
     return WeatherResponse.model_validate(record)
 
-async def update_weather(weather_id: int, update: WeatherUpdate, db: Session) -> WeatherResponse:
-    record = db.query(WeatherRecord).filter(WeatherRecord.id == weather_id).first()
+async def update_weather(weather_id: int, update: WeatherUpdate, db: DBSession) -> WeatherResponse:
+    record = await db.get(WeatherRecord, weather_id)
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
+    changes = {}
     dates_changed = update.date_range_start or update.date_range_end
-    if update.location:
-        if not await validate_location(update.location):
-            raise HTTPException(status_code=400, detail="Invalid location")
-        record.location = update.location
-    if dates_changed:
+    if update.location or dates_changed:
+        new_location = update.location or record.location
         new_start = update.date_range_start or record.date_range_start
         new_end = update.date_range_end or record.date_range_end
         validate_date_range(new_start, new_end)
-        record.date_range_start = new_start
-        record.date_range_end = new_end
-        # Re-fetch weather
-        if new_start and new_end:
-            weather_data = await fetch_forecast(record.location, new_start, new_end)
-        else:
-            weather_data = await fetch_current_weather(record.location)
-        record.temperature = weather_data["temperature"]
-        record.weather_description = weather_data["description"]
+        # Re-fetch weather for the resolved location
+        place, weather_data = await resolve_and_fetch(new_location, new_start, new_end)
+        changes.update(
+            location=new_location,
+            date_range_start=new_start,
+            date_range_end=new_end,
+            temperature=weather_data["temperature"],
+            weather_description=weather_data["description"],
+            **spatial_columns(place.lat, place.lon)
+        )
     if update.temperature:
-        record.temperature = update.temperature
+        changes["temperature"] = update.temperature
     if update.weather_description:
-        record.weather_description = update.weather_description
-    db.commit()
-    db.refresh(record)
+        changes["weather_description"] = update.weather_description
+    if WRITE_GROUP_COMMIT:
+        # The writer commits on its own connection, not in this session: end the session's
+        # read transaction first so it cannot hold up that commit
+        current = WeatherResponse.model_validate(record).model_dump()
+        await db.rollback()
+        if changes and not await record_writer.update(weather_id, changes):
+            raise HTTPException(status_code=404, detail="Record not found")  # Deleted while the weather was fetched
+        return WeatherResponse.model_validate({**current, **changes})
+    for column, value in changes.items():
+        setattr(record, column, value)
+    await db.run_sync(_write)
     return WeatherResponse.model_validate(record)
 
-def delete_weather(weather_id: int, db: Session):
-    record = db.query(WeatherRecord).filter(WeatherRecord.id == weather_id).first()
+async def delete_weather(weather_id: int, db: DBSession):
+    record = await db.get(WeatherRecord, weather_id)
     if not record:
         raise HTTPException(status_code=404, detail="Record not found")
-    db.delete(record)
-    db.commit()
+    await db.run_sync(_write, deleted=[record])
     return {"detail": "Record deleted"}
 
-def export_data(format: str, db: Session):
-    records = get_weathers(db)
-    clean_records = [r.model_dump() for r in records]
-    if format == "json":
-        return json.dumps(clean_records, default=str, indent=2)
-    elif format == "csv":
-        output = StringIO()
-        writer = csv.writer(output)
-        if clean_records:
-            writer.writerow(clean_records[0].keys())
-            for r in clean_records:
-                writer.writerow(r.values())
-        return output.getvalue()
-    elif format == "pdf":
-        pdf = FPDF()
-        pdf.add_page()
-        pdf.set_font("Arial", size=12)
-        headers = ["ID", "Location", "Start Date", "End Date", "Temperature", "Description"]
-        pdf.cell(200, 10, txt="Weather Records", ln=1, align="C")
-        for header in headers:
-            pdf.cell(30, 10, header, 1)
-        pdf.ln()
-        for r in clean_records:
-            pdf.cell(30, 10, str(r["id"]), 1)
-            pdf.cell(30, 10, r["location"], 1)
-            pdf.cell(30, 10, str(r["date_range_start"]), 1)
-            pdf.cell(30, 10, str(r["date_range_end"]), 1)
-            pdf.cell(30, 10, str(r["temperature"]), 1)
-            pdf.cell(30, 10, r["weather_description"], 1)
-            pdf.ln()
-        bio = BytesIO()
-        bio.write(pdf.output(dest='S').encode('latin1'))
-        bio.seek(0)
-        return StreamingResponse(bio, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=weather_records.pdf"})
-    elif format == "xml":
-        root = ET.Element("weather_records")
-        for r in clean_records:
-            record_elem = ET.SubElement(root, "record")
-            for k, v in r.items():
-                child = ET.SubElement(record_elem, k)
-                child.text = str(v)
-        xml_str = ET.tostring(root, encoding='unicode', method='xml')
-        return xml_str
-    elif format == "markdown":
-        if not clean_records:
-            return "No records found."
-        headers = list(clean_records[0].keys())
-        md = "| " + " | ".join(headers) + " |\n"
-        md += "| " + "--- | " * len(headers) + "\n"
-        for r in clean_records:
-            md += "| " + " | ".join(str(v) for v in r.values()) + " |\n"
-        return md
-
-
-
-
-
-# from sqlalchemy.orm import Session
-# from models import WeatherRecord
-# from schemas import WeatherRequest, WeatherUpdate, WeatherResponse
-# from utils.validators import validate_date_range, validate_location
-# from weather_api import fetch_current_weather, fetch_forecast
-# from fastapi import HTTPException
-# from fastapi.responses import StreamingResponse
-# import json
-# import csv
-# from io import StringIO, BytesIO
-# from typing import List
-# from fpdf import FPDF
-# import xml.etree.ElementTree as ET
-# from datetime import datetime
-
-# async def create_weather_record(request: WeatherRequest, db: Session):
-#     validate_date_range(request.date_range_start, request.date_range_end)
-#     if not await validate_location(request.location):
-#         raise HTTPException(status_code=400, detail="Invalid location")
-
-#     if request.date_range_start and request.date_range_end:
-#         weather_data = await fetch_forecast(request.location, request.date_range_start, request.date_range_end)
-#     else:
-#         weather_data = await fetch_current_weather(request.location)
-
-#     record = WeatherRecord(
-#         location=request.location,
-#         date_range_start=request.date_range_start,
-#         date_range_end=request.date_range_end,
-#         temperature=weather_data["temperature"],
-#         weather_description=weather_data["description"]
-#     )
-#     db.add(record)
-#     db.commit()
-#     db.refresh(record)
-#     return WeatherResponse.model_validate(record)
-
-# def get_weathers(db: Session) -> List[WeatherResponse]:
-#     records = db.query(WeatherRecord).all()
-#     return [WeatherResponse.model_validate(r) for r in records]
-
-# def get_weather(weather_id: int, db: Session) -> WeatherResponse:
-#     record = db.query(WeatherRecord).filter(WeatherRecord.id == weather_id).first()
-#     if not record:
-#         raise HTTPException(status_code=404, detail="Record not found")
-#     return WeatherResponse.model_validate(record)
-
-# async def update_weather(weather_id: int, update: WeatherUpdate, db: Session) -> WeatherResponse:
-#     record = db.query(WeatherRecord).filter(WeatherRecord.id == weather_id).first()
-#     if not record:
-#         raise HTTPException(status_code=404, detail="Record not found")
-#     dates_changed = update.date_range_start or update.date_range_end
-#     if update.location:
-#         if not await validate_location(update.location):
-#             raise HTTPException(status_code=400, detail="Invalid location")
-#         record.location = update.location
-#     if dates_changed:
-#         new_start = update.date_range_start or record.date_range_start
-#         new_end = update.date_range_end or record.date_range_end
-#         validate_date_range(new_start, new_end)
-#         record.date_range_start = new_start
-#         record.date_range_end = new_end
-#         # Re-fetch weather
-#         if new_start and new_end:
-#             weather_data = await fetch_forecast(record.location, new_start, new_end)
-#         else:
-#             weather_data = await fetch_current_weather(record.location)
-#         record.temperature = weather_data["temperature"]
-#         record.weather_description = weather_data["description"]
-#     if update.temperature:
-#         record.temperature = update.temperature
-#     if update.weather_description:
-#         record.weather_description = update.weather_description
-#     db.commit()
-#     db.refresh(record)
-#     return WeatherResponse.model_validate(record)
-
-# def delete_weather(weather_id: int, db: Session):
-#     record = db.query(WeatherRecord).filter(WeatherRecord.id == weather_id).first()
-#     if not record:
-#         raise HTTPException(status_code=404, detail="Record not found")
-#     db.delete(record)
-#     db.commit()
-#     return {"detail": "Record deleted"}
+async def export_data(format: str, db: DBSession):
+    # PDF and large exports are rendered by a background job; the client polls /exports/{id}
+    if format == "pdf" or await db.scalar(select(func.count(WeatherRecord.id))) > EXPORT_ASYNC_THRESHOLD:
+        job = export_jobs.submit(format).to_dict()
+        return JSONResponse(job, status_code=202, headers={"Location": job["status_url"]})
+    return stream_export(format)
 
-# def export_data(format: str, db: Session):
-#     records = get_weathers(db)
-#     clean_records = [r.model_dump() for r in records]
-#     if format == "json":
-#         return json.dumps(clean_records, default=str, indent=2)
-#     elif format == "csv":
-#         output = StringIO()
-#         writer = csv.writer(output)
-#         if clean_records:
-#             writer.writerow(clean_records[0].keys())
-#             for r in clean_records:
-#                 writer.writerow(r.values())
-#         return output.getvalue()
-#     elif format == "pdf":
-#         pdf = FPDF()
-#         pdf.add_page()
-#         pdf.set_font("Arial", size=12)
-#         headers = ["ID", "Location", "Start Date", "End Date", "Temperature", "Description"]
-#         pdf.cell(200, 10, txt="Weather Records", ln=1, align="C")
-#         for header in headers:
-#             pdf.cell(30, 10, header, 1)
-#         pdf.ln()
-#         for r in clean_records:
-#             pdf.cell(30, 10, str(r["id"]), 1)
-#             pdf.cell(30, 10, r["location"], 1)
-#             pdf.cell(30, 10, str(r["date_range_start"]), 1)
-#             pdf.cell(30, 10, str(r["date_range_end"]), 1)
-#             pdf.cell(30, 10, str(r["temperature"]), 1)
-#             pdf.cell(30, 10, r["weather_description"], 1)
-#             pdf.ln()
-#         bio = BytesIO()
-#         bio.write(pdf.output(dest='S').encode('latin1'))
-#         bio.seek(0)
-#         return StreamingResponse(bio, media_type="application/pdf", headers={"Content-Disposition": "attachment; filename=weather_records.pdf"})
-#     elif format == "xml":
-#         root = ET.Element("weather_records")
-#         for r in clean_records:
-#             record_elem = ET.SubElement(root, "record")
-#             for k, v in r.items():
-#                 child = ET.SubElement(record_elem, k)
-#                 child.text = str(v)
-#         xml_str = ET.tostring(root, encoding='unicode', method='xml')
-#         return xml_str
-#     elif format == "markdown":
-#         if not clean_records:
-#             return "No records found."
-#         headers = list(clean_records[0].keys())
-#         md = "| " + " | ".join(headers) + " |\n"
-#         md += "| " + "--- | " * len(headers) + "\n"
-#         for r in clean_records:
-#             md += "| " + " | ".join(str(v) for v in r.values()) + " |\n"
-#         return md
\ No newline at end of file
@@ -0,0 +1,317 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from utils.rate_limit import TokenBucket
+from utils.serialization import dumps
+
+load_dotenv()
+
+# State shared by every worker process: the weather/geocode caches (as a second
+# level behind each process's in-memory LRU), cross-worker request coalescing and
+# the provider rate limits. Empty keeps everything per process; note that claim()
+# is then always True, so with several workers each one runs the singleton jobs
+# (refresh scheduler, retention) on its own.
+#   redis://localhost:6379/0          Redis or any Redis-protocol server (needs the redis package)
+#   sqlite:///./shared_state.db       zero-dependency, WAL-mode file shared by workers on one host
+SHARED_STATE_URL = os.getenv("SHARED_STATE_URL", "")
+SHARED_STATE_PREFIX = os.getenv("SHARED_STATE_PREFIX", "weather-app")  # Key prefix; lets apps share one Redis
+SHARED_LOCK_TTL = float(os.getenv("SHARED_LOCK_TTL", "15"))  # seconds a load lease is held before others give up waiting
+SHARED_MAX_TTL = float(os.getenv("SHARED_MAX_TTL", "604800"))  # seconds; cap for entries cached "forever" in memory
+SHARED_SQLITE_MAX_ENTRIES = int(os.getenv("SHARED_SQLITE_MAX_ENTRIES", "200000"))
+
+# Atomic token bucket; reserves a token even when empty and returns how long to wait for it.
+# Uses the server clock, so workers on different hosts agree on time.
+_RESERVE_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens, updated = tonumber(state[1]) or burst, tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil((burst - tokens) / rate * 1000) + 1000)
+if tokens >= 0 then return '0' end
+return tostring(-tokens / rate)
+"""
+
+class RedisBackend:
+    name = "redis"
+
+    def __init__(self, client):
+        self.client = client
+        self._reserve = client.register_script(_RESERVE_SCRIPT)
+
+    @classmethod
+    def from_url(cls, url: str) -> "RedisBackend":
+        import redis.asyncio as redis
+        return cls(redis.from_url(url))
+
+    async def get(self, key: str) -> bytes | None:
+        return await self.client.get(key)
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        await self.client.set(key, data, px=max(1, int(ttl * 1000)))
+
+    async def add(self, key: str, data: bytes, ttl: float) -> bool:
+        return bool(await self.client.set(key, data, px=max(1, int(ttl * 1000)), nx=True))
+
+    async def delete(self, key: str):
+        await self.client.delete(key)
+
+    async def reserve(self, key: str, rate: float, burst: int) -> float:
+        return float(await self._reserve(keys=[key], args=[rate, burst]))
+
+    async def size(self, prefix: str) -> int:
+        count = 0
+        async for _ in self.client.scan_iter(match=f"{prefix}*", count=1000):
+            count += 1
+        return count
+
+    async def close(self):
+        await self.client.aclose()
+
+class SQLiteBackend:
+    # One WAL-mode file opened by every worker; calls run in a thread, each in its own short transaction
+    name = "sqlite"
+
+    def __init__(self, path: str, max_entries: int = SHARED_SQLITE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=10, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")  # Cache data: durability across power loss is not needed
+        self._conn.execute("CREATE TABLE IF NOT EXISTS kv (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL)")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)")
+
+    @classmethod
+    def from_url(cls, url: str) -> "SQLiteBackend":
+        return cls(url.split(":///", 1)[1])
+
+    def _run(self, fn, *args):
+        def locked():
+            with self._lock:
+                return fn(*args)
+        return asyncio.to_thread(locked)
+
+    def _get(self, key: str) -> bytes | None:
+        row = self._conn.execute("SELECT value FROM kv WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def _prune(self):
+        # Expired rows first, then the oldest inserts (REPLACE gives a new rowid) above max_entries
+        self._conn.execute("DELETE FROM kv WHERE expires_at <= ?", (time.time(),))
+        self._conn.execute("DELETE FROM kv WHERE rowid IN (SELECT rowid FROM kv ORDER BY rowid LIMIT max(0, (SELECT count(*) FROM kv) - ?))", (self.max_entries,))
+
+    def _set(self, key: str, data: bytes, ttl: float):
+        self._conn.execute("INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, data, time.time() + ttl))
+        self._writes += 1
+        if self._writes % 1000 == 0:
+            self._prune()
+
+    def _add(self, key: str, data: bytes, ttl: float) -> bool:
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            self._conn.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, now))
+            added = self._conn.execute("INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)", (key, data, now + ttl)).rowcount == 1
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return added
+
+    def _delete(self, key: str):
+        self._conn.execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def _reserve(self, key: str, rate: float, burst: int) -> float:
+        now = time.time()
+        self._conn.execute("BEGIN IMMEDIATE")  # Takes the write lock up front so concurrent workers serialize here
+        try:
+            row = self._conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (burst, now)
+            tokens = min(burst, tokens + max(0.0, now - updated) * rate) - 1
+            self._conn.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)", (key, tokens, now))
+            self._conn.execute("COMMIT")
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        return 0.0 if tokens >= 0 else -tokens / rate
+
+    def _size(self, prefix: str) -> int:
+        return self._conn.execute("SELECT count(*) FROM kv WHERE substr(key, 1, ?) = ? AND expires_at > ?",
+                                  (len(prefix), prefix, time.time())).fetchone()[0]
+
+    async def get(self, key: str) -> bytes | None:
+        return await self._run(self._get, key)
+
+    async def set(self, key: str, data: bytes, ttl: float):
+        await self._run(self._set, key, data, ttl)
+
+    async def add(self, key: str, data: bytes, ttl: float) -> bool:
+        return await self._run(self._add, key, data, ttl)
+
+    async def delete(self, key: str):
+        await self._run(self._delete, key)
+
+    async def reserve(self, key: str, rate: float, burst: int) -> float:
+        return await self._run(self._reserve, key, rate, burst)
+
+    async def size(self, prefix: str) -> int:
+        return await self._run(self._size, prefix)
+
+    async def close(self):
+        await self._run(self._conn.close)
+
+def create_backend(url: str):
+    if not url:
+        return None
+    try:
+        if url.startswith(("redis://", "rediss://", "unix://")):
+            return RedisBackend.from_url(url)
+        if url.startswith("sqlite:///"):
+            return SQLiteBackend.from_url(url)
+    except (ImportError, sqlite3.Error) as e:
+        logging.warning(f"Shared state backend unavailable ({e}); caches and rate limits stay per process")
+        return None
+    raise ValueError(f"Unsupported SHARED_STATE_URL: {url}")
+
+backend = create_backend(SHARED_STATE_URL)
+
+_last_warning = 0.0
+
+def _degraded(action: str, error: Exception):
+    # Shared state is an optimization: on errors fall back to per-process behaviour, warning at most every 30s
+    global _last_warning
+    if time.monotonic() - _last_warning >= 30:
+        _last_warning = time.monotonic()
+        logging.warning(f"Shared state {action} failed, continuing per process: {type(error).__name__} {error}")
+
+class SharedNamespace:
+    # A TTLCache's view of the shared store: JSON values with their expiry, plus load leases for coalescing
+    def __init__(self, backend, name: str):
+        self.backend = backend
+        self.prefix = f"{SHARED_STATE_PREFIX}:{name}:"
+
+    def _key(self, key) -> str:
+        return self.prefix + (key if isinstance(key, str) else repr(key))
+
+    async def get(self, key) -> tuple[object, float | None] | None:
+        # (value, seconds left or None) or None on a miss
+        try:
+            data = await self.backend.get(self._key(key))
+        except Exception as e:
+            _degraded("read", e)
+            return None
+        if data is None:
+            return None
+        entry = json.loads(data)
+        remaining = None if entry["expires_at"] is None else entry["expires_at"] - time.time()
+        return entry["value"], remaining
+
+    async def set(self, key, value, ttl: float | None):
+        expires_at = None if ttl is None else time.time() + ttl
+        try:
+            await self.backend.set(self._key(key), dumps({"value": value, "expires_at": expires_at}), ttl or SHARED_MAX_TTL)
+        except Exception as e:
+            _degraded("write", e)
+
+    async def lease(self, key) -> bool:
+        # True if this worker should load the value; the others wait for it to be published
+        try:
+            return await self.backend.add(self._key(("lease", key)), b"1", SHARED_LOCK_TTL)
+        except Exception as e:
+            _degraded("lease", e)
+            return True
+
+    async def release(self, key):
+        try:
+            await self.backend.delete(self._key(("lease", key)))
+        except Exception as e:
+            _degraded("release", e)
+
+    async def leased(self, key) -> bool:
+        try:
+            return await self.backend.get(self._key(("lease", key))) is not None
+        except Exception as e:
+            _degraded("lease check", e)
+            return True
+
+    async def wait(self, key) -> tuple[object, float | None] | None:
+        # Polls until the lease holder publishes, for at most one lease lifetime
+        deadline = time.monotonic() + SHARED_LOCK_TTL
+        delay = 0.02
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            entry = await self.get(key)
+            if entry is not None:
+                return entry
+            if not await self.leased(key):
+                # Released without a value: the holder's load failed, so stop waiting for it
+                # (checking once more in case it published just before releasing)
+                return await self.get(key)
+            delay = min(delay * 2, 0.5)
+        return None
+
+    async def size(self) -> int | None:
+        try:
+            return await self.backend.size(self.prefix)
+        except Exception as e:
+            _degraded("size", e)
+            return None
+
+_namespaces: dict[str, SharedNamespace] = {}
+
+def namespace(name: str) -> SharedNamespace | None:
+    if backend is None:
+        return None
+    return _namespaces.setdefault(name, SharedNamespace(backend, name))
+
+async def claim(name: str, ttl: float) -> bool:
+    # True for exactly one worker per ttl window; for periodic jobs. Without a backend it is
+    # always True: every worker runs the job, which is only right for a single worker
+    if backend is None:
+        return True
+    try:
+        return await backend.add(f"{SHARED_STATE_PREFIX}:claim:{name}", b"1", ttl)
+    except Exception as e:
+        _degraded("claim", e)
+        return True
+
+class SharedTokenBucket:
+    # Same contract as TokenBucket, but the tokens live in the shared store, so the
+    # provider quota holds across all workers instead of being multiplied by them
+    def __init__(self, backend, name: str, rate: float, burst: int = 1):
+        self.backend = backend
+        self.key = f"{SHARED_STATE_PREFIX}:bucket:{name}"
+        self.rate = rate
+        self.burst = burst
+        self.local = TokenBucket(rate, burst)
+
+    async def acquire(self):
+        try:
+            wait = await self.backend.reserve(self.key, self.rate, self.burst)
+        except Exception as e:
+            _degraded("rate limit", e)
+            await self.local.acquire()
+            return
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+def token_bucket(name: str, rate: float, burst: int = 1) -> TokenBucket | SharedTokenBucket:
+    return SharedTokenBucket(backend, name, rate, burst) if backend is not None else TokenBucket(rate, burst)
+
+async def stats() -> dict:
+    if backend is None:
+        return {"backend": None}
+    return {"backend": backend.name, "entries": {name: await ns.size() for name, ns in _namespaces.items()}}
+
+async def close():
+    if backend is not None:
+        await backend.close()
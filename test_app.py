@@ -1,5 +1,6 @@
 import requests
 import json
+import time
 
 BASE_URL = "http://127.0.0.1:8000/weather/"
 
@@ -38,14 +39,22 @@ print("GET /export/json:", response.status_code)
 if response.status_code == 200:
     print(json.dumps(json.loads(response.text), indent=2))
 
-# Test EXPORT PDF (save to file)
+# Test EXPORT PDF (rendered by a background job: poll its status, then download)
 response = requests.get(f"{BASE_URL}export/pdf")
-if response.status_code == 200:
-    with open("weather_records.pdf", "wb") as f:
-        f.write(response.content)
-    print("PDF exported to weather_records.pdf")
-else:
-    print("GET /export/pdf:", response.status_code)
+print("GET /export/pdf:", response.status_code)
+if response.status_code == 202:
+    job_url = "http://127.0.0.1:8000" + response.json()["status_url"]
+    job = response.json()
+    while job["status"] in ("queued", "running"):
+        time.sleep(0.5)
+        job = requests.get(job_url).json()
+    if job["status"] == "done":
+        response = requests.get("http://127.0.0.1:8000" + job["download_url"])
+        with open("weather_records.pdf", "wb") as f:
+            f.write(response.content)
+        print("PDF exported to weather_records.pdf")
+    else:
+        print("PDF export failed:", job["error"])
 
 # Test EXPORT XML
 response = requests.get(f"{BASE_URL}export/xml")
@@ -0,0 +1,18 @@
+import os
+import sys
+import tempfile
+
+# Settings are read at import time, so the environment is fixed before any app module loads
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ["REFRESH_WATCHLIST"] = ""
+os.environ["SHARED_STATE_URL"] = ""
+os.environ["EXPORT_JOBS_DIR"] = tempfile.mkdtemp()
+
+import pytest
+from db import init_db
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    init_db()
@@ -0,0 +1,36 @@
+import asyncio
+from resilience import CircuitOpenError, UpstreamError
+from utils.cache import TTLCache
+
+def test_coalesced_callers_all_get_the_stale_value():
+    cache = TTLCache()
+    cache.set("oslo", "old", ttl=0)  # Expired, but kept for stale_on
+    loads = 0
+
+    async def failing():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(0.05)
+        raise CircuitOpenError("open", status=503)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load("oslo", failing, 60, stale_on=(UpstreamError,)) for _ in range(3)),
+                                    return_exceptions=True)
+
+    assert asyncio.run(scenario()) == ["old"] * 3
+    assert loads == 1
+    assert cache.stats()["stale_served"] == 3
+
+def test_coalesced_callers_all_fail_without_a_stale_value():
+    cache = TTLCache()
+
+    async def failing():
+        await asyncio.sleep(0.05)
+        raise CircuitOpenError("open", status=503)
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get_or_load("oslo", failing, 60, stale_on=(UpstreamError,)) for _ in range(3)),
+                                    return_exceptions=True)
+
+    assert all(isinstance(r, CircuitOpenError) for r in asyncio.run(scenario()))
+    assert "oslo" not in cache._inflight
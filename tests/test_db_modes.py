@@ -0,0 +1,110 @@
+import asyncio
+from contextlib import asynccontextmanager
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from db import DATABASE_URL, SessionLocal, SyncSessionAdapter, _async_url, _sqlite_pragmas
+from models import WeatherRecord
+from routers.weather import router
+from schemas import WeatherRequest, WeatherUpdate
+from services import import_service, weather_service
+from weather_api import ResolvedLocation
+
+# The write paths with the request sessions get_db hands out in each DB_MODE, many at once
+
+@pytest.fixture(params=["sync", "async"])
+def mode(request):
+    return request.param
+
+@asynccontextmanager
+async def sessions(mode: str):
+    if mode == "sync":
+        yield lambda: SyncSessionAdapter(SessionLocal())
+        return
+    engine = create_async_engine(_async_url(DATABASE_URL))
+    _sqlite_pragmas(engine.sync_engine)
+    try:
+        yield async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    finally:
+        await engine.dispose()
+
+async def in_session(factory, fn):
+    db = factory()
+    try:
+        return await fn(db)
+    finally:
+        await db.close()
+
+def count(location: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(WeatherRecord).where(WeatherRecord.location == location))
+    finally:
+        db.close()
+
+@pytest.fixture
+def upstream(monkeypatch):
+    # Weather without the network; writes go through the request session, not the group-commit writer
+    async def resolve_and_fetch(location, start=None, end=None):
+        await asyncio.sleep(0.001)
+        return ResolvedLocation(location, 59.91, 10.75), {"temperature": 4.5, "description": "light snow"}
+
+    monkeypatch.setattr(weather_service, "resolve_and_fetch", resolve_and_fetch)
+    monkeypatch.setattr(weather_service, "WRITE_GROUP_COMMIT", False)
+
+async def chunks(data: bytes):
+    yield data
+
+def test_concurrent_imports(mode):
+    location = f"Import {mode}"
+    upload = ("location,date_range_start,date_range_end,temperature,weather_description\n"
+              + "".join(f"{location},2024-01-01,2024-01-02,{i},clear sky\n" for i in range(50))).encode()
+
+    async def scenario():
+        async with sessions(mode) as factory:
+            return await asyncio.gather(*(
+                in_session(factory, lambda db: import_service.import_records("csv", chunks(upload), db, False, 10))
+                for _ in range(24)))
+
+    reports = asyncio.run(scenario())
+    assert [r.imported for r in reports] == [50] * 24
+    assert count(location) == 1200
+
+def test_concurrent_record_writes(mode, upstream):
+    location = f"Writes {mode}"
+
+    async def scenario():
+        async with sessions(mode) as factory:
+            def session(fn):
+                return in_session(factory, fn)
+
+            created = await asyncio.gather(*(session(lambda db: weather_service.create_weather_record(WeatherRequest(location=location), db))
+                                             for _ in range(30)))
+            batches = await asyncio.gather(*(session(lambda db: weather_service.create_weather_batch([WeatherRequest(location=location)] * 5, db))
+                                             for _ in range(10)))
+            updated = await asyncio.gather(*(session(lambda db, id=r.id: weather_service.update_weather(id, WeatherUpdate(temperature=-1.5), db))
+                                             for r in created[:15]))
+            await asyncio.gather(*(session(lambda db, id=r.id: weather_service.delete_weather(id, db)) for r in created[15:]))
+            return created, batches, updated
+
+    created, batches, updated = asyncio.run(scenario())
+    assert len({r.id for r in created}) == 30
+    assert all(b.succeeded == 5 for b in batches)
+    assert all(r.temperature == -1.5 for r in updated)
+    assert count(location) == 30 + 50 - 15
+
+def test_concurrent_batch_requests(upstream):
+    app = FastAPI()
+    app.include_router(router, prefix="/weather")
+    items = [{"location": f"Batch {i}"} for i in range(20)]
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await asyncio.gather(*(client.post("/weather/batch", json=items) for _ in range(24)))
+
+    responses = asyncio.run(scenario())
+    assert [r.status_code for r in responses] == [200] * 24
+    assert all(r.json()["succeeded"] == 20 for r in responses)
+    assert count("Batch 0") == 24
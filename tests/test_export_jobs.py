@@ -0,0 +1,49 @@
+import asyncio
+import os
+import time
+import pytest
+from fastapi import HTTPException
+from services import export_jobs as jobs_module
+from services.export_jobs import ExportJobQueue, render_export
+
+def test_status_and_download_from_another_worker(tmp_path):
+    async def scenario():
+        first = ExportJobQueue(str(tmp_path), workers=1, retention=3600, max_pending=5)
+        job = first.submit("csv")
+        while first.get(job.id).status in ("queued", "running"):
+            await asyncio.sleep(0.05)
+        first.shutdown()
+        return job
+
+    job = asyncio.run(scenario())
+    # A worker that never saw the job answers from the files in the shared directory
+    other = ExportJobQueue(str(tmp_path), workers=1, retention=3600, max_pending=5)
+    seen = other.get(job.id)
+    assert seen.status == "done", seen.error
+    assert seen.path == job.path and os.path.getsize(seen.path) == seen.size
+    assert other.get(job.id).to_dict()["download_url"] == f"/exports/{job.id}/download"
+    with pytest.raises(HTTPException) as info:
+        other.get("../" + job.id)
+    assert info.value.status_code == 404
+
+def test_failed_render_removes_partial_file(tmp_path, monkeypatch):
+    def broken(format):
+        yield {"id": 1, "location": "Oslo", "date_range_start": None, "date_range_end": None,
+               "temperature": 1.0, "weather_description": "clear sky"}
+        raise RuntimeError("database went away")
+
+    monkeypatch.setattr(jobs_module, "iter_records", broken)
+    path = str(tmp_path / "job.csv")
+    with pytest.raises(RuntimeError):
+        render_export("csv", path)
+    assert os.listdir(tmp_path) == []
+
+def test_expire_sweeps_stale_leftovers(tmp_path):
+    queue = ExportJobQueue(str(tmp_path), workers=1, retention=60, max_pending=5)
+    old = time.time() - 120
+    for name in ("a" * 32 + ".csv.part", "b" * 32 + ".pdf", "b" * 32 + ".job.json"):
+        (tmp_path / name).write_text("x")
+        os.utime(tmp_path / name, (old, old))
+    (tmp_path / ("c" * 32 + ".json.part")).write_text("x")  # A render still in progress
+    queue._expire()
+    assert os.listdir(tmp_path) == ["c" * 32 + ".json.part"]
@@ -0,0 +1,28 @@
+import asyncio
+from services.import_service import _csv_rows
+
+async def chunked(data: bytes, size: int):
+    for i in range(0, len(data), size):
+        yield data[i:i + size]
+
+def parse(data: bytes, size: int = 7) -> list:
+    async def collect():
+        return [row async for row in _csv_rows(chunked(data, size))]
+    return asyncio.run(collect())
+
+def test_multiline_quoted_field():
+    data = (b'location,temperature,weather_description\r\n'
+            b'Oslo,4.5,"light snow\r\nthen ""heavy"" snow"\r\n'
+            b'\r\n'
+            b'Bergen,,rain\r\n')
+    for size in (1, 7, len(data)):
+        assert parse(data, size) == [
+            (2, {"location": "Oslo", "temperature": "4.5", "weather_description": 'light snow\nthen "heavy" snow'}),
+            (5, {"location": "Bergen", "temperature": None, "weather_description": "rain"}),
+        ]
+
+def test_unterminated_quote_is_reported():
+    rows = parse(b'location,weather_description\nOslo,"snow\nBergen,rain\n')
+    assert len(rows) == 1
+    line, error = rows[0]
+    assert line == 2 and isinstance(error, Exception)
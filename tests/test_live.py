@@ -0,0 +1,15 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from routers.weather import router
+
+def test_websocket_rejects_malformed_messages():
+    app = FastAPI()
+    app.include_router(router, prefix="/weather")
+    with TestClient(app) as client, client.websocket_connect("/weather/ws") as ws:
+        ws.send_json(["Oslo"])
+        assert "error" in ws.receive_json()
+        ws.send_json({"subscribe": "Oslo"})
+        assert ws.receive_json() == {"error": '"subscribe" must be a list of locations'}
+        ws.send_json({"unsubscribe": []})  # Still serving after the bad messages
+        ws.send_json(None)
+        assert "error" in ws.receive_json()
@@ -0,0 +1,44 @@
+import asyncio
+import httpx
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from fastapi import APIRouter, FastAPI
+from fastapi.staticfiles import StaticFiles
+import metrics
+
+def test_route_label_is_the_route_template(tmp_path):
+    (tmp_path / "index.html").write_text("<p>hi</p>")
+    router = APIRouter()
+
+    @router.get("/{item_id}/items/{name}")
+    async def read(item_id: int, name: str):
+        return {}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/things")
+    app.mount("/", StaticFiles(directory=str(tmp_path), html=True), name="frontend")
+    app.add_middleware(metrics.MetricsMiddleware)
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            # The parameter values repeat literal segments of the path
+            await client.get("/things/7/items/items")
+            await client.get("/things/items/items/items")
+            await client.get("/index.html")
+
+    asyncio.run(scenario())
+    routes = {values[1] for values in metrics.http_request_duration._values}
+    assert "/things/{item_id}/items/{name}" in routes
+    assert "static" in routes
+    assert not any(route.startswith("/things/7") or route.startswith("/things/items/{") for route in routes)
+
+def test_failed_statements_do_not_leak_query_timers():
+    engine = create_engine("sqlite://")
+    metrics.instrument_engine(engine)
+    with engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+        assert conn.connection.info["query_started"] == []
@@ -0,0 +1,45 @@
+import asyncio
+import time
+from datetime import date
+from sqlalchemy import func, select
+from db import SessionLocal
+from models import WeatherRecord
+from services import record_writer as writer_module
+from services.record_writer import GroupCommitWriter
+
+def values(i: int) -> dict:
+    return {"location": f"Writer {i}", "date_range_start": date(2024, 1, 1), "date_range_end": date(2024, 1, 2),
+            "temperature": float(i), "weather_description": "clear sky"}
+
+def stored(ids) -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).select_from(WeatherRecord).where(WeatherRecord.id.in_(ids)))
+    finally:
+        db.close()
+
+def test_stop_waits_for_the_batch_being_committed(monkeypatch):
+    commit = writer_module._commit
+
+    def slow_commit(batch):
+        time.sleep(0.2)
+        return commit(batch)
+
+    monkeypatch.setattr(writer_module, "_commit", slow_commit)
+
+    async def scenario():
+        writer = GroupCommitWriter(batch_size=10, window=0.001, queue_size=100)
+        writes = [asyncio.create_task(writer.insert(values(i))) for i in range(25)]
+        await asyncio.sleep(0.05)  # The first batch is now committing in its thread
+        await writer.stop()
+        assert all(w.done() for w in writes)
+        ids = [w.result() for w in writes]
+        assert writer.status()["running"] is False
+        # Later writes start a fresh writer
+        ids.append(await writer.insert(values(25)))
+        await writer.stop()
+        return ids
+
+    ids = asyncio.run(scenario())
+    assert len(set(ids)) == 26
+    assert stored(ids) == 26
@@ -0,0 +1,135 @@
+import asyncio
+import time
+import aiohttp
+import pytest
+from aiohttp import web
+from resilience import CircuitOpenError, Provider, UpstreamError
+from weather_api import _upstream_error
+
+class ScriptedUpstream:
+    # Answers each request with the next (status, headers, body) in the script, then 200s
+    def __init__(self, *script):
+        self.script = list(script)
+        self.calls = 0
+        self.stall = False
+
+    async def handle(self, request):
+        self.calls += 1
+        while self.stall:
+            await asyncio.sleep(0.01)
+        status, headers, body = self.script.pop(0) if self.script else (200, {}, {"temp": 12.5})
+        return web.json_response(body, status=status, headers=headers)
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/weather", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}/weather"
+        self.session = aiohttp.ClientSession()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.session.close()
+        await self.runner.cleanup()
+
+    def request(self):
+        async def fetch():
+            async with self.session.get(self.url) as response:
+                if response.status != 200:
+                    raise _upstream_error(f"status {response.status}", response)
+                return (await response.json())["temp"]
+        return fetch
+
+def provider(**overrides) -> Provider:
+    options = dict(rate=0, burst=1, retries=0, backoff_base=0.01, backoff_max=5, timeout=2,
+                   breaker_threshold=2, breaker_reset=0.1, hedge_delay=0)
+    options.update(overrides)
+    return Provider("test", **options)
+
+def test_retries_server_errors():
+    async def scenario():
+        async with ScriptedUpstream((503, {}, {}), (502, {}, {})) as upstream:
+            p = provider(retries=2, breaker_threshold=5)
+            assert await p.call(upstream.request()) == 12.5
+            assert upstream.calls == 3
+            assert p.status() == {"state": "closed", "consecutive_failures": 0}
+    asyncio.run(scenario())
+
+def test_client_errors_are_not_retried():
+    async def scenario():
+        async with ScriptedUpstream((404, {}, {})) as upstream:
+            p = provider(retries=2)
+            with pytest.raises(UpstreamError) as info:
+                await p.call(upstream.request())
+            assert info.value.status == 404
+            assert upstream.calls == 1
+            assert p.breaker.state == "closed"
+    asyncio.run(scenario())
+
+def test_honours_retry_after():
+    async def scenario():
+        async with ScriptedUpstream((429, {"Retry-After": "1"}, {})) as upstream:
+            p = provider(retries=1, breaker_threshold=5)
+            started = time.monotonic()
+            assert await p.call(upstream.request()) == 12.5
+            assert time.monotonic() - started >= 1
+            assert upstream.calls == 2
+    asyncio.run(scenario())
+
+def test_breaker_opens_and_recovers():
+    async def scenario():
+        async with ScriptedUpstream((500, {}, {}), (500, {}, {})) as upstream:
+            p = provider()
+            for _ in range(2):
+                with pytest.raises(UpstreamError):
+                    await p.call(upstream.request())
+            with pytest.raises(CircuitOpenError):
+                await p.call(upstream.request())
+            assert upstream.calls == 2  # Short-circuited without a request
+            await asyncio.sleep(0.15)
+            assert p.breaker.state == "half-open"
+            assert await p.call(upstream.request()) == 12.5
+            assert p.breaker.state == "closed"
+    asyncio.run(scenario())
+
+async def open_breaker(p: Provider, upstream: ScriptedUpstream):
+    upstream.script = [(500, {}, {})] * 2
+    for _ in range(2):
+        with pytest.raises(UpstreamError):
+            await p.call(upstream.request())
+    await asyncio.sleep(0.15)
+    assert p.breaker.state == "half-open"
+
+def test_malformed_trial_does_not_wedge_breaker():
+    async def scenario():
+        async with ScriptedUpstream() as upstream:
+            p = provider()
+            await open_breaker(p, upstream)
+            upstream.script = [(200, {}, {"unexpected": True})]
+            with pytest.raises(KeyError):
+                await p.call(upstream.request())
+            assert p.breaker.state == "open"  # Counted as a failed trial
+            await asyncio.sleep(0.15)
+            assert await p.call(upstream.request()) == 12.5
+    asyncio.run(scenario())
+
+def test_cancelled_trial_does_not_wedge_breaker():
+    async def scenario():
+        async with ScriptedUpstream() as upstream:
+            p = provider()
+            await open_breaker(p, upstream)
+            upstream.stall = True
+            trial = asyncio.create_task(p.call(upstream.request()))
+            await asyncio.sleep(0.05)
+            with pytest.raises(CircuitOpenError):
+                await p.call(upstream.request())  # Only one trial at a time
+            trial.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await trial
+            upstream.stall = False
+            assert await p.call(upstream.request()) == 12.5
+            assert p.breaker.state == "closed"
+    asyncio.run(scenario())
@@ -0,0 +1,75 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import delete, func, insert, select
+from db import engine
+from models import WeatherRecord, WeatherRollup
+from services.retention import RetentionTask
+
+DAY = (datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(days=45)).replace(hour=12, minute=0, second=0, microsecond=0)
+
+def seed(raw: int, existing: int = 0):
+    with engine.begin() as conn:
+        conn.execute(delete(WeatherRecord))
+        conn.execute(delete(WeatherRollup))
+        conn.execute(insert(WeatherRecord), [
+            {"location": "Oslo", "temperature": float(i % 10), "weather_description": "clear sky", "created_at": DAY + timedelta(seconds=i)}
+            for i in range(raw)
+        ])
+        if existing:
+            conn.execute(insert(WeatherRollup), {
+                "location": "Oslo", "period": "day", "period_start": DAY.date(), "records": existing, "temperature_count": existing,
+                "temperature_sum": 20.0 * existing, "temperature_min": -5.0, "temperature_max": 20.0,
+            })
+
+def task(**overrides) -> RetentionTask:
+    settings = {"raw_days": 1, "daily_days": 0, "dedupe": False, "dedupe_days": 1, "interval": 3600, "batch_size": 20, "pause": 0}
+    return RetentionTask(**{**settings, **overrides})
+
+def rollups(period: str) -> list:
+    with engine.connect() as conn:
+        return conn.execute(select(WeatherRollup).where(WeatherRollup.period == period)).all()
+
+def raw_count() -> int:
+    with engine.connect() as conn:
+        return conn.execute(select(func.count()).select_from(WeatherRecord)).scalar()
+
+def test_rollup_keeps_totals_exact():
+    seed(200)
+    result = asyncio.run(task().run_once())
+    assert result["raw_rolled_up"] == 200
+    assert raw_count() == 0
+    [day] = rollups("day")
+    assert (day.records, day.temperature_count, day.temperature_sum) == (200, 200, sum(float(i % 10) for i in range(200)))
+    assert (day.temperature_min, day.temperature_max, day.weather_description) == (0.0, 9.0, "clear sky")
+
+@pytest.mark.parametrize("existing", [0, 50])
+@pytest.mark.parametrize("attempt", range(5))
+def test_concurrent_cycles_fold_each_row_once(existing, attempt):
+    # Two workers without a shared-state backend both run the cycle at the same time
+    seed(200, existing)
+
+    async def both():
+        return await asyncio.gather(task().run_once(), task().run_once())
+
+    results = asyncio.run(both())
+    assert sum(r["raw_rolled_up"] for r in results) == 200
+    assert raw_count() == 0
+    [day] = rollups("day")
+    assert day.records == 200 + existing
+    assert day.temperature_sum == pytest.approx(sum(float(i % 10) for i in range(200)) + 20.0 * existing)
+    assert day.temperature_min == (-5.0 if existing else 0.0)
+
+def test_concurrent_monthly_rollup():
+    seed(200, 50)
+    asyncio.run(task().run_once())
+
+    async def both():
+        return await asyncio.gather(task(daily_days=1, batch_size=1).run_once(), task(daily_days=1, batch_size=1).run_once())
+
+    results = asyncio.run(both())
+    assert sum(r["daily_rolled_up"] for r in results) == 1
+    assert rollups("day") == []
+    [month] = rollups("month")
+    assert month.period_start == DAY.date().replace(day=1)
+    assert month.records == 250
@@ -0,0 +1,125 @@
+import asyncio
+import time
+import fakeredis
+import pytest
+import shared_state
+from shared_state import RedisBackend, SQLiteBackend, SharedNamespace, SharedTokenBucket
+from utils.cache import TTLCache
+from weather_api import LocationNotFound
+
+@pytest.fixture(params=["redis", "sqlite"])
+def workers(request, tmp_path):
+    # Returns a factory for n backends that share one store, as separate worker processes would
+    if request.param == "redis":
+        server = fakeredis.FakeServer()
+        return lambda n: [RedisBackend(fakeredis.FakeAsyncRedis(server=server)) for _ in range(n)]
+    path = str(tmp_path / "shared.db")
+    return lambda n: [SQLiteBackend(path) for _ in range(n)]
+
+async def close(*backends):
+    for backend in backends:
+        await backend.close()
+
+def test_values_expire_and_add_is_exclusive(workers):
+    async def scenario():
+        a, b = workers(2)
+        await a.set("k:value", b"1", 0.2)
+        assert await b.get("k:value") == b"1"
+        assert await a.add("k:lease", b"1", 0.2) is True
+        assert await b.add("k:lease", b"1", 0.2) is False
+        assert await b.size("k:") == 2
+        await asyncio.sleep(0.3)
+        assert await b.get("k:value") is None
+        assert await b.add("k:lease", b"1", 5) is True  # The expired lease is free again
+        await a.delete("k:lease")
+        assert await a.get("k:lease") is None
+        await close(a, b)
+    asyncio.run(scenario())
+
+def test_token_bucket_is_shared_across_workers(workers):
+    async def scenario():
+        a, b = workers(2)
+        waits = [await backend.reserve("bucket:test", 10, 2) for backend in (a, b, a, b)]
+        await close(a, b)
+        return waits
+
+    first, second, third, fourth = asyncio.run(scenario())
+    assert first == second == 0  # The burst, used by two workers
+    assert third == pytest.approx(0.1, abs=0.02)
+    assert fourth == pytest.approx(0.2, abs=0.02)
+
+def test_shared_rate_limit_paces_all_workers(workers):
+    async def scenario():
+        backends = workers(3)
+        buckets = [SharedTokenBucket(backend, "provider", rate=20, burst=1) for backend in backends]
+        started = time.monotonic()
+        await asyncio.gather(*(bucket.acquire() for bucket in buckets for _ in range(3)))
+        elapsed = time.monotonic() - started
+        await close(*backends)
+        return elapsed
+
+    # 9 calls at 20/s with a burst of 1: the last may go 0.4s in, however many workers share the quota
+    assert asyncio.run(scenario()) >= 0.35
+
+def test_loads_are_coalesced_across_workers(workers):
+    async def scenario():
+        backends = workers(3)
+        caches = [TTLCache(shared=SharedNamespace(backend, "weather")) for backend in backends]
+        loads = 0
+
+        async def load():
+            nonlocal loads
+            loads += 1
+            await asyncio.sleep(0.1)
+            return {"temperature": 12.5}
+
+        values = await asyncio.gather(*(cache.get_or_load(("current", "oslo"), load, 60) for cache in caches))
+        await close(*backends)
+        return loads, values, caches
+
+    loads, values, caches = asyncio.run(scenario())
+    assert loads == 1
+    assert values == [{"temperature": 12.5}] * 3
+    assert sum(cache.shared_coalesced + cache.shared_hits for cache in caches) == 2
+
+def test_claim_picks_one_worker_per_window(workers, monkeypatch):
+    async def scenario():
+        a, b = workers(2)
+        monkeypatch.setattr(shared_state, "backend", a)
+        first = await shared_state.claim("retention", 0.2)
+        monkeypatch.setattr(shared_state, "backend", b)
+        second = await shared_state.claim("retention", 0.2)
+        await asyncio.sleep(0.3)
+        third = await shared_state.claim("retention", 0.2)
+        await close(a, b)
+        return first, second, third
+
+    assert asyncio.run(scenario()) == (True, False, True)
+
+def test_claim_without_backend_lets_every_worker_run(monkeypatch):
+    monkeypatch.setattr(shared_state, "backend", None)
+    assert asyncio.run(shared_state.claim("retention", 60)) is True
+    assert asyncio.run(shared_state.claim("retention", 60)) is True
+
+def test_waiters_stop_when_the_lease_holder_fails(workers):
+    async def scenario():
+        backends = workers(2)
+        caches = [TTLCache(shared=SharedNamespace(backend, "geocode")) for backend in backends]
+        loads = 0
+
+        async def load():
+            nonlocal loads
+            loads += 1
+            await asyncio.sleep(0.1)
+            raise LocationNotFound()
+
+        started = time.monotonic()
+        outcomes = await asyncio.gather(*(cache.get_or_load("atlantis", load, 60) for cache in caches), return_exceptions=True)
+        elapsed = time.monotonic() - started
+        await close(*backends)
+        return outcomes, loads, elapsed
+
+    outcomes, loads, elapsed = asyncio.run(scenario())
+    assert all(isinstance(o, LocationNotFound) for o in outcomes)
+    assert loads == 2  # The waiter tried itself once the holder gave up
+    assert elapsed < shared_state.SHARED_LOCK_TTL / 5
@@ -0,0 +1,131 @@
+from datetime import date, datetime, timedelta, timezone
+from sqlalchemy import select, func, and_
+from db import SessionLocal, engine
+from models import WeatherObservation
+from utils.geo import geohash
+
+# Open-Meteo variables kept per resolution, mapped to WeatherObservation columns
+DAILY_VARIABLES = {
+    "temperature_2m_mean": "temperature",
+    "temperature_2m_min": "temperature_min",
+    "temperature_2m_max": "temperature_max",
+    "precipitation_sum": "precipitation",
+    "wind_speed_10m_max": "wind_speed",
+    "weather_code": "weather_code",
+}
+HOURLY_VARIABLES = {
+    "temperature_2m": "temperature",
+    "precipitation": "precipitation",
+    "wind_speed_10m": "wind_speed",
+    "weather_code": "weather_code",
+}
+RESOLUTIONS = {"daily": DAILY_VARIABLES, "hourly": HOURLY_VARIABLES}
+
+SERIES_FIELDS = ["ts", "temperature", "temperature_min", "temperature_max", "precipitation", "wind_speed", "weather_code"]
+
+def series_key(lat: float, lon: float) -> str:
+    # Geohash cell (GEO_CELL_PRECISION), so every spelling of a place, and its near neighbours, share one series
+    return geohash(lat, lon)
+
+def _day_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+def parse_response(location: str, data: dict) -> list[dict]:
+    fetched_at = datetime.now(timezone.utc).replace(tzinfo=None)
+    rows = []
+    for resolution, variables in RESOLUTIONS.items():
+        block = data.get(resolution) or {}
+        times = block.get("time") or []
+        # Column-oriented response: zip the arrays instead of indexing per value
+        columns = [(column, block.get(name) or [None] * len(times)) for name, column in variables.items()]
+        for i, ts in enumerate(times):
+            row = {"location": location, "resolution": resolution, "ts": datetime.fromisoformat(ts), "fetched_at": fetched_at}
+            for column, values in columns:
+                row[column] = values[i]
+            rows.append(row)
+    return rows
+
+def _upsert_statement():
+    # Re-fetched forecasts overwrite the stored values for the same timestamps
+    if engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(WeatherObservation)
+    updated = {c: stmt.excluded[c] for c in ("temperature", "temperature_min", "temperature_max", "precipitation", "wind_speed", "weather_code", "fetched_at")}
+    return stmt.on_conflict_do_update(index_elements=["location", "ts", "resolution"], set_=updated)
+
+def store(rows: list[dict]) -> int:
+    if not rows:
+        return 0
+    db = SessionLocal()
+    try:
+        # One executemany round trip for the whole batch
+        db.execute(_upsert_statement(), rows)
+        db.commit()
+    finally:
+        db.close()
+    return len(rows)
+
+def missing_days(location: str, start: date, end: date, forecast_ttl: float, resolution: str = "daily") -> list[date]:
+    # Past days are final once stored; today and later are forecasts and go stale after forecast_ttl
+    today = datetime.now(timezone.utc).date()
+    fresh_after = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(seconds=forecast_ttl)
+    day = WeatherObservation.ts
+    stmt = select(day).where(
+        WeatherObservation.location == location,
+        WeatherObservation.resolution == resolution,
+        day >= _day_start(start),
+        day < _day_start(end + timedelta(days=1)),
+        (day < _day_start(today)) | (WeatherObservation.fetched_at >= fresh_after),
+    )
+    db = SessionLocal()
+    try:
+        stored = {ts.date() for ts in db.scalars(stmt)}
+    finally:
+        db.close()
+    return [start + timedelta(days=i) for i in range((end - start).days + 1) if start + timedelta(days=i) not in stored]
+
+def _window(location: str, start: date, end: date, resolution: str):
+    return and_(
+        WeatherObservation.location == location,
+        WeatherObservation.resolution == resolution,
+        WeatherObservation.ts >= _day_start(start),
+        WeatherObservation.ts < _day_start(end + timedelta(days=1)),
+    )
+
+def series(location: str, start: date, end: date, resolution: str = "daily") -> list[dict]:
+    columns = [getattr(WeatherObservation, f) for f in SERIES_FIELDS]
+    stmt = select(*columns).where(_window(location, start, end, resolution)).order_by(WeatherObservation.ts)
+    db = SessionLocal()
+    try:
+        return [dict(zip(SERIES_FIELDS, row)) for row in db.execute(stmt)]
+    finally:
+        db.close()
+
+def aggregate(location: str, start: date, end: date, resolution: str = "daily") -> dict:
+    o = WeatherObservation
+    stmt = select(
+        func.count(o.ts),
+        func.min(func.coalesce(o.temperature_min, o.temperature)),
+        func.max(func.coalesce(o.temperature_max, o.temperature)),
+        func.avg(o.temperature),
+        func.sum(o.precipitation),
+        func.max(o.wind_speed),
+    ).where(_window(location, start, end, resolution))
+    first_code = select(o.weather_code).where(_window(location, start, end, resolution)).order_by(o.ts).limit(1).scalar_subquery()
+    db = SessionLocal()
+    try:
+        count, t_min, t_max, t_mean, precipitation, wind = db.execute(stmt).one()
+        weather_code = db.scalar(select(first_code))
+    finally:
+        db.close()
+    return {
+        "points": count,
+        "temperature_min": t_min,
+        "temperature_max": t_max,
+        "temperature_mean": t_mean,
+        "precipitation_total": precipitation,
+        "wind_speed_max": wind,
+        "first_weather_code": weather_code,
+    }
@@ -0,0 +1,123 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+class TTLCache:
+    # Size-bounded LRU cache with per-entry TTL (None = never expires) and
+    # coalescing of concurrent misses onto a single in-flight load. With a
+    # `shared` namespace (see shared_state.py) misses first consult the store
+    # shared by all workers, and only one worker at a time loads a given key.
+    def __init__(self, maxsize: int = 1024, shared=None):
+        self.maxsize = maxsize
+        self.shared = shared
+        self._data: OrderedDict = OrderedDict()  # key -> (value, expires_at)
+        self._inflight: dict = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+        self.stale_served = 0
+        self.shared_hits = 0
+        self.shared_coalesced = 0
+
+    def get(self, key, default=None):
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            # Expired entries stay until evicted so they can be served stale on upstream failure
+            return default
+        self._data.move_to_end(key)
+        return value
+
+    def get_stale(self, key, default=None):
+        entry = self._data.get(key)
+        return default if entry is None else entry[0]
+
+    def set(self, key, value, ttl: float | None = None):
+        expires_at = time.monotonic() + ttl if ttl is not None else None
+        self._data[key] = (value, expires_at)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def publish(self, key, value, ttl: float | None = None):
+        # set() plus the shared store, for values produced outside get_or_load
+        self.set(key, value, ttl)
+        if self.shared is not None:
+            await self.shared.set(key, value, ttl)
+
+    def invalidate(self, key):
+        self._data.pop(key, None)
+
+    def clear(self):
+        self._data.clear()
+
+    async def get_or_load(self, key, loader, ttl: float | None = None, stale_on: tuple = ()):
+        _missing = object()
+        value = self.get(key, _missing)
+        if value is not _missing:
+            self.hits += 1
+            return value
+        task = self._inflight.get(key)
+        leader = task is None  # Callers arriving while a load is in flight wait for that load
+        if leader:
+            self.misses += 1
+            task = asyncio.ensure_future(self._load(key, loader, ttl))
+            self._inflight[key] = task
+        else:
+            self.coalesced += 1
+        try:
+            value, ttl = await asyncio.shield(task)
+        except stale_on:
+            # Degrade to the last known value rather than failing the request; waiters too
+            stale = self.get_stale(key, _missing)
+            if stale is _missing:
+                raise
+            self.stale_served += 1
+            return stale
+        finally:
+            if leader:
+                self._inflight.pop(key, None)
+        if leader:
+            self.set(key, value, ttl)
+        return value
+
+    async def _load(self, key, loader, ttl: float | None) -> tuple:
+        # Returns (value, ttl for the local copy)
+        if self.shared is None:
+            return await loader(), ttl
+        entry = await self.shared.get(key)
+        if entry is not None:
+            self.shared_hits += 1
+            return entry
+        if not await self.shared.lease(key):
+            # Another worker is loading this key; take its result rather than calling upstream too
+            entry = await self.shared.wait(key)
+            if entry is not None:
+                self.shared_coalesced += 1
+                return entry
+            return await loader(), ttl
+        try:
+            value = await loader()
+            await self.shared.set(key, value, ttl)
+        finally:
+            await self.shared.release(key)
+        return value, ttl
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "stale_served": self.stale_served,
+            "shared_hits": self.shared_hits,
+            "shared_coalesced": self.shared_coalesced,
+            "hit_ratio": round((self.hits + self.coalesced) / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,65 @@
+import math
+import os
+
+# Spatial keys: coordinates are snapped to a geohash cell so nearby spellings of a
+# place ("New York", "NYC", "10001", "40.7128,-74.0060") share cached and stored data.
+# Precision 5 is a ~4.9 x 4.9 km cell at the equator (narrower towards the poles);
+# 6 is ~1.2 x 0.6 km, 4 is ~39 x 20 km.
+GEO_CELL_PRECISION = int(os.getenv("GEO_CELL_PRECISION", "5"))
+
+EARTH_RADIUS_KM = 6371.0088
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash(lat: float, lon: float, precision: int = GEO_CELL_PRECISION) -> str:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True  # Bits alternate longitude, latitude, starting with longitude
+    while len(chars) < precision:
+        interval, coord = (lon_range, lon) if even else (lat_range, lat)
+        mid = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coord >= mid:
+            value |= 1
+            interval[0] = mid
+        else:
+            interval[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits = value = 0
+    return "".join(chars)
+
+def cell_center(cell: str) -> tuple[float, float]:
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in cell:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            interval = lon_range if even else lat_range
+            mid = (interval[0] + interval[1]) / 2
+            if value >> shift & 1:
+                interval[0] = mid
+            else:
+                interval[1] = mid
+            even = not even
+    return (lat_range[0] + lat_range[1]) / 2, (lon_range[0] + lon_range[1]) / 2
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi, dlmb = phi2 - phi1, math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def bounding_box(lat: float, lon: float, radius_km: float) -> tuple[float, float, float, float]:
+    # (min_lat, max_lat, min_lon, max_lon) enclosing the circle; an index-friendly prefilter for haversine_km
+    dlat = math.degrees(radius_km / EARTH_RADIUS_KM)
+    min_lat, max_lat = max(-90.0, lat - dlat), min(90.0, lat + dlat)
+    if min_lat <= -90 or max_lat >= 90:
+        return min_lat, max_lat, -180.0, 180.0
+    dlon = math.degrees(radius_km / (EARTH_RADIUS_KM * math.cos(math.radians(lat))))
+    if dlon >= 180 or not -180 <= lon - dlon <= lon + dlon <= 180:
+        return min_lat, max_lat, -180.0, 180.0  # Crosses the antimeridian: fall back to a latitude band
+    return min_lat, max_lat, lon - dlon, lon + dlon
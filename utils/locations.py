@@ -0,0 +1,24 @@
+import re
+
+_LAT_LON = re.compile(r"^\s*([-+]?\d{1,3}(?:\.\d+)?)\s*,\s*([-+]?\d{1,3}(?:\.\d+)?)\s*$")
+_ZIP = re.compile(r"^\s*(\d{5})(?:-\d{4})?\s*(?:,\s*([A-Za-z]{2}))?\s*$")
+
+def parse_lat_lon(location: str) -> tuple[float, float] | None:
+    # "40.7128,-74.0060" style inputs resolve locally without a geocoder
+    match = _LAT_LON.match(location)
+    if not match:
+        return None
+    lat, lon = float(match.group(1)), float(match.group(2))
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        return None
+    return lat, lon
+
+def normalize_location(location: str) -> str:
+    coords = parse_lat_lon(location)
+    if coords:
+        return f"{coords[0]:.4f},{coords[1]:.4f}"
+    zip_match = _ZIP.match(location)
+    if zip_match:
+        country = (zip_match.group(2) or "us").lower()
+        return f"zip:{zip_match.group(1)},{country}"
+    return " ".join(location.split()).casefold()
@@ -0,0 +1,38 @@
+import json
+from typing import Any
+from fastapi.responses import Response
+
+# JSON encoding for the hot read paths. orjson (optional) serializes dates, floats
+# and nested lists natively in C; the stdlib fallback produces the same output
+# (compact separators, ISO dates) so clients cannot tell which one ran.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _default(value: Any):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+if orjson is not None:
+    def dumps(value: Any) -> bytes:
+        return orjson.dumps(value, default=_default)
+else:
+    def dumps(value: Any) -> bytes:
+        return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+def dumps_str(value: Any) -> str:
+    return dumps(value).decode("utf-8")
+
+def rows_to_dicts(fields: list[str], rows) -> list[dict]:
+    # Plain dicts straight from column tuples; no ORM instances, no model validation
+    return [dict(zip(fields, row)) for row in rows]
+
+class FastJSONResponse(Response):
+    # Body is already plain data (dicts/lists of primitives, dates): encode it once,
+    # without the jsonable_encoder walk or a response_model re-validation
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -1,5 +1,5 @@
-from datetime import date, timedelta
-from weather_api import check_location_exists  # Reuse API to validate location
+import os
+from datetime import date, datetime, timedelta, timezone
 from fastapi import HTTPException
 
 def validate_date_range(start: date | None, end: date | None):
@@ -11,5 +11,17 @@ def validate_date_range(start: date | None, end: date | None):
         # No future-only check; Open-Meteo supports historical
     # Additional checks
 
-async def validate_location(location: str) -> bool:
-    return await check_location_exists(location)  # Fuzzy match via API response
+# Stored time series (/timeseries) may span years: Open-Meteo history starts in 1940, forecasts reach 16 days out
+HISTORY_MAX_DAYS = int(os.getenv("HISTORY_MAX_DAYS", "3660"))
+HISTORY_EARLIEST = date(1940, 1, 1)
+FORECAST_HORIZON_DAYS = 16
+
+def validate_series_range(start: date, end: date):
+    if start > end:
+        raise HTTPException(status_code=400, detail="Start date must be before end date")
+    if start < HISTORY_EARLIEST:
+        raise HTTPException(status_code=400, detail=f"History is available from {HISTORY_EARLIEST}.")
+    if end > datetime.now(timezone.utc).date() + timedelta(days=FORECAST_HORIZON_DAYS):
+        raise HTTPException(status_code=400, detail=f"Forecasts reach at most {FORECAST_HORIZON_DAYS} days ahead.")
+    if (end - start).days + 1 > HISTORY_MAX_DAYS:
+        raise HTTPException(status_code=400, detail=f"Range cannot exceed {HISTORY_MAX_DAYS} days.")
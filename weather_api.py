@@ -1,8 +1,20 @@
 import os
-import aiohttp
+import http_client
+import resilience
+import timeseries
+import shared_state
+from resilience import UpstreamError
 from dotenv import load_dotenv
-from datetime import date, datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 import logging
+import asyncio
+from typing import NamedTuple
+from sqlalchemy.exc import IntegrityError
+from utils.cache import TTLCache
+from utils.locations import normalize_location, parse_lat_lon
+from utils.geo import geohash, cell_center
+from db import SessionLocal
+from models import GeocodeCache
 
 logging.basicConfig(level=logging.INFO)
 
@@ -11,121 +23,276 @@ load_dotenv()
 OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
 YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")  # Optional
 
-async def geocode_location(location: str) -> dict:
-    async with aiohttp.ClientSession() as session:
-        url = f"https://nominatim.openstreetmap.org/search?q={location}&format=json&limit=1"
-        headers = {'User-Agent': 'WeatherApp/1.0'}  # Required for Nominatim
-        async with session.get(url, headers=headers) as response:
+# Provider endpoints; override to point at a local stand-in (see benchmarks/fake_upstream.py)
+OPENWEATHER_BASE_URL = os.getenv("OPENWEATHER_BASE_URL", "http://api.openweathermap.org")
+NOMINATIM_BASE_URL = os.getenv("NOMINATIM_BASE_URL", "https://nominatim.openstreetmap.org")
+OPEN_METEO_BASE_URL = os.getenv("OPEN_METEO_BASE_URL", "https://api.open-meteo.com")
+OPEN_METEO_ARCHIVE_URL = os.getenv("OPEN_METEO_ARCHIVE_URL", "https://archive-api.open-meteo.com")
+
+# Historical downloads: long ranges are split into chunks fetched in parallel
+HISTORY_CHUNK_DAYS = int(os.getenv("HISTORY_CHUNK_DAYS", "366"))
+HISTORY_CONCURRENCY = int(os.getenv("HISTORY_CONCURRENCY", "4"))
+ARCHIVE_LAG_DAYS = int(os.getenv("ARCHIVE_LAG_DAYS", "5"))  # the archive trails real time by a few days
+
+# In-process cache in front of the weather providers
+WEATHER_CACHE_SIZE = int(os.getenv("WEATHER_CACHE_SIZE", "2048"))
+CURRENT_WEATHER_TTL = float(os.getenv("CURRENT_WEATHER_TTL", "600"))  # seconds
+FORECAST_TTL = float(os.getenv("FORECAST_TTL", "10800"))  # seconds; past-only ranges never expire
+
+weather_cache = TTLCache(maxsize=WEATHER_CACHE_SIZE, shared=shared_state.namespace("weather"))
+
+# Coordinates never change, so geocodes are kept in memory (LRU) and persisted to geocode_cache
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "10000"))
+
+geocode_cache = TTLCache(maxsize=GEOCODE_CACHE_SIZE, shared=shared_state.namespace("geocode"))
+
+class LocationNotFound(UpstreamError):
+    def __init__(self, message: str = "Location not found"):
+        super().__init__(message, status=404)
+
+def _upstream_error(message: str, response) -> UpstreamError:
+    retry_after = getattr(response, "headers", {}).get("Retry-After")
+    return UpstreamError(message, response.status, float(retry_after) if retry_after and retry_after.isdigit() else None)
+
+class ResolvedLocation(NamedTuple):
+    # Canonical location resolved once per request and reused for every lookup
+    name: str
+    lat: float
+    lon: float
+
+def cell_of(place: ResolvedLocation) -> str:
+    # Weather is cached and stored per grid cell, not per spelling of the place
+    return geohash(place.lat, place.lon)
+
+def spatial_columns(lat: float | None, lon: float | None) -> dict:
+    # WeatherRecord position columns for a resolved place
+    if lat is None or lon is None:
+        return {}
+    return {"latitude": lat, "longitude": lon, "cell": geohash(lat, lon)}
+
+def known_location(location: str) -> ResolvedLocation | None:
+    # Coordinates already on hand for this spelling (no network); lets aliases share a cell
+    coords = parse_lat_lon(location)
+    if coords:
+        return ResolvedLocation(location.strip(), *coords)
+    geo = geocode_cache.get(normalize_location(location))
+    return ResolvedLocation(geo.get("name") or location, geo["lat"], geo["lon"]) if geo else None
+
+async def _geocode_remote(location: str) -> dict:
+    url = f"{NOMINATIM_BASE_URL}/search?q={location}&format=json&limit=1"
+    headers = {'User-Agent': 'WeatherApp/1.0'}  # Required for Nominatim
+
+    async def request():
+        async with http_client.get(url, provider="nominatim", headers=headers) as response:
             logging.info(f"Geocode API status for {location}: {response.status}")
             if response.status != 200:
                 error_data = await response.text()
                 logging.error(f"Geocode API error: {error_data}")
-                raise ValueError(f"Failed to geocode location: {error_data}")
+                raise _upstream_error(f"Failed to geocode location: {error_data}", response)
             data = await response.json()
             if not data:
-                raise ValueError("Location not found")
-            return {"lat": float(data[0]["lat"]), "lon": float(data[0]["lon"])}
-
-async def fetch_current_weather(location: str) -> dict:
-    async with aiohttp.ClientSession() as session:
-        url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={OPENWEATHER_API_KEY}&units=metric"
-        async with session.get(url) as response:
-            logging.info(f"Current weather API status for {location}: {response.status}")
+                raise LocationNotFound("Location not found")
+            return {"lat": float(data[0]["lat"]), "lon": float(data[0]["lon"]), "name": data[0].get("name") or location}
+
+    return await resilience.NOMINATIM.call(request)
+
+def _read_geocode(key: str) -> dict | None:
+    db = SessionLocal()
+    try:
+        row = db.query(GeocodeCache).filter(GeocodeCache.query == key).first()
+        if not row:
+            return None
+        return {"lat": row.latitude, "lon": row.longitude, "name": row.name}
+    finally:
+        db.close()
+
+def _store_geocode(key: str, geo: dict):
+    db = SessionLocal()
+    try:
+        db.add(GeocodeCache(query=key, name=geo["name"], latitude=geo["lat"], longitude=geo["lon"]))
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # Another worker stored it first
+    finally:
+        db.close()
+
+async def _load_geocode(location: str, key: str) -> dict:
+    geo = await asyncio.to_thread(_read_geocode, key)
+    if geo is None:
+        geo = await _geocode_remote(location)
+        await asyncio.to_thread(_store_geocode, key, geo)
+    return geo
+
+async def geocode_location(location: str) -> dict:
+    # Lat/lon inputs never need the network; everything else goes memory -> DB -> Nominatim
+    coords = parse_lat_lon(location)
+    if coords:
+        return {"lat": coords[0], "lon": coords[1], "name": location.strip()}
+    key = normalize_location(location)
+    return await geocode_cache.get_or_load(key, lambda: _load_geocode(location, key))
+
+def warm_geocode_cache():
+    db = SessionLocal()
+    try:
+        rows = db.query(GeocodeCache).order_by(GeocodeCache.id.desc()).limit(GEOCODE_CACHE_SIZE).all()
+        for row in reversed(rows):
+            geocode_cache.set(row.query, {"lat": row.latitude, "lon": row.longitude, "name": row.name})
+        logging.info(f"Geocode cache warmed with {len(rows)} entries")
+    finally:
+        db.close()
+
+async def resolve_location(location: str) -> ResolvedLocation:
+    geo = await geocode_location(location)
+    return ResolvedLocation(geo.get("name") or location, geo["lat"], geo["lon"])
+
+async def _fetch_current_weather(location: str | ResolvedLocation) -> dict:
+    if isinstance(location, ResolvedLocation):
+        query, label = f"lat={location.lat}&lon={location.lon}", location.name
+    else:
+        query, label = f"q={location}", location
+    url = f"{OPENWEATHER_BASE_URL}/data/2.5/weather?{query}&appid={OPENWEATHER_API_KEY}&units=metric"
+
+    async def request():
+        async with http_client.get(url, provider="openweathermap") as response:
+            logging.info(f"Current weather API status for {label}: {response.status}")
             if response.status != 200:
                 error_data = await response.text()
                 logging.error(f"Current weather API error: {error_data}")
-                raise ValueError(f"Failed to fetch weather: {error_data}")
+                if response.status == 404:
+                    raise LocationNotFound(f"Failed to fetch weather: {error_data}")
+                raise _upstream_error(f"Failed to fetch weather: {error_data}", response)
             data = await response.json()
-            return {"temperature": data["main"]["temp"], "description": data["weather"][0]["description"]}
+            # OpenWeatherMap echoes the resolved place, so a by-name lookup also resolves the location
+            return {
+                "temperature": data["main"]["temp"],
+                "description": data["weather"][0]["description"],
+                "name": data.get("name") or label,
+                "lat": data.get("coord", {}).get("lat"),
+                "lon": data.get("coord", {}).get("lon"),
+            }
 
-async def fetch_forecast(location: str, start: date, end: date) -> dict:
-    geo = await geocode_location(location)
-    lat, lon = geo["lat"], geo["lon"]
-    async with aiohttp.ClientSession() as session:
-        url = f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}&daily=temperature_2m_mean,weather_code&start_date={start}&end_date={end}&timezone=UTC"
-        async with session.get(url) as response:
-            logging.info(f"Forecast API status for {location} ({start} to {end}): {response.status}")
+    return await resilience.OPENWEATHER.call(request)
+
+async def _fetch_open_meteo(place: ResolvedLocation, start: date, end: date, archive: bool = False, hourly: bool = True) -> dict:
+    variables = f"daily={','.join(timeseries.DAILY_VARIABLES)}"
+    if hourly:
+        variables += f"&hourly={','.join(timeseries.HOURLY_VARIABLES)}"
+    endpoint = f"{OPEN_METEO_ARCHIVE_URL}/v1/archive" if archive else f"{OPEN_METEO_BASE_URL}/v1/forecast"
+    url = f"{endpoint}?latitude={place.lat}&longitude={place.lon}&{variables}&start_date={start}&end_date={end}&timezone=UTC"
+
+    async def request():
+        async with http_client.get(url, provider="open-meteo") as response:
+            logging.info(f"{'Archive' if archive else 'Forecast'} API status for {place.name} ({start} to {end}): {response.status}")
             if response.status != 200:
                 error_data = await response.text()
                 logging.error(f"Forecast API error: {error_data}")
-                raise ValueError(f"Failed to fetch forecast: {error_data}")
-            data = await response.json()
-            temps = data["daily"]["temperature_2m_mean"]
-            if not temps:
-                raise ValueError("No forecast data available for the date range. Open-Meteo supports historical since 1940 and future up to 7 days.")
-            avg_temp = sum(temps) / len(temps)
-            desc_code = data["daily"]["weather_code"][0] if data["daily"]["weather_code"] else 0
-            desc_map = {0: "clear sky", 1: "mainly clear", 2: "partly cloudy", 3: "overcast", 45: "fog", 51: "light drizzle", 61: "light rain", 80: "rain showers"}  # Simplified WMO codes
-            desc = desc_map.get(desc_code, "unknown")
-            return {"temperature": avg_temp, "description": f"Forecast average: {desc}"}
-
-async def check_location_exists(location: str) -> bool:
-    try:
-        await fetch_current_weather(location)
-        return True
-    except ValueError as e:
-        logging.error(f"Location validation failed for {location}: {str(e)}")
-        return False
+                raise _upstream_error(f"Failed to fetch forecast: {error_data}", response)
+            return await response.json()
+
+    return await resilience.OPEN_METEO.call(request)
+
+def _plan_chunks(missing: list[date]) -> list[tuple[date, date, bool]]:
+    # Contiguous runs of missing days, split at the archive boundary and at HISTORY_CHUNK_DAYS
+    archive_before = datetime.now(timezone.utc).date() - timedelta(days=ARCHIVE_LAG_DAYS)
+    chunks = []
+    first = last = None
+    for day in missing:
+        if (last is not None and day == last + timedelta(days=1) and (day < archive_before) == (first < archive_before)
+                and (day - first).days < HISTORY_CHUNK_DAYS):
+            last = day
+            continue
+        if first is not None:
+            chunks.append((first, last, first < archive_before))
+        first = last = day
+    if first is not None:
+        chunks.append((first, last, first < archive_before))
+    return chunks
+
+async def load_series(place: ResolvedLocation, start: date, end: date, resolution: str = "daily") -> tuple[str, dict]:
+    # Only gaps in the stored series are downloaded; a fully covered range makes no network calls
+    key = timeseries.series_key(place.lat, place.lon)
+    missing = await asyncio.to_thread(timeseries.missing_days, key, start, end, FORECAST_TTL, resolution)
+    chunks = _plan_chunks(missing)
+    # The series belongs to the whole cell, so it is fetched for the cell centre whichever alias asked first
+    center = ResolvedLocation(place.name, *cell_center(key))
+    semaphore = asyncio.Semaphore(HISTORY_CONCURRENCY)
+
+    async def load_chunk(first: date, last: date, archive: bool) -> int:
+        # Hourly history is large, so the archive is only asked for it when it was requested
+        async with semaphore:
+            data = await _fetch_open_meteo(center, first, last, archive, hourly=resolution == "hourly" or not archive)
+        # Each chunk is written as soon as it arrives instead of collecting the whole range in memory
+        return await asyncio.to_thread(timeseries.store, timeseries.parse_response(key, data))
+
+    rows = await asyncio.gather(*(load_chunk(*chunk) for chunk in chunks))
+    return key, {"days": (end - start).days + 1, "missing_days": len(missing), "chunks": len(chunks), "rows_stored": sum(rows)}
+
+async def _fetch_forecast(place: ResolvedLocation, start: date, end: date) -> dict:
+    key, _ = await load_series(place, start, end)
+    summary = await asyncio.to_thread(timeseries.aggregate, key, start, end)
+    if summary["temperature_mean"] is None:
+        raise ValueError("No forecast data available for the date range. Open-Meteo supports historical since 1940 and future up to 7 days.")
+    desc_map = {0: "clear sky", 1: "mainly clear", 2: "partly cloudy", 3: "overcast", 45: "fog", 51: "light drizzle", 61: "light rain", 80: "rain showers"}  # Simplified WMO codes
+    desc = desc_map.get(summary["first_weather_code"] or 0, "unknown")
+    return {"temperature": summary["temperature_mean"], "description": f"Forecast average: {desc}"}
+
+def current_cache_key(location: str | ResolvedLocation) -> tuple:
+    if isinstance(location, ResolvedLocation):
+        return ("current", cell_of(location))
+    return ("current", normalize_location(location))
+
+async def remember_current(location: str | ResolvedLocation, data: dict):
+    # Cache a current-weather result under the spelling it was asked by and under its cell,
+    # and learn the spelling's coordinates so the next alias lookup lands on the cell
+    await weather_cache.publish(current_cache_key(location), data, CURRENT_WEATHER_TTL)
+    if data.get("lat") is None or data.get("lon") is None:
+        return
+    place = ResolvedLocation(data["name"], data["lat"], data["lon"])
+    await weather_cache.publish(current_cache_key(place), data, CURRENT_WEATHER_TTL)
+    if isinstance(location, str) and not parse_lat_lon(location):
+        key = normalize_location(location)
+        if geocode_cache.get(key) is None:
+            await geocode_cache.publish(key, {"lat": place.lat, "lon": place.lon, "name": place.name})
+
+async def refresh_current_weather(location: str | ResolvedLocation) -> dict:
+    # Always asks the provider, then publishes the result so readers skip the upstream call;
+    # for pollers whose job is keeping the cache fresh
+    if isinstance(location, str) and parse_lat_lon(location):
+        location = await resolve_location(location)
+    data = await _fetch_current_weather(location)
+    await remember_current(location, data)
+    return data
+
+async def fetch_current_weather(location: str | ResolvedLocation) -> dict:
+    if isinstance(location, str):
+        location = known_location(location) or location
+    key = current_cache_key(location)
+    return await weather_cache.get_or_load(key, lambda: refresh_current_weather(location), CURRENT_WEATHER_TTL, stale_on=(UpstreamError,))
+
+async def fetch_forecast(location: str | ResolvedLocation, start: date, end: date) -> dict:
+    place = location if isinstance(location, ResolvedLocation) else await resolve_location(location)
+    key = ("forecast", cell_of(place), start, end)
+    # Historical data never changes, so past-only ranges stay cached until evicted
+    ttl = None if end < datetime.now(timezone.utc).date() else FORECAST_TTL
+    return await weather_cache.get_or_load(key, lambda: _fetch_forecast(place, start, end), ttl, stale_on=(UpstreamError,))
+
+async def resolve_weather(location: str, start: date | None = None, end: date | None = None) -> tuple[ResolvedLocation, dict]:
+    # Single resolution pipeline: the location is resolved once and that result
+    # doubles as validation, so no upstream call is made only to be thrown away.
+    if start and end:
+        place = await resolve_location(location)
+        return place, await fetch_forecast(place, start, end)
+    if parse_lat_lon(location):
+        place = await resolve_location(location)
+        return place, await fetch_current_weather(place)
+    data = await fetch_current_weather(location)
+    return ResolvedLocation(data["name"], data["lat"], data["lon"]), data
 
 # Optional: YouTube integration
 async def fetch_youtube_videos(location: str) -> list:
     if not YOUTUBE_API_KEY:
         return []
-    async with aiohttp.ClientSession() as session:
-        url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&q={location}+travel&key={YOUTUBE_API_KEY}"
-        async with session.get(url) as response:
-            data = await response.json()
-            return [item["snippet"]["title"] for item in data.get("items", [])]
-
-
-
-
-# import os
-# import aiohttp
-# from dotenv import load_dotenv
-# from datetime import date, datetime, timezone
-
-# load_dotenv()
-
-# OPENWEATHER_API_KEY = os.getenv("OPENWEATHER_API_KEY")
-# YOUTUBE_API_KEY = os.getenv("YOUTUBE_API_KEY")  # Optional
-
-# async def fetch_current_weather(location: str) -> dict:
-#     async with aiohttp.ClientSession() as session:
-#         url = f"http://api.openweathermap.org/data/2.5/weather?q={location}&appid={OPENWEATHER_API_KEY}&units=metric"
-#         async with session.get(url) as response:
-#             if response.status != 200:
-#                 raise ValueError("Failed to fetch weather")
-#             data = await response.json()
-#             return {"temperature": data["main"]["temp"], "description": data["weather"][0]["description"]}
-
-# async def fetch_forecast(location: str, start: date, end: date) -> dict:
-#     async with aiohttp.ClientSession() as session:
-#         url = f"http://api.openweathermap.org/data/2.5/forecast?q={location}&appid={OPENWEATHER_API_KEY}&units=metric"
-#         async with session.get(url) as response:
-#             if response.status != 200:
-#                 raise ValueError("Failed to fetch forecast")
-#             data = await response.json()
-#             start_ts = int(datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc).timestamp())
-#             end_ts = int(datetime.combine(end, datetime.max.time(), tzinfo=timezone.utc).timestamp())
-#             filtered_temps = [item["main"]["temp"] for item in data["list"] if start_ts <= item["dt"] <= end_ts]
-#             desc = data["list"][0]["weather"][0]["description"] if data["list"] else "No data"
-#             avg_temp = sum(filtered_temps) / len(filtered_temps) if filtered_temps else 0
-#             return {"temperature": avg_temp, "description": f"Forecast average: {desc}"}
-
-# async def check_location_exists(location: str) -> bool:
-#     try:
-#         await fetch_current_weather(location)
-#         return True
-#     except ValueError:
-#         return False
-
-# # Optional: YouTube integration
-# async def fetch_youtube_videos(location: str) -> list:
-#     if not YOUTUBE_API_KEY:
-#         return []
-#     async with aiohttp.ClientSession() as session:
-#         url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&q={location}+travel&key={YOUTUBE_API_KEY}"
-#         async with session.get(url) as response:
-#             data = await response.json()
-#             return [item["snippet"]["title"] for item in data.get("items", [])]
\ No newline at end of file
+    url = f"https://www.googleapis.com/youtube/v3/search?part=snippet&q={location}+travel&key={YOUTUBE_API_KEY}"
+    async with http_client.get(url, provider="youtube") as response:
+        data = await response.json()
+        return [item["snippet"]["title"] for item in data.get("items", [])]
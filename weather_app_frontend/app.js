@@ -10,6 +10,8 @@ document.addEventListener('DOMContentLoaded', () => {
     const temperature = document.getElementById('temperature');
     const description = document.getElementById('description');
     const dateRange = document.getElementById('date-range');
+    const API_BASE = 'http://127.0.0.1:8000';
+    let liveStream = null;
 
     getWeatherBtn.addEventListener('click', async () => {
         const location = locationInput.value.trim();
@@ -23,17 +25,23 @@ document.addEventListener('DOMContentLoaded', () => {
 
         const body = { location };
         const isForecast = startDate && endDate;
-        if (isForecast) {
-            if (new Date(startDate) > new Date(endDate)) {
-                showError('Start date must be before end date.');
-                return;
-            }
-            body.date_range_start = startDate;
-            body.date_range_end = endDate;
+        if (liveStream) {
+            liveStream.close();
+            liveStream = null;
+        }
+        if (!isForecast) {
+            watchLocation(location);
+            return;
         }
+        if (new Date(startDate) > new Date(endDate)) {
+            showError('Start date must be before end date.');
+            return;
+        }
+        body.date_range_start = startDate;
+        body.date_range_end = endDate;
 
         try {
-            const response = await fetch('http://127.0.0.1:8000/weather/', {
+            const response = await fetch(`${API_BASE}/weather/`, {
                 method: 'POST',
                 headers: { 'Content-Type': 'application/json' },
                 body: JSON.stringify(body)
@@ -52,6 +60,32 @@ document.addEventListener('DOMContentLoaded', () => {
         }
     });
 
+    // Current weather is pushed by the server; one upstream poll per location is shared by all viewers
+    function watchLocation(location) {
+        liveStream = new EventSource(`${API_BASE}/weather/stream?location=${encodeURIComponent(location)}`);
+        liveStream.onmessage = (event) => {
+            const update = JSON.parse(event.data);
+            if (update.error) {
+                if (update.error === 'Invalid location') {
+                    liveStream.close();
+                }
+                showError(update.error);
+                return;
+            }
+            showWeather({
+                location: update.name || update.location,
+                temperature: update.temperature,
+                weather_description: update.description
+            }, false);
+        };
+        liveStream.onerror = () => {
+            // EventSource reconnects on its own; only report when it has given up
+            if (liveStream && liveStream.readyState === EventSource.CLOSED) {
+                showError('Live updates disconnected.');
+            }
+        };
+    }
+
     function showError(msg) {
         errorMessage.textContent = msg;
         errorMessage.classList.remove('hidden');